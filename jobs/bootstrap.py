@@ -0,0 +1,25 @@
+"""
+Entry points of the job pool processes.
+
+A spawned process imports the module of its initializer before the initializer sets up
+Django, so this module only imports Django; the job code, which imports the models, is
+imported by the functions once the apps are ready.
+"""
+
+import django
+
+
+def initialize():
+    """
+    Set up Django in a new pool process.
+    """
+    django.setup()
+
+
+def execute(job_id):
+    """
+    Run a claimed job in a pool process, see `jobs.worker.execute`.
+    """
+    from jobs import worker
+
+    worker.execute(job_id)
@@ -0,0 +1,122 @@
+import multiprocessing
+import os
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from jobs import bootstrap, worker
+from jobs.models import Job
+from products.cache import get_cache, is_process_local
+from products.events import get_broker
+
+
+class Command(BaseCommand):
+    """
+    Run the queued background jobs in a pool of worker processes.
+
+    The Job table is the queue, so no other service is needed: the command polls it for
+    queued jobs, claims as many as it has idle processes and runs them in the pool. Several
+    workers, on one or more hosts, can share the same database.
+
+    The jobs change the catalogue in other processes than the web servers, so the command
+    requires a shared catalogue cache and events broker: with the process-local defaults
+    the web processes would never see the invalidations and events of the jobs.
+    """
+
+    help = "Run the queued background jobs in a pool of processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=os.cpu_count(),
+            help="Number of jobs run in parallel (the CPU count by default).",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=settings.JOBS_POLL_INTERVAL,
+            help="Seconds between two checks for new jobs when idle.",
+        )
+        parser.add_argument(
+            "--burst",
+            action="store_true",
+            help="Exit once no job is queued or running instead of waiting for more.",
+        )
+
+    def handle(self, *args, **options):
+        if is_process_local(get_cache()):
+            raise CommandError(
+                "The jobs need a catalogue cache shared with the web processes, set "
+                "DJANGO_CACHE_BACKEND to a shared backend (database, Redis or Memcached)."
+            )
+        if get_broker().process_local:
+            raise CommandError(
+                "The jobs need an events broker shared with the web processes, set "
+                "PRODUCTS_EVENTS_BACKEND=products.events.CacheBroker."
+            )
+
+        name = f"{socket.gethostname()}:{os.getpid()}"
+        processes = options["processes"]
+        self.stdout.write(f"Worker {name} running with {processes} processes")
+
+        while True:
+            # the pool processes open their own connections
+            connections.close_all()
+            pool = ProcessPoolExecutor(
+                max_workers=processes,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=bootstrap.initialize,
+            )
+            try:
+                self.run(pool, name, processes, options)
+                return
+            except BrokenProcessPool:
+                self.stderr.write(self.style.ERROR("A job process died, restarting"))
+            finally:
+                pool.shutdown(cancel_futures=True)
+
+    def run(self, pool, name, processes, options):
+        running = {}
+        while True:
+            lost = worker.fail_lost_jobs()
+            if lost:
+                self.stderr.write(self.style.WARNING(f"Failed {lost} lost jobs"))
+
+            while len(running) < processes:
+                job_id = worker.claim(name)
+                if job_id is None:
+                    break
+                self.stdout.write(f"Running job {job_id}")
+                running[pool.submit(bootstrap.execute, job_id)] = job_id
+
+            if not running:
+                if options["burst"]:
+                    return
+                time.sleep(options["poll_interval"])
+                continue
+
+            done, _ = wait(
+                running, timeout=options["poll_interval"], return_when=FIRST_COMPLETED
+            )
+            for future in done:
+                job_id = running.pop(future)
+                error = future.exception()
+                if error is None:
+                    self.stdout.write(f"Finished job {job_id}")
+                    continue
+
+                worker.finish(
+                    job_id, Job.FAILED, error=f"The job process died: {error}"
+                )
+                if isinstance(error, BrokenProcessPool):
+                    for job_id in running.values():
+                        worker.finish(
+                            job_id, Job.FAILED, error="The job process pool broke."
+                        )
+                    raise error
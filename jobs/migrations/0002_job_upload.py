@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:24
+
+import jobs.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("jobs", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="job",
+            name="upload",
+            field=models.FileField(
+                blank=True, storage=jobs.models.UploadStorage(), upload_to="uploads/"
+            ),
+        ),
+    ]
@@ -0,0 +1,83 @@
+import os
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import models
+
+
+class UploadStorage(FileSystemStorage):
+    """
+    Storage of the files uploaded with the jobs, in the `JOBS_UPLOADS_DIR` directory.
+
+    The directory must be shared by the web processes, which store the uploads, and the
+    `run_jobs` workers, which read them.
+    """
+
+    @property
+    def base_location(self):
+        return self._value_or_setting(self._location, settings.JOBS_UPLOADS_DIR)
+
+    @property
+    def location(self):
+        return os.path.abspath(self.base_location)
+
+
+class Job(models.Model):
+    """
+    Background job run by the `run_jobs` worker, the table is the queue.
+
+    Attributes:
+        kind: str: name of the task in the `jobs.tasks` registry
+        status: str: queued, running, succeeded or failed
+        payload: dict: arguments of the task
+        upload: File: file uploaded with the job, e.g. the products of import_products
+        result: dict: value returned by the task
+        error: str: error message of a failed job
+        created_by: User: user who submitted the job
+        worker: str: host and process id of the worker that claimed the job
+        created_at: datetime: submission time
+        started_at: datetime: time the job was claimed by a worker
+        finished_at: datetime: time the job succeeded or failed
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    STATUSES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (SUCCEEDED, "Succeeded"),
+        (FAILED, "Failed"),
+    ]
+
+    kind = models.CharField(max_length=100)
+    status = models.CharField(max_length=20, choices=STATUSES, default=QUEUED)
+    payload = models.JSONField(default=dict, blank=True)
+    upload = models.FileField(upload_to="uploads/", storage=UploadStorage(), blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="jobs",
+    )
+    worker = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # the workers claim the oldest queued jobs
+            models.Index(fields=["status", "id"], name="job_status_idx"),
+        ]
+
+    @property
+    def finished(self):
+        return self.status in (self.SUCCEEDED, self.FAILED)
+
+    def __str__(self):
+        return f"{self.id} - {self.kind} ({self.status})"
@@ -0,0 +1,40 @@
+"""
+Registry of the tasks the background jobs can run.
+
+A task is a function called by the worker with the Job and the validated payload as
+keyword arguments. Its return value, which must be JSON serializable, is stored as the
+result of the job and an exception fails the job. The tasks are registered in
+`jobs.tasks` with the `task` decorator.
+"""
+
+TASKS = {}
+
+
+class Task:
+    """
+    A task of the registry.
+
+    Attributes:
+        name: str: the job kind
+        function: callable: function running the task
+        serializer: Serializer: class validating the payload at submission, or None
+        staff_only: bool: whether only staff users can submit the task
+    """
+
+    def __init__(self, name, function, serializer=None, staff_only=False):
+        self.name = name
+        self.function = function
+        self.serializer = serializer
+        self.staff_only = staff_only
+
+
+def task(name, serializer=None, staff_only=False):
+    """
+    Register the decorated function as the task of the given job kind.
+    """
+
+    def register(function):
+        TASKS[name] = Task(name, function, serializer, staff_only)
+        return function
+
+    return register
@@ -0,0 +1,99 @@
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+from jobs.registry import TASKS
+from jobs.models import Job
+from products.export import STREAMS
+from products.importer import READERS, detect_format
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the status and result of a Job
+    """
+
+    class Meta:
+        model = Job
+        fields = [
+            "id",
+            "kind",
+            "status",
+            "result",
+            "error",
+            "created_at",
+            "started_at",
+            "finished_at",
+        ]
+
+
+class JobSubmitSerializer(serializers.Serializer):
+    """
+    Serializer for a job submission, the payload is validated by the serializer of the task
+
+    A file sent with the job is validated as the `file` field of the payload, and returned
+    as `upload` instead of being stored in the payload.
+    """
+
+    kind = serializers.CharField()
+    payload = serializers.DictField(required=False, default=dict)
+    file = serializers.FileField(required=False)
+
+    def validate(self, attrs):
+        task = TASKS.get(attrs["kind"])
+        if task is None:
+            raise ValidationError(
+                {"kind": [f"Choose one of {', '.join(sorted(TASKS))}."]}
+            )
+        user = self.context["request"].user
+        if task.staff_only and not user.is_staff:
+            raise ValidationError({"kind": ["Only staff users can run this job."]})
+
+        upload = attrs.pop("file", None)
+        accepts_file = (
+            task.serializer is not None and "file" in task.serializer().fields
+        )
+        if upload is not None and not accepts_file:
+            raise ValidationError({"file": ["This job does not take a file."]})
+
+        payload = {}
+        if task.serializer is not None:
+            data = dict(attrs["payload"])
+            if upload is not None:
+                data["file"] = upload
+            serializer = task.serializer(data=data)
+            if not serializer.is_valid():
+                errors = dict(serializer.errors)
+                if "file" in errors:
+                    raise ValidationError({"file": errors["file"]})
+                raise ValidationError({"payload": errors})
+            payload = dict(serializer.validated_data)
+        attrs["upload"] = payload.pop("file", None)
+        attrs["payload"] = payload
+        return attrs
+
+
+class ImportPayloadSerializer(serializers.Serializer):
+    """
+    Payload of the import_products job: the uploaded file and its format, as accepted by
+    import_products (detected from the file name by default)
+    """
+
+    file = serializers.FileField()
+    input_format = serializers.ChoiceField(choices=sorted(READERS), required=False)
+
+    def validate(self, attrs):
+        if "input_format" not in attrs:
+            try:
+                attrs["input_format"] = detect_format(attrs["file"].name)
+            except ValueError as error:
+                raise ValidationError({"input_format": [str(error)]})
+        return attrs
+
+
+class ExportPayloadSerializer(serializers.Serializer):
+    """
+    Payload of the export_products job: the query parameters of the export endpoint
+    """
+
+    params = serializers.DictField(child=serializers.CharField(), default=dict)
+    export_format = serializers.ChoiceField(choices=list(STREAMS), default="ndjson")
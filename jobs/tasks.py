@@ -0,0 +1,57 @@
+"""
+Tasks of the background jobs: the long running catalogue operations.
+"""
+
+import io
+
+from django.conf import settings
+
+from jobs.models import Job
+from jobs.registry import task
+from jobs.serializers import ExportPayloadSerializer, ImportPayloadSerializer
+from products import rollup
+from products.importer import READERS, ProductImporter
+from products.views import ProductExportView
+
+
+def result_path(job, extension):
+    return settings.JOBS_RESULTS_DIR / f"job-{job.id}.{extension}"
+
+
+@task("import_products", serializer=ImportPayloadSerializer)
+def import_products(job, input_format):
+    # the rows are streamed from the uploaded file, which is deleted once imported
+    try:
+        with job.upload.open("rb") as upload:
+            file = io.TextIOWrapper(upload, encoding="utf-8", newline="")
+            report = ProductImporter().run(READERS[input_format](file))
+    finally:
+        job.upload.delete(save=False)
+        Job.objects.filter(id=job.id).update(upload="")
+    return {
+        "rows": report.rows,
+        "created": report.created,
+        "updated": report.updated,
+        "failed": len(report.errors),
+        # the first errors, a large import can fail on every row
+        "errors": [
+            {"row": number, "errors": errors}
+            for number, errors in report.errors[: settings.JOBS_MAX_REPORTED_ERRORS]
+        ],
+        "elapsed": round(report.elapsed, 3),
+    }
+
+
+@task("export_products", serializer=ExportPayloadSerializer)
+def export_products(job, params, export_format):
+    path = result_path(job, export_format)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    params = {**params, ProductExportView.export_format_param: export_format}
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        ProductExportView.write_export(params, file)
+    return {"format": export_format, "file": path.name, "size": path.stat().st_size}
+
+
+@task("rebuild_sales_rollup", staff_only=True)
+def rebuild_sales_rollup(job):
+    return {"rows": rollup.rebuild()}
@@ -0,0 +1,275 @@
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from jobs import tasks
+from jobs.models import Job
+from products.models import Category, Product
+
+
+def products_file(*titles, name="products.jsonl"):
+    rows = [
+        {
+            "title": title,
+            "price": "9.99",
+            "description": "A product",
+            "category": "Books",
+            "image": "https://example.com/product.jpg",
+        }
+        for title in titles
+    ]
+    content = "\n".join(json.dumps(row) for row in rows).encode()
+    return SimpleUploadedFile(name, content, content_type="application/x-ndjson")
+
+
+class JobsApiTests(APITestCase):
+    """
+    Submission, polling and files of the jobs.
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name)
+        overrides = override_settings(
+            JOBS_UPLOADS_DIR=self.path / "uploads",
+            JOBS_RESULTS_DIR=self.path / "results",
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        self.user = User.objects.create_user(username="alice")
+        self.client.force_authenticate(self.user)
+
+    def submit(self, **data):
+        return self.client.post("/api/jobs/", data, format="multipart")
+
+    def test_submit_an_import(self):
+        response = self.submit(kind="import_products", file=products_file("A", "B"))
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data["status"], Job.QUEUED)
+        self.assertEqual(response["Location"], f"/api/jobs/{response.data['id']}")
+        job = Job.objects.get(id=response.data["id"])
+        self.assertEqual(job.payload, {"input_format": "jsonl"})
+        self.assertEqual(job.created_by, self.user)
+        self.assertTrue((self.path / "uploads" / job.upload.name).exists())
+
+    def test_worker_streams_the_upload(self):
+        response = self.submit(kind="import_products", file=products_file("A", "B"))
+        job = Job.objects.get(id=response.data["id"])
+        path = self.path / "uploads" / job.upload.name
+
+        result = tasks.import_products(job, **job.payload)
+
+        self.assertEqual(result["created"], 2)
+        self.assertCountEqual(
+            Product.objects.values_list("title", flat=True), ["A", "B"]
+        )
+        self.assertFalse(path.exists())
+        job.refresh_from_db()
+        self.assertFalse(job.upload)
+
+    def test_import_format(self):
+        response = self.submit(
+            kind="import_products",
+            file=products_file("A", name="products.txt"),
+            **{"payload.input_format": "jsonl"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+        response = self.submit(
+            kind="import_products", file=products_file("A", name="products.txt")
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("input_format", response.data["payload"])
+
+    def test_import_needs_a_file(self):
+        response = self.client.post(
+            "/api/jobs/", {"kind": "import_products"}, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("file", response.data)
+        self.assertFalse(Job.objects.exists())
+
+    def test_file_of_a_job_without_one(self):
+        response = self.submit(kind="export_products", file=products_file("A"))
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("file", response.data)
+
+    def test_unknown_kind(self):
+        response = self.client.post("/api/jobs/", {"kind": "unknown"}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("kind", response.data)
+
+    def test_staff_only_kind(self):
+        response = self.client.post(
+            "/api/jobs/", {"kind": "rebuild_sales_rollup"}, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_poll(self):
+        job = Job.objects.create(
+            kind="rebuild_sales_rollup",
+            status=Job.SUCCEEDED,
+            result={"rows": 3},
+            created_by=self.user,
+        )
+
+        response = self.client.get(f"/api/jobs/{job.id}")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["status"], Job.SUCCEEDED)
+        self.assertEqual(response.data["result"], {"rows": 3})
+
+    def test_users_only_see_their_jobs(self):
+        other = User.objects.create_user(username="bob")
+        own = Job.objects.create(kind="rebuild_sales_rollup", created_by=self.user)
+        foreign = Job.objects.create(kind="rebuild_sales_rollup", created_by=other)
+
+        response = self.client.get("/api/jobs/")
+        self.assertEqual([job["id"] for job in response.data["results"]], [own.id])
+        response = self.client.get(f"/api/jobs/{foreign.id}")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        self.client.force_authenticate(User.objects.create(username="a", is_staff=True))
+        response = self.client.get("/api/jobs/")
+        self.assertEqual(
+            [job["id"] for job in response.data["results"]], [foreign.id, own.id]
+        )
+
+    def test_export_file_download(self):
+        Product.objects.create(
+            title="Dune",
+            price="9.50",
+            description="A book",
+            category=Category.objects.create(name="Books"),
+            image="https://example.com/product.jpg",
+        )
+        job = Job.objects.create(
+            kind="export_products",
+            payload={"params": {}, "export_format": "csv"},
+            created_by=self.user,
+        )
+        job.result = tasks.export_products(job, **job.payload)
+        job.status = Job.SUCCEEDED
+        job.save()
+
+        response = self.client.get(f"/api/jobs/{job.id}/file")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response["Content-Disposition"], 'attachment; filename="products.csv"'
+        )
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn("Dune", lines[1])
+
+        other = User.objects.create_user(username="bob")
+        self.client.force_authenticate(other)
+        response = self.client.get(f"/api/jobs/{job.id}/file")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_file_of_an_unfinished_job(self):
+        job = Job.objects.create(kind="export_products", created_by=self.user)
+
+        response = self.client.get(f"/api/jobs/{job.id}/file")
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class RunJobsCommandTests(SimpleTestCase):
+    """
+    The run_jobs worker, run as a separate process on a temporary SQLite database.
+
+    The pool processes are spawned with the settings of the environment, so they cannot
+    reach the test database of this process.
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name)
+        self.env = {
+            key: value
+            for key, value in os.environ.items()
+            if not key.startswith("DJANGO_DB_")
+        }
+        self.env.update(
+            DJANGO_DB_ENGINE="sqlite",
+            DJANGO_DB_NAME=str(self.path / "db.sqlite3"),
+            DJANGO_CACHE_BACKEND="django.core.cache.backends.filebased.FileBasedCache",
+            DJANGO_CACHE_LOCATION=str(self.path / "cache"),
+            PRODUCTS_EVENTS_BACKEND="products.events.CacheBroker",
+            JOBS_RESULTS_DIR=str(self.path / "results"),
+            JOBS_UPLOADS_DIR=str(self.path / "uploads"),
+        )
+        self.manage("migrate")
+
+    def manage(self, *args, env=None):
+        return subprocess.run(
+            [sys.executable, str(settings.BASE_DIR / "manage.py"), *args],
+            env=env or self.env,
+            capture_output=True,
+            text=True,
+            timeout=120,
+        )
+
+    def jobs(self):
+        with sqlite3.connect(self.path / "db.sqlite3") as database:
+            return database.execute(
+                "SELECT kind, status, error FROM jobs_job ORDER BY id"
+            ).fetchall()
+
+    def test_burst_runs_the_queued_jobs(self):
+        self.manage(
+            "shell",
+            "-c",
+            "from jobs.models import Job; "
+            "Job.objects.create(kind='rebuild_sales_rollup'); "
+            "Job.objects.create(kind='export_products', "
+            "payload={'params': {}, 'export_format': 'csv'}); "
+            "from django.core.files.base import ContentFile; "
+            "Job.objects.create(kind='import_products', "
+            "payload={'input_format': 'jsonl'}, upload=ContentFile("
+            f"{products_file('A', 'B').read()!r}, name='products.jsonl'))",
+        )
+
+        worker = self.manage("run_jobs", "--burst", "--processes", "2")
+
+        self.assertEqual(worker.returncode, 0, worker.stderr)
+        self.assertEqual(
+            self.jobs(),
+            [
+                ("rebuild_sales_rollup", Job.SUCCEEDED, ""),
+                ("export_products", Job.SUCCEEDED, ""),
+                ("import_products", Job.SUCCEEDED, ""),
+            ],
+        )
+        self.assertEqual(list((self.path / "uploads" / "uploads").iterdir()), [])
+
+    def test_process_local_cache_is_refused(self):
+        env = {
+            **self.env,
+            "DJANGO_CACHE_BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+
+        worker = self.manage("run_jobs", "--burst", env=env)
+
+        self.assertNotEqual(worker.returncode, 0)
+        self.assertIn("shared backend", worker.stderr)
@@ -0,0 +1,9 @@
+from django.urls import path
+
+from jobs.views import JobDetailView, JobFileView, JobListCreateView
+
+urlpatterns = [
+    path("", JobListCreateView.as_view(), name="job-list"),
+    path("<int:pk>", JobDetailView.as_view(), name="job-detail"),
+    path("<int:pk>/file", JobFileView.as_view(), name="job-file"),
+]
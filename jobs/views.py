@@ -0,0 +1,83 @@
+from django.http import FileResponse, Http404
+from django.urls import reverse
+from rest_framework import generics, status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from jobs.models import Job
+from jobs.serializers import JobSerializer, JobSubmitSerializer
+from jobs.tasks import result_path
+
+
+class JobsMixin:
+    """
+    Restrict the jobs to the ones of the user, staff users see every job.
+    """
+
+    permission_classes = [IsAuthenticated]
+    serializer_class = JobSerializer
+
+    def get_queryset(self):
+        jobs = Job.objects.order_by("-id")
+        if not self.request.user.is_staff:
+            jobs = jobs.filter(created_by=self.request.user)
+        return jobs
+
+
+class JobListCreateView(JobsMixin, generics.ListCreateAPIView):
+    """
+    Job List Create View
+
+    Lists the jobs of the user, and submits a job to the queue: the response is a
+    `202 Accepted` with the queued job, whose status is polled at the `Location` URL.
+
+    - kind: the task to run, e.g. import_products, export_products, rebuild_sales_rollup.
+    - payload: the arguments of the task.
+    - file: the file of the task, e.g. the products of import_products (multipart request).
+    """
+
+    def create(self, request, *args, **kwargs):
+        serializer = JobSubmitSerializer(
+            data=request.data, context={"request": request}
+        )
+        serializer.is_valid(raise_exception=True)
+        job = Job.objects.create(
+            kind=serializer.validated_data["kind"],
+            payload=serializer.validated_data["payload"],
+            upload=serializer.validated_data["upload"],
+            created_by=request.user,
+        )
+        return Response(
+            JobSerializer(job).data,
+            status=status.HTTP_202_ACCEPTED,
+            headers={"Location": reverse("job-detail", args=[job.id])},
+        )
+
+
+class JobDetailView(JobsMixin, generics.RetrieveAPIView):
+    """
+    Job Detail View
+
+    Returns the status of a job, with its result once it succeeded or its error once it
+    failed.
+    """
+
+
+class JobFileView(JobsMixin, generics.RetrieveAPIView):
+    """
+    Job File View
+
+    Downloads the file written by a succeeded job, e.g. the products of export_products.
+    """
+
+    def retrieve(self, request, *args, **kwargs):
+        job = self.get_object()
+        if job.status != Job.SUCCEEDED or not (job.result or {}).get("file"):
+            raise Http404("The job has no file.")
+
+        path = result_path(job, job.result["format"])
+        if not path.exists():
+            raise Http404("The file of the job was deleted.")
+        return FileResponse(
+            open(path, "rb"), as_attachment=True, filename=f"products.{path.suffix[1:]}"
+        )
@@ -0,0 +1,79 @@
+"""
+Execution of the background jobs, with the database as the broker.
+
+The worker process claims queued jobs with a conditional UPDATE, which only one worker can
+win for a given job on any database backend, and runs them in a pool of processes (entered
+through `jobs.bootstrap`). Each process opens its own database connections and stores the
+outcome of its jobs.
+"""
+
+import datetime
+import logging
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.registry import TASKS
+
+logger = logging.getLogger(__name__)
+
+
+def claim(worker):
+    """
+    Mark the oldest queued job as running for the worker and return its id, or None.
+
+    - worker: name of the claiming worker, stored on the job.
+    """
+    queued = Job.objects.filter(status=Job.QUEUED).order_by("id")
+    while True:
+        job_ids = list(queued.values_list("id", flat=True)[:10])
+        if not job_ids:
+            return None
+        for job_id in job_ids:
+            claimed = Job.objects.filter(id=job_id, status=Job.QUEUED).update(
+                status=Job.RUNNING, worker=worker, started_at=timezone.now()
+            )
+            if claimed:
+                return job_id
+        # all of them were claimed by other workers, look again
+
+
+def execute(job_id):
+    """
+    Run a claimed job and store its result or error.
+    """
+    close_old_connections()
+    try:
+        job = Job.objects.get(id=job_id)
+        try:
+            task = TASKS[job.kind]
+            result = task.function(job, **job.payload)
+        except Exception as error:
+            logger.exception("Job %s (%s) failed", job.id, job.kind)
+            finish(job_id, Job.FAILED, error=f"{type(error).__name__}: {error}")
+        else:
+            finish(job_id, Job.SUCCEEDED, result=result)
+    finally:
+        close_old_connections()
+
+
+def finish(job_id, status, result=None, error=""):
+    Job.objects.filter(id=job_id).update(
+        status=status, result=result, error=error, finished_at=timezone.now()
+    )
+
+
+def fail_lost_jobs():
+    """
+    Fail the jobs running for longer than JOBS_TIMEOUT, whose worker was stopped or lost.
+
+    Return the number of failed jobs.
+    """
+    started_before = timezone.now() - datetime.timedelta(seconds=settings.JOBS_TIMEOUT)
+    return Job.objects.filter(status=Job.RUNNING, started_at__lt=started_before).update(
+        status=Job.FAILED,
+        error="The worker running the job was lost.",
+        finished_at=timezone.now(),
+    )
@@ -1,4 +1,6 @@
 from django.contrib import admin
-from products.models import Product
+from products.models import Category, MonthlyCategorySales, Product
 
+admin.site.register(Category)
 admin.site.register(Product)
+admin.site.register(MonthlyCategorySales)
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class ProductsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'products'
+
+    def ready(self):
+        # connect the Product signals
+        from products import checks, signals  # noqa: F401
+        from products.cache import cache_metrics
+        from sales_monitor_api.metrics import register_collector
+
+        register_collector(cache_metrics)
@@ -0,0 +1,332 @@
+"""
+Async variants of the read-heavy product and chart endpoints.
+
+The views authenticate with the async JWT authentication and most of them query with
+Django's async ORM (`aiterator`, `aaggregate`). The async ORM still runs the queries in
+the request's database thread, so it saves the worker thread of a sync view, not the
+database round trips. The product list and the dashboard reuse sync code through
+`sync_to_async` (see their docstrings). The views return the same JSON as their DRF
+counterparts.
+"""
+
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.db.models import Max, Min
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.views import View
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+from rest_framework.utils.encoders import JSONEncoder
+
+from products.cache import (
+    acatalogue_version,
+    areplica_may_lag,
+    get_cache,
+    is_not_modified,
+    record,
+    response_etag,
+)
+from products.charts import ChartMatrix
+from products.events import format_event, get_broker
+from products.models import Category, Product
+from products.serializers import (
+    DashboardChartSerializer,
+    ItemsChartSerializer,
+    SalesChartSerializer,
+)
+from products.views import ProductListView
+from sales_monitor_api import db
+from users.authentication import AsyncJWTAuthentication, AsyncStreamTicketAuthentication
+
+
+async def run_query(func, *args):
+    """
+    Run a sync database function from async code.
+
+    With `ASYNC_PARALLEL_QUERIES` enabled the function runs in its own thread and database
+    connection, so gathered queries really run in parallel; otherwise it runs in the
+    request's database thread like the async ORM does.
+    """
+    if not settings.ASYNC_PARALLEL_QUERIES:
+        return await sync_to_async(func)(*args)
+
+    def run_and_close():
+        try:
+            return func(*args)
+        finally:
+            connections.close_all()
+
+    return await sync_to_async(run_and_close, thread_sensitive=False)()
+
+
+class AsyncAPIView(View):
+    """
+    Base class for the async read-only API views.
+
+    Requests are authenticated with a JWT access token. Subclasses implement the async
+    `get_data(request)` method; when `cached` is set the data is cached per catalogue version
+    and an ETag is returned, like CatalogueCacheMixin does for the sync views. With
+    `replica_reads` set the queries run on the read replica, like ReplicaReadMixin.
+    """
+
+    authentication_class = AsyncJWTAuthentication
+    cached = False
+    replica_reads = False
+
+    async def dispatch(self, request, *args, **kwargs):
+        authenticator = self.authentication_class()
+        try:
+            credentials = await authenticator.aauthenticate(request)
+            if credentials is None:
+                raise exceptions.NotAuthenticated()
+            request.user, request.auth = credentials
+            if self.replica_reads and await db.ause_replica(request.user):
+                with db.replica_reads():
+                    return await super().dispatch(request, *args, **kwargs)
+            return await super().dispatch(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            return self.error_response(exc, authenticator.authenticate_header(request))
+
+    def error_response(self, exc, authenticate_header):
+        detail = exc.detail
+        data = detail if isinstance(detail, (dict, list)) else {"detail": detail}
+        response = self.json_response(data, status=exc.status_code)
+        if exc.status_code == status.HTTP_401_UNAUTHORIZED:
+            response["WWW-Authenticate"] = authenticate_header
+        return response
+
+    def json_response(self, data, status=status.HTTP_200_OK):
+        # same encoding as the DRF JSONRenderer
+        return JsonResponse(
+            data,
+            status=status,
+            safe=False,
+            encoder=JSONEncoder,
+            json_dumps_params={"ensure_ascii": False, "separators": (",", ":")},
+        )
+
+    async def get_data(self, request):
+        raise NotImplementedError("Async API views must implement get_data()")
+
+    async def get(self, request, *args, **kwargs):
+        if not self.cached:
+            return self.json_response(await self.get_data(request))
+
+        query = request.GET.urlencode()
+        version = await acatalogue_version()
+        key = f"products:response:{version}:{self.__class__.__name__}:{query}"
+        etag = response_etag(key)
+
+        if is_not_modified(request, etag):
+            record("not_modified")
+            response = HttpResponseNotModified()
+        else:
+            cache = get_cache()
+            data = await cache.aget(key)
+            if data is None:
+                record("misses")
+                data = await self.get_data(request)
+                if await areplica_may_lag():
+                    response = self.json_response(data)
+                    response["Cache-Control"] = "no-cache"
+                    return response
+                await cache.aset(key, data, timeout=settings.PRODUCTS_CACHE_TIMEOUT)
+            else:
+                record("hits")
+            response = self.json_response(data)
+
+        response["ETag"] = etag
+        response["Cache-Control"] = "private, no-cache"
+        return response
+
+
+class AsyncProductListView(AsyncAPIView):
+    """
+    Async Product List View
+
+    Same filters, search, ordering, sparse fields and pagination as the product list
+    endpoint. The page and its count are fetched by the paginators of the sync view, run
+    with `sync_to_async` in the request's database thread, not by the async ORM.
+    """
+
+    replica_reads = True
+
+    async def get_data(self, request):
+        drf_request = Request(request)
+        # the sync view holds the filter configuration
+        view = ProductListView(
+            request=drf_request, format_kwarg=None, args=(), kwargs={}
+        )
+
+        row_serializer = view.get_row_serializer()
+        queryset = view.filter_queryset(view.get_queryset())
+        rows = row_serializer.values(queryset, "id", "price", "title")
+
+        # the count is cached per catalogue version, see ProductCountPagination
+        paginator = view.paginator
+        page = await sync_to_async(paginator.paginate_queryset)(
+            rows, drf_request, view=view
+        )
+        data = row_serializer.serialize(page)
+        return paginator.get_paginated_response(data).data
+
+
+class AsyncCategoriesListView(AsyncAPIView):
+    """
+    Async Categories List View
+    """
+
+    cached = True
+
+    async def get_data(self, request):
+        categories = Category.objects.in_use().order_by("id")
+        queryset = categories.values_list("name", flat=True)
+        return [category async for category in queryset.aiterator()]
+
+
+class AsyncPriceRangeView(AsyncAPIView):
+    """
+    Async Price Range View
+    """
+
+    cached = True
+
+    async def get_data(self, request):
+        return await Product.objects.aaggregate(
+            min_price=Min("price"), max_price=Max("price")
+        )
+
+
+class AsyncSalesChartView(AsyncAPIView):
+    """
+    Async Sales Chart View
+    """
+
+    cached = True
+    replica_reads = True
+
+    async def get_data(self, request):
+        matrix = await ChartMatrix.afrom_rollup()
+        return SalesChartSerializer(matrix.series("sales"), many=True).data
+
+
+class AsyncItemsChartView(AsyncAPIView):
+    """
+    Async Items Chart View
+    """
+
+    cached = True
+    replica_reads = True
+
+    async def get_data(self, request):
+        matrix = await ChartMatrix.afrom_rollup()
+        return ItemsChartSerializer(matrix.series("items"), many=True).data
+
+
+class AsyncDashboardChartView(AsyncAPIView):
+    """
+    Async Dashboard Chart View
+    """
+
+    cached = True
+    replica_reads = True
+
+    async def get_data(self, request):
+        matrix = await ChartMatrix.afrom_rollup()
+        series = matrix.series("sales", "items")
+        return DashboardChartSerializer(series, many=True).data
+
+
+def get_categories():
+    categories = Category.objects.in_use().order_by("id")
+    return list(categories.values_list("name", flat=True))
+
+
+def get_price_range():
+    return Product.objects.aggregate(min_price=Min("price"), max_price=Max("price"))
+
+
+class AsyncDashboardView(AsyncAPIView):
+    """
+    Async Dashboard View
+
+    This view returns everything the dashboard polls in one response: the chart series,
+    the price range and the categories. The three queries are independent: with
+    `ASYNC_PARALLEL_QUERIES` enabled they run concurrently, each on its own connection;
+    otherwise they run one after another in the request's database thread (see
+    `run_query()`).
+    """
+
+    cached = True
+    replica_reads = True
+
+    async def get_data(self, request):
+        matrix, price_range, categories = await asyncio.gather(
+            run_query(ChartMatrix.from_rollup),
+            run_query(get_price_range),
+            run_query(get_categories),
+        )
+        series = matrix.series("sales", "items")
+        return {
+            "charts": DashboardChartSerializer(series, many=True).data,
+            "price_range": price_range,
+            "categories": categories,
+        }
+
+
+class AsyncSalesEventsView(AsyncAPIView):
+    """
+    Async Sales Events View
+
+    Server-sent events stream replacing the polling of the charts and price range: `sales`
+    events carry the (month, category, sales, items) deltas of the committed changes,
+    `catalogue` events the new catalogue version and `reset` events ask to reload the
+    charts (see `products.events`). Load the charts once the stream is open and apply the
+    deltas to them. A comment line is sent every `PRODUCTS_EVENTS_HEARTBEAT` seconds to
+    keep idle connections open. Requires an ASGI server.
+
+    Browsers' EventSource cannot send the access token: it opens the stream with a ticket
+    of `POST /api/users/stream_ticket` in the `ticket` query parameter instead.
+    """
+
+    authentication_class = AsyncStreamTicketAuthentication
+
+    # reconnection delay of the browsers, in milliseconds
+    retry = 3000
+
+    async def get(self, request, *args, **kwargs):
+        if not isinstance(request, ASGIRequest):
+            return self.json_response(
+                {"detail": "Live events require an ASGI server."},
+                status=status.HTTP_501_NOT_IMPLEMENTED,
+            )
+
+        response = StreamingHttpResponse(
+            self.stream(self.last_event_id(request)), content_type="text/event-stream"
+        )
+        response["Cache-Control"] = "no-cache"
+        # proxies such as nginx must not buffer the stream
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    def last_event_id(self, request):
+        try:
+            return int(request.headers["Last-Event-ID"])
+        except (KeyError, ValueError):
+            return None
+
+    async def stream(self, last_event_id):
+        # subscribed when the response starts, and dropped when the client disconnects
+        loop = asyncio.get_running_loop()
+        subscription = await sync_to_async(get_broker().subscribe)(loop, last_event_id)
+        try:
+            yield f"retry: {self.retry}\n\n"
+            while True:
+                message = await subscription.get(settings.PRODUCTS_EVENTS_HEARTBEAT)
+                yield ": keepalive\n\n" if message is None else format_event(message)
+        finally:
+            subscription.close()
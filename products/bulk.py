@@ -0,0 +1,154 @@
+"""
+Batch create, update and delete of products.
+
+Each batch is validated item by item, then written with bulk ORM operations in one
+transaction together with the rollup deltas. The result has one entry per input item,
+in input order, so clients can match failures to the items they sent.
+"""
+
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from products import rollup, signals
+from products.cache import bump_catalogue_version
+from products.models import Product
+from products.serializers import ProductSerializer, resolve_categories
+
+
+def is_product_id(value):
+    # JSON booleans are ints in Python, but never product ids
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def error_result(index, errors):
+    return {"index": index, "status": "error", "errors": errors}
+
+
+def bulk_create_products(items):
+    """
+    Create the valid items of a batch and return the per item results.
+    """
+    validator = ProductSerializer()
+    results = [None] * len(items)
+    valid = []
+    indexes = []
+
+    for index, item in enumerate(items):
+        try:
+            data = validator.run_validation(item)
+        except ValidationError as error:
+            results[index] = error_result(index, error.detail)
+            continue
+        valid.append(data)
+        indexes.append(index)
+
+    products = []
+    if valid:
+        with transaction.atomic():
+            resolve_categories(valid)
+            products = [Product(**data) for data in valid]
+            Product.objects.bulk_create(products)
+            rollup.record_changes([], [rollup.product_row(p) for p in products])
+        bump_catalogue_version()
+
+    for index, product in zip(indexes, products):
+        results[index] = {"index": index, "status": "created", "id": product.id}
+    return results
+
+
+def bulk_update_products(items):
+    """
+    Apply partial updates to the products identified by the "id" of each item.
+
+    The products are read and locked in the transaction that writes them, so the rollup
+    deltas start from their current values and a product deleted meanwhile is reported as
+    not found instead of being written again.
+    """
+    validator = ProductSerializer(partial=True)
+    results = [None] * len(items)
+    changes = []
+
+    with transaction.atomic():
+        ids = [item.get("id") for item in items if isinstance(item, dict)]
+        products = Product.objects.select_for_update().in_bulk(
+            [i for i in ids if is_product_id(i)]
+        )
+
+        for index, item in enumerate(items):
+            if not isinstance(item, dict) or not is_product_id(item.get("id")):
+                results[index] = error_result(
+                    index, {"id": ["A product id is required."]}
+                )
+                continue
+
+            product = products.get(item["id"])
+            if product is None:
+                results[index] = error_result(index, {"id": ["Product not found."]})
+                continue
+
+            try:
+                data = validator.run_validation(
+                    {key: value for key, value in item.items() if key != "id"}
+                )
+            except ValidationError as error:
+                results[index] = error_result(index, error.detail)
+                continue
+            changes.append((index, product, data))
+
+        resolve_categories(data for _, _, data in changes)
+        old_rows = {}
+        fields = set()
+        for index, product, data in changes:
+            old_rows.setdefault(product.id, rollup.product_row(product))
+            for field, value in data.items():
+                setattr(product, field, value)
+            fields.update(data)
+
+        if fields:
+            updated = list({product.id: product for _, product, _ in changes}.values())
+            Product.objects.bulk_update(updated, sorted(fields))
+            rollup.record_changes(
+                old_rows.values(), [rollup.product_row(p) for p in updated]
+            )
+
+    if fields:
+        bump_catalogue_version()
+
+    for index, product, data in changes:
+        results[index] = {"index": index, "status": "updated", "id": product.id}
+    return results
+
+
+def bulk_delete_products(ids):
+    """
+    Delete the products with the given ids.
+    """
+    results = [None] * len(ids)
+    valid_ids = [i for i in ids if is_product_id(i)]
+
+    with transaction.atomic():
+        rows = {
+            row["id"]: row
+            for row in Product.objects.filter(id__in=valid_ids).values(
+                *rollup.ROLLUP_FIELDS
+            )
+        }
+        if rows:
+            # the rollup is updated once for the whole batch below
+            with signals.muted():
+                Product.objects.filter(id__in=list(rows)).delete()
+            rollup.record_changes(rows.values(), [])
+
+    if rows:
+        bump_catalogue_version()
+
+    deleted = set()
+    for index, product_id in enumerate(ids):
+        if not is_product_id(product_id):
+            results[index] = error_result(index, {"id": ["A product id is required."]})
+        elif product_id not in rows or product_id in deleted:
+            results[index] = error_result(index, {"id": ["Product not found."]})
+        else:
+            deleted.add(product_id)
+            results[index] = {"index": index, "status": "deleted", "id": product_id}
+    return results
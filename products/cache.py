@@ -0,0 +1,184 @@
+"""
+Versioned response cache for the read-only catalogue endpoints.
+
+Cached entries are keyed by a catalogue version counter stored in the configured Django
+cache. Every write to the Product table bumps the counter, so stale entries are never read
+again and simply expire. The same version is used to build the ETag of the responses, which
+lets unchanged results be answered with 304 Not Modified before any data is computed.
+
+The counter is only seen by all the processes when the cache backend is shared by them
+(database, file, Redis or Memcached). The default local memory cache is private to each
+process and only suits a single process, which the deploy checks report.
+"""
+
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from rest_framework import status
+from rest_framework.response import Response
+
+from products import columnar, events
+from sales_monitor_api import db
+
+VERSION_KEY = "products:catalogue_version"
+# set for DATABASE_REPLICA_LAG seconds after a catalogue change
+CHANGED_KEY = "products:catalogue_changed"
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "not_modified": 0}
+
+
+def get_cache():
+    """
+    Return the cache backend used for the catalogue responses.
+    """
+    return caches[settings.PRODUCTS_CACHE_ALIAS]
+
+
+def is_process_local(cache):
+    """
+    Return whether the data of a cache backend is only visible to the current process.
+    """
+    return isinstance(cache, (LocMemCache, DummyCache))
+
+
+def catalogue_version():
+    """
+    Return the current catalogue version.
+    """
+    cache = get_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # start from the current time so an evicted counter never reuses old keys
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+async def acatalogue_version():
+    """
+    Return the current catalogue version, from async code.
+    """
+    cache = get_cache()
+    version = await cache.aget(VERSION_KEY)
+    if version is None:
+        await cache.aadd(VERSION_KEY, time.time_ns(), timeout=None)
+        version = await cache.aget(VERSION_KEY)
+    return version
+
+
+def response_etag(key):
+    return '"%s"' % hashlib.md5(key.encode()).hexdigest()
+
+
+def is_not_modified(request, etag):
+    """
+    Return whether the If-None-Match header of the request matches the ETag.
+    """
+    if_none_match = request.headers.get("If-None-Match", "")
+    return etag in [tag.strip() for tag in if_none_match.split(",")]
+
+
+def bump_catalogue_version():
+    """
+    Invalidate all the cached catalogue responses.
+
+    The new version is published to the live event clients once the transaction commits.
+    """
+    cache = get_cache()
+    try:
+        version = cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    if db.replica_configured():
+        cache.set(CHANGED_KEY, version, timeout=settings.DATABASE_REPLICA_LAG)
+    columnar.advance(version)
+    events.publish("catalogue", {"version": version})
+
+
+def replica_may_lag():
+    """
+    Return whether the data read by the request may miss a recent catalogue change.
+
+    Such data is read from a replica shortly after a write and must not be cached under the
+    current catalogue version.
+    """
+    return db.reading_from_replica() and get_cache().get(CHANGED_KEY) is not None
+
+
+async def areplica_may_lag():
+    return db.reading_from_replica() and await get_cache().aget(CHANGED_KEY) is not None
+
+
+def record(stat):
+    with _stats_lock:
+        _stats[stat] += 1
+
+
+def cache_stats():
+    """
+    Return a copy of the hit/miss counters of this process.
+    """
+    with _stats_lock:
+        return dict(_stats)
+
+
+def cache_metrics():
+    """
+    Return the counters of this process as `/metrics` samples.
+    """
+    stats = cache_stats()
+    return [
+        (
+            f"products_cache_{name}_total",
+            "counter",
+            f"Catalogue response cache {name.replace('_', ' ')}.",
+            value,
+        )
+        for name, value in stats.items()
+    ]
+
+
+class CatalogueCacheMixin:
+    """
+    Mixin for read-only APIViews whose response is a pure function of the Product table.
+
+    The view implements `get_data(request)` instead of `get()`. The returned data is cached
+    per catalogue version and query string, and the response carries an ETag so clients
+    sending a matching `If-None-Match` header get a 304 without the data being computed.
+    """
+
+    def get_data(self, request):
+        raise NotImplementedError("Catalogue cached views must implement get_data()")
+
+    def get_cache_key(self, request, version):
+        query = request.query_params.urlencode()
+        return f"products:response:{version}:{self.__class__.__name__}:{query}"
+
+    def get(self, request, *args, **kwargs):
+        key = self.get_cache_key(request, catalogue_version())
+        etag = response_etag(key)
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+        if is_not_modified(request, etag):
+            record("not_modified")
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        cache = get_cache()
+        data = cache.get(key)
+        if data is None:
+            record("misses")
+            data = self.get_data(request)
+            if replica_may_lag():
+                return Response(data, headers={"Cache-Control": "no-cache"})
+            cache.set(key, data, timeout=settings.PRODUCTS_CACHE_TIMEOUT)
+        else:
+            record("hits")
+
+        return Response(data, headers=headers)
@@ -0,0 +1,103 @@
+"""
+Chart engine shared by the sales, items and dashboard chart views.
+
+The engine reads the month, category name, sales and items columns of the
+MonthlyCategorySales rollup (keyed on the category id) in a single query, derives the
+category set from the same result and builds a dense month x category matrix that is
+zero-filled by construction. With the columnar analytics engine enabled the same rows are
+computed in memory instead.
+"""
+
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+
+from products import columnar
+from products.models import MonthlyCategorySales
+
+
+class ChartMatrix:
+    """
+    Dense month x category matrix of sales and sold items.
+
+    Attributes:
+        months: list: months in chronological order (None for sales without a date)
+        categories: list: categories in order of first appearance
+        sales: list: rows of total sales, one row per month and one column per category
+        items: list: rows of sold items, one row per month and one column per category
+    """
+
+    def __init__(self, rows):
+        self.months = []
+        self.categories = []
+        month_index = {}
+        category_index = {}
+        cells = []
+
+        for month, category, total_sales, total_items in rows:
+            if month not in month_index:
+                month_index[month] = len(self.months)
+                self.months.append(month)
+            if category not in category_index:
+                category_index[category] = len(self.categories)
+                self.categories.append(category)
+            cells.append(
+                (month_index[month], category_index[category], total_sales, total_items)
+            )
+
+        width = len(self.categories)
+        self.sales = [[Decimal("0")] * width for _ in self.months]
+        self.items = [[0] * width for _ in self.months]
+        for row, column, total_sales, total_items in cells:
+            self.sales[row][column] = total_sales
+            self.items[row][column] = total_items
+
+    @staticmethod
+    def rollup_rows():
+        return MonthlyCategorySales.objects.values_list(
+            "month", "category__name", "total_sales", "total_items"
+        ).order_by("month")
+
+    @classmethod
+    def from_rollup(cls):
+        """
+        Build the matrix from the MonthlyCategorySales rollup with one query.
+        """
+        engine = columnar.get_engine()
+        if engine is not None:
+            return cls(engine.month_rows())
+        return cls(cls.rollup_rows())
+
+    @classmethod
+    async def afrom_rollup(cls):
+        """
+        Build the matrix from the rollup, from async code.
+        """
+        # values_list() with reordered fields runs its query when the iterator is created,
+        # which aiterator() does in the event loop, so fetch the rows in a sync thread
+        engine = columnar.get_engine()
+        if engine is not None:
+            # the facts are (re)loaded from the database on first use
+            rows = await sync_to_async(engine.month_rows)()
+        else:
+            rows = await sync_to_async(list)(cls.rollup_rows())
+        return cls(rows)
+
+    @staticmethod
+    def month_label(month):
+        return month.strftime("%b %Y") if month else None
+
+    def series(self, *keys):
+        """
+        Return the chart data as a list of dicts, one per month.
+
+        - keys: the matrices to include, any of "sales" and "items".
+        """
+        result = []
+        for row, month in enumerate(self.months):
+            item = {"month": self.month_label(month)}
+            for key in keys:
+                values = getattr(self, key)[row]
+                item[key] = dict(zip(self.categories, values))
+            result.append(item)
+        return result
@@ -0,0 +1,49 @@
+"""
+System checks of the settings the products app relies on.
+"""
+
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.checks import Tags, Warning, register
+
+from products.cache import get_cache, is_process_local
+from sales_monitor_api import db
+
+
+@register(Tags.caches, deploy=True)
+def check_catalogue_cache(app_configs, **kwargs):
+    """
+    Report a catalogue cache which the worker processes do not share.
+    """
+    if not is_process_local(get_cache()):
+        return []
+    return [
+        Warning(
+            "The catalogue cache is local to each process.",
+            hint=(
+                "A write handled by one process does not invalidate the responses "
+                "cached by the others. Set DJANGO_CACHE_BACKEND to a shared backend "
+                "(database, Redis or Memcached) when running several processes."
+            ),
+            id="products.W001",
+        )
+    ]
+
+
+@register(Tags.caches)
+def check_replica_pin_cache(app_configs, **kwargs):
+    """
+    Report a read replica whose primary pins are not shared by the worker processes.
+    """
+    if not db.replica_configured() or not is_process_local(caches[DEFAULT_CACHE_ALIAS]):
+        return []
+    return [
+        Warning(
+            "The read replica pins are kept in a cache local to each process.",
+            hint=(
+                "A user who wrote through one process reads their stale data from the "
+                "replica in the others. Set DJANGO_CACHE_BACKEND to a shared backend "
+                "(database, Redis or Memcached) when running several processes."
+            ),
+            id="products.W002",
+        )
+    ]
@@ -0,0 +1,430 @@
+"""
+Optional in-memory columnar engine for the chart and analytics endpoints.
+
+With `PRODUCTS_ANALYTICS_ENGINE = "columnar"` (needs NumPy) every process keeps one fact per
+sold product in compact NumPy arrays indexed by product id: day of sale, category code,
+sale flag and price in cents. The facts are summed once with `np.bincount` into a day x
+category x sale flag cube, and the month x category charts and the bucketed analytics
+series are sums over consecutive days of the cube (`np.add.reduceat`), computed without
+querying the database.
+
+The facts are loaded with one query on first use and kept up to date from the product
+change feed (`rollup.record_changes`) once the changes are committed, moving the product
+between the cells of the cube. A fact holds the current state of its product, so a change
+applied twice leaves it unchanged. The facts are tagged with the catalogue version they
+match: a version bumped by an interleaved write of this process, or by another process when
+the catalogue cache is shared, makes the next read reload them. The writes of the other
+processes are not seen with a process-local cache, so the facts are also reloaded once they
+are `PRODUCTS_ANALYTICS_MAX_AGE` seconds old.
+"""
+
+import datetime
+import threading
+import time
+from decimal import Decimal
+from functools import partial
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+
+from products import cache
+from products.models import Category, Product
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+EPOCH = datetime.date(1970, 1, 1)
+# day of the sales without a date of sale, before any day of a range
+NO_DATE = -(2**31)
+# category code of the ids without a sold product
+NOT_SOLD = -1
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def day_number(date):
+    return (date - EPOCH).days if date else NO_DATE
+
+
+def date_of(day):
+    return EPOCH + datetime.timedelta(days=int(day))
+
+
+def sold_fact(row):
+    """
+    Return the (day, category id, cents, is sale) fact of a change feed row, or None.
+    """
+    if not row or not row["sold"]:
+        return None
+    return (
+        day_number(row["date_of_sale"]),
+        row["category_id"],
+        int(Decimal(str(row["price"])) * 100),
+        bool(row["is_sale"]),
+    )
+
+
+def bucket_starts(days, granularity, unique=True):
+    """
+    Return the first day of the buckets of consecutive days (of every day without unique).
+    """
+    if granularity == "week":
+        # 1970-01-01 is a Thursday, weeks start on Monday
+        starts = (days + 3) // 7 * 7 - 3
+    elif granularity in ("month", "quarter"):
+        months = days.astype("datetime64[D]").astype("datetime64[M]").view("i8")
+        if granularity == "quarter":
+            months = months // 3 * 3
+        starts = months.astype("datetime64[M]").astype("datetime64[D]").view("i8")
+    else:
+        starts = days
+    return np.unique(starts) if unique else starts
+
+
+def sum_buckets(cells, days, granularity, head=None):
+    """
+    Sum the cube rows of consecutive days per bucket, after the optional head rows.
+    """
+    starts = bucket_starts(days, granularity, unique=False)
+    # position of the first day of every bucket
+    positions = np.flatnonzero(np.diff(starts, prepend=starts[0] - 1))
+    sums = np.add.reduceat(cells, positions, axis=0)
+    return sums if head is None else np.concatenate([head, sums])
+
+
+class SalesFacts:
+    """
+    Facts of the sold products of one catalogue version.
+
+    Attributes:
+        version: int: catalogue version the facts match
+        loaded: float: time.monotonic() when the facts were loaded
+        cube_items, cube_cents: numpy arrays: sold items and sales in cents per day,
+            category code and sale flag, kept up to date with the facts
+        day: numpy array: days since 1970-01-01 of the sales, by product id
+        category: numpy array: category codes, NOT_SOLD for ids without a sold product
+        cents: numpy array: prices in cents
+        sale: numpy array: sale flags
+        category_ids: list: category id of every category code
+        names: list: category name of every category code
+    """
+
+    def __init__(self, version, size=0):
+        self.version = version
+        self.loaded = time.monotonic()
+        self.day = np.full(size, NO_DATE, dtype=np.int32)
+        self.category = np.full(size, NOT_SOLD, dtype=np.int32)
+        self.cents = np.zeros(size, dtype=np.int64)
+        self.sale = np.zeros(size, dtype=bool)
+        self.category_ids = []
+        self.names = []
+        self.codes = {}
+        # sums per day, category and sale flag, built on first read
+        self.cube_items = self.cube_cents = None
+        self.first_day = self.last_day = None
+
+    @classmethod
+    def load(cls, version):
+        """
+        Load the facts of all the sold products from the primary database.
+        """
+        # a lagging replica would tag old facts with the current version
+        products = Product.objects.using(DEFAULT_DB_ALIAS)
+        rows = list(
+            products.filter(sold=True)
+            .values_list("id", "date_of_sale", "category_id", "price", "is_sale")
+            .order_by()
+        )
+        facts = cls(version, max((row[0] for row in rows), default=0) + 1)
+        for category_id, name in Category.objects.using(DEFAULT_DB_ALIAS).values_list(
+            "id", "name"
+        ):
+            facts.add_category(category_id, name)
+
+        if rows:
+            ids, dates, categories, prices, sales = zip(*rows)
+            ids = np.array(ids, dtype=np.int64)
+            facts.day[ids] = [day_number(date) for date in dates]
+            facts.category[ids] = [facts.codes[category] for category in categories]
+            facts.cents[ids] = [int(price * 100) for price in prices]
+            facts.sale[ids] = sales
+        return facts
+
+    def stale(self, version):
+        """
+        Return whether the facts must be reloaded to serve the catalogue version.
+        """
+        age = time.monotonic() - self.loaded
+        return self.version != version or age > settings.PRODUCTS_ANALYTICS_MAX_AGE
+
+    def add_category(self, category_id, name):
+        self.codes[category_id] = len(self.category_ids)
+        self.category_ids.append(category_id)
+        self.names.append(name)
+
+    def grow(self, size):
+        if size <= len(self.day):
+            return
+        size = max(size, 2 * len(self.day))
+        for name, fill in (
+            ("day", NO_DATE),
+            ("category", NOT_SOLD),
+            ("cents", 0),
+            ("sale", False),
+        ):
+            column = getattr(self, name)
+            grown = np.full(size, fill, dtype=column.dtype)
+            grown[: len(column)] = column
+            setattr(self, name, grown)
+
+    def apply(self, facts):
+        """
+        Set the facts of the changed products, a dict mapping the product id to its fact
+        (None for products deleted or no longer sold).
+        """
+        missing = {
+            fact[1]
+            for fact in facts.values()
+            if fact is not None and fact[1] not in self.codes
+        }
+        if missing:
+            for category_id, name in (
+                Category.objects.using(DEFAULT_DB_ALIAS)
+                .filter(id__in=missing)
+                .values_list("id", "name")
+            ):
+                self.add_category(category_id, name)
+
+        self.grow(max(facts) + 1)
+        for product_id, fact in facts.items():
+            if self.category[product_id] != NOT_SOLD:
+                self.count(product_id, -1)
+            if fact is None:
+                self.category[product_id] = NOT_SOLD
+                continue
+            day, category_id, cents, sale = fact
+            self.day[product_id] = day
+            self.category[product_id] = self.codes[category_id]
+            self.cents[product_id] = cents
+            self.sale[product_id] = sale
+            self.count(product_id, 1)
+
+    def build_cube(self):
+        """
+        Sum the facts per day, category and sale flag.
+
+        The cube has one row per day from the first sale to a year after today (row 0 holds
+        the sales without a date), so the charts only sum a few thousand cells.
+        """
+        sold = self.category != NOT_SOLD
+        day = self.day[sold].astype(np.int64)
+        dated = day != NO_DATE
+        today = day_number(timezone.localdate())
+        self.first_day = int(day[dated].min()) if dated.any() else today
+        self.last_day = max(int(day.max()) if dated.any() else today, today) + 366
+
+        shape = (self.last_day - self.first_day + 2, len(self.category_ids), 2)
+        rows = np.where(dated, day - self.first_day + 1, 0)
+        keys = (rows * shape[1] + self.category[sold]) * 2 + self.sale[sold]
+        size = shape[0] * shape[1] * 2
+        self.cube_items = np.bincount(keys, minlength=size).reshape(shape)
+        self.cube_cents = (
+            np.bincount(keys, weights=self.cents[sold], minlength=size)
+            .round()
+            .astype(np.int64)
+            .reshape(shape)
+        )
+
+    def count(self, product_id, sign):
+        """
+        Add (or remove) the fact of a product to the cube.
+        """
+        if self.cube_items is None:
+            return
+        day = int(self.day[product_id])
+        code = int(self.category[product_id])
+        if code >= self.cube_items.shape[1] or (
+            day != NO_DATE and not self.first_day <= day <= self.last_day
+        ):
+            # rebuilt with the new category or days on the next read
+            self.cube_items = self.cube_cents = None
+            return
+        cell = (
+            day - self.first_day + 1 if day != NO_DATE else 0,
+            code,
+            int(self.sale[product_id]),
+        )
+        self.cube_items[cell] += sign
+        self.cube_cents[cell] += sign * int(self.cents[product_id])
+
+    def cube(self):
+        if self.cube_items is None:
+            self.build_cube()
+        return self.cube_items, self.cube_cents
+
+    def month_rows(self):
+        """
+        Return the (month, category name, sales, items) rows of the sales chart, in the
+        order of the MonthlyCategorySales rollup.
+        """
+        cube_items, cube_cents = self.cube()
+        days = np.arange(self.first_day, self.last_day + 1)
+        # the undated sales come first, like the NULL months of the rollup
+        months = [None] + [date_of(start) for start in bucket_starts(days, "month")]
+        items = sum_buckets(cube_items[1:], days, "month", cube_items[:1]).sum(axis=2)
+        sales = sum_buckets(cube_cents[1:], days, "month", cube_cents[:1]).sum(axis=2)
+
+        return [
+            (
+                months[month],
+                self.names[code],
+                Decimal(int(sales[month, code])).scaleb(-2),
+                int(items[month, code]),
+            )
+            for month, code in np.argwhere(items > 0)
+        ]
+
+    def bucket_rows(self, date_from, date_to, granularity, category=None, split=None):
+        """
+        Return the sales of the range grouped by bucket, category (and split field), in the
+        shape of the analytics query rows.
+        """
+        cube_items, cube_cents = self.cube()
+        low = max(day_number(date_from), self.first_day)
+        high = min(day_number(date_to), self.last_day)
+        if low > high:
+            return []
+
+        rows = slice(low - self.first_day + 1, high - self.first_day + 2)
+        days = np.arange(low, high + 1)
+        starts = bucket_starts(days, granularity)
+        items = sum_buckets(cube_items[rows], days, granularity)
+        sales = sum_buckets(cube_cents[rows], days, granularity)
+        if not split:
+            items = items.sum(axis=2, keepdims=True)
+            sales = sales.sum(axis=2, keepdims=True)
+
+        result = []
+        for bucket, code, segment in np.argwhere(items > 0):
+            if category and self.names[code].lower() != category.lower():
+                continue
+            row = {
+                "bucket": date_of(starts[bucket]),
+                "category__name": self.names[code],
+                "total_sales": Decimal(int(sales[bucket, code, segment])).scaleb(-2),
+                "total_items": int(items[bucket, code, segment]),
+            }
+            if split:
+                row[split] = bool(segment)
+            result.append(row)
+        return result
+
+
+class ColumnarEngine:
+    """
+    Facts of the current catalogue version of this process.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.facts = None
+
+    def current(self):
+        version = cache.catalogue_version()
+        if self.facts is None or self.facts.stale(version):
+            self.facts = SalesFacts.load(version)
+        return self.facts
+
+    def month_rows(self):
+        with self.lock:
+            return self.current().month_rows()
+
+    def bucket_rows(self, *args, **kwargs):
+        with self.lock:
+            return self.current().bucket_rows(*args, **kwargs)
+
+    def apply(self, facts):
+        with self.lock:
+            if self.facts is not None:
+                self.facts.apply(facts)
+
+    def advance(self, version):
+        """
+        Tag the facts with a version bumped by this process after applying its changes.
+        """
+        with self.lock:
+            if self.facts is None:
+                return
+            if self.facts.version == version - 1:
+                self.facts.version = version
+            else:
+                # another write bumped the version in between
+                self.facts = None
+
+    def invalidate(self):
+        with self.lock:
+            self.facts = None
+
+
+def get_engine():
+    """
+    Return the columnar engine of this process, or None when the database is queried.
+    """
+    global _engine
+    if settings.PRODUCTS_ANALYTICS_ENGINE != "columnar":
+        return None
+    if np is None:
+        raise ImproperlyConfigured(
+            "PRODUCTS_ANALYTICS_ENGINE = 'columnar' requires NumPy (pip install numpy)."
+        )
+    with _engine_lock:
+        if _engine is None:
+            _engine = ColumnarEngine()
+        return _engine
+
+
+def record_changes(old_rows, new_rows):
+    """
+    Apply the changed products to the facts once the current transaction is committed.
+
+    - old_rows: change feed rows of the products before the change.
+    - new_rows: change feed rows of the products after the change.
+    """
+    engine = get_engine()
+    if engine is None:
+        return
+
+    facts = {row["id"]: None for row in old_rows if row}
+    for row in new_rows:
+        if not row:
+            continue
+        if row["id"] is None:
+            # the backend did not return the id of a created product
+            transaction.on_commit(engine.invalidate)
+            return
+        facts[row["id"]] = sold_fact(row)
+    if facts:
+        transaction.on_commit(partial(engine.apply, facts))
+
+
+def advance(version):
+    """
+    Move the facts to the catalogue version of a committed change of this process.
+    """
+    engine = get_engine()
+    if engine is not None:
+        transaction.on_commit(partial(engine.advance, version))
+
+
+def invalidate():
+    """
+    Reload the facts on the next read, after products were changed outside the feed.
+    """
+    engine = get_engine()
+    if engine is not None:
+        engine.invalidate()
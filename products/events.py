@@ -0,0 +1,326 @@
+"""
+Live catalogue events pushed to the dashboards with server-sent events.
+
+Committed changes of the sales rollup are published as per (month, category) deltas, so a
+dashboard applies them to the charts it loaded once instead of polling them. Catalogue
+changes are published with the new catalogue version, and a `reset` event asks the client
+to reload the charts when deltas were lost (rollup rebuild, slow client, expired history).
+
+The events are fanned out to the connected clients by a broker selected with
+`PRODUCTS_EVENTS_BACKEND`:
+
+- `InProcessBroker` (default) delivers the events published by the current process, which
+  fits a single ASGI worker.
+- `CacheBroker` shares the events between processes through the catalogue cache, which must
+  then be a shared backend (Redis, Memcached, database). Every process polls the cache once
+  per `PRODUCTS_EVENTS_POLL_INTERVAL` for all of its clients.
+
+Both keep the last `PRODUCTS_EVENTS_HISTORY` events, so a reconnecting client sending
+`Last-Event-ID` receives the events it missed. The ids of `InProcessBroker` start from the
+time the process started, so the ids of another worker or of a restarted process are not
+mistaken for ids of its history; a client whose last id is unknown gets a `reset`.
+"""
+
+import asyncio
+import collections
+import itertools
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from products.charts import ChartMatrix
+from products.models import Category
+
+logger = logging.getLogger(__name__)
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+class Subscription:
+    """
+    Queue of the events of one client, filled from any thread.
+
+    A client that falls `PRODUCTS_EVENTS_QUEUE_SIZE` events behind gets a `reset` event
+    instead of the events it could not keep up with.
+    """
+
+    def __init__(self, broker, loop, last_event_id=None):
+        self.broker = broker
+        self.loop = loop
+        self.queue = asyncio.Queue(settings.PRODUCTS_EVENTS_QUEUE_SIZE)
+        self.overflowed = False
+        # id of the last queued event, replayed events are not queued twice
+        self.position = last_event_id or 0
+
+    def put(self, event):
+        try:
+            self.loop.call_soon_threadsafe(self.put_nowait, event)
+        except RuntimeError:
+            # the event loop of the client is closed
+            self.broker.unsubscribe(self)
+
+    def put_nowait(self, event):
+        if self.overflowed:
+            return
+        if event["event"] != "reset" and event["id"] <= self.position:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+        else:
+            self.position = max(self.position, event["id"])
+
+    async def get(self, timeout):
+        """
+        Return the next event, or None when no event arrived within the timeout.
+        """
+        if self.overflowed:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.overflowed = False
+            return reset_event(self.position)
+
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+def reset_event(event_id):
+    return {"id": event_id, "event": "reset", "data": {}}
+
+
+class InProcessBroker:
+    """
+    Deliver the events to the subscribers of this process.
+    """
+
+    # the events do not reach the other processes
+    process_local = True
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = set()
+        self.history = collections.deque(maxlen=settings.PRODUCTS_EVENTS_HISTORY)
+        # per-process epoch, in microseconds so the ids stay exact JavaScript numbers
+        self.ids = itertools.count(time.time_ns() // 1000)
+
+    def last_id(self):
+        with self.lock:
+            return self.history[-1]["id"] if self.history else 0
+
+    def publish(self, event, data):
+        with self.lock:
+            message = {"id": next(self.ids), "event": event, "data": data}
+            self.history.append(message)
+            subscribers = list(self.subscribers)
+        for subscription in subscribers:
+            subscription.put(message)
+
+    def missed(self, last_event_id):
+        """
+        Return the events published after the given id, or None when some were dropped or
+        the id was not published by this broker.
+        """
+        with self.lock:
+            if not self.history or last_event_id > self.history[-1]["id"]:
+                return None
+            if last_event_id == self.history[-1]["id"]:
+                return []
+            if last_event_id < self.history[0]["id"] - 1:
+                return None
+            return [event for event in self.history if event["id"] > last_event_id]
+
+    def subscribe(self, loop, last_event_id=None):
+        """
+        Register a subscriber whose events are queued in the given event loop, replaying
+        the events published after `last_event_id`.
+        """
+        missed = [] if last_event_id is None else self.missed(last_event_id)
+        if missed is None:
+            # the client reloads everything, so it takes any event published from now on
+            missed = [reset_event(self.last_id())]
+            last_event_id = None
+        subscription = Subscription(self, loop, last_event_id)
+        # queued before any live event of the new subscriber
+        for event in missed:
+            subscription.put(event)
+
+        with self.lock:
+            self.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscribers.discard(subscription)
+
+
+class CacheBroker(InProcessBroker):
+    """
+    Share the events between processes through the catalogue cache.
+
+    Published events are stored under a sequence number incremented in the cache. A daemon
+    thread of every process reads the new events once per poll interval and delivers them
+    to the subscribers of the process.
+    """
+
+    SEQUENCE_KEY = "products:events:sequence"
+    process_local = False
+
+    def __init__(self):
+        super().__init__()
+        self.cache = caches[settings.PRODUCTS_CACHE_ALIAS]
+        self.timeout = settings.PRODUCTS_CACHE_TIMEOUT
+        self.poller = None
+        self.position = None
+        self.pending_since = None
+
+    def event_key(self, event_id):
+        return f"products:events:{event_id}"
+
+    def last_id(self):
+        return self.cache.get(self.SEQUENCE_KEY) or 0
+
+    def publish(self, event, data):
+        try:
+            event_id = self.cache.incr(self.SEQUENCE_KEY)
+        except ValueError:
+            self.cache.add(self.SEQUENCE_KEY, 0, timeout=None)
+            event_id = self.cache.incr(self.SEQUENCE_KEY)
+        message = {"id": event_id, "event": event, "data": data}
+        self.cache.set(self.event_key(event_id), message, timeout=self.timeout)
+
+    def missed(self, last_event_id):
+        last_id = self.last_id()
+        if last_event_id > last_id:
+            # the sequence was lost with the cache
+            return None
+        if last_event_id == last_id:
+            return []
+        ids = range(last_event_id + 1, last_id + 1)
+        if len(ids) > settings.PRODUCTS_EVENTS_HISTORY:
+            return None
+        events = self.cache.get_many([self.event_key(i) for i in ids])
+        if len(events) < len(ids):
+            return None
+        return [events[self.event_key(i)] for i in ids]
+
+    def subscribe(self, loop, last_event_id=None):
+        with self.lock:
+            if self.poller is None:
+                self.position = self.last_id()
+                self.poller = threading.Thread(
+                    target=self.poll, name="products-events", daemon=True
+                )
+                self.poller.start()
+        return super().subscribe(loop, last_event_id)
+
+    def poll(self):
+        interval = settings.PRODUCTS_EVENTS_POLL_INTERVAL
+        while True:
+            time.sleep(interval)
+            try:
+                self.poll_once(interval)
+            except Exception:
+                logger.exception("Reading the product events from the cache failed")
+
+    def poll_once(self, interval):
+        last_id = self.last_id()
+        if not self.subscribers:
+            self.position = last_id
+            return
+
+        ids = range(self.position + 1, last_id + 1)
+        if len(ids) > settings.PRODUCTS_EVENTS_HISTORY:
+            self.deliver(reset_event(last_id))
+            self.position = last_id
+            return
+
+        events = self.cache.get_many([self.event_key(i) for i in ids])
+        for event_id in ids:
+            event = events.get(self.event_key(event_id))
+            if event is None:
+                # the publisher incremented the sequence but has not stored the event
+                # yet: wait for it a little, then give up on it
+                self.pending_since = self.pending_since or time.monotonic()
+                if time.monotonic() - self.pending_since < 10 * interval:
+                    return
+                event = reset_event(event_id)
+            self.pending_since = None
+            self.deliver(event)
+            self.position = event_id
+
+    def deliver(self, event):
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscription in subscribers:
+            subscription.put(event)
+
+
+def get_broker():
+    """
+    Return the broker of this process, created from `PRODUCTS_EVENTS_BACKEND`.
+    """
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = import_string(settings.PRODUCTS_EVENTS_BACKEND)()
+        return _broker
+
+
+def publish(event, data):
+    """
+    Publish an event once the current transaction is committed.
+    """
+    transaction.on_commit(lambda: get_broker().publish(event, data))
+
+
+def publish_sales(deltas):
+    """
+    Publish rollup deltas, a dict mapping (month, category id) to [sales, items].
+
+    The deltas are published without subscribers too: a client reconnecting to the
+    process replays them from the history.
+    """
+    if not deltas:
+        return
+
+    names = dict(
+        Category.objects.filter(
+            id__in={category for _, category in deltas}
+        ).values_list("id", "name")
+    )
+    publish(
+        "sales",
+        {
+            "deltas": [
+                {
+                    "month": month.isoformat() if month else None,
+                    "label": ChartMatrix.month_label(month),
+                    "category": names.get(category),
+                    "sales": f"{sales:.2f}",
+                    "items": items,
+                }
+                for (month, category), (sales, items) in deltas.items()
+            ]
+        },
+    )
+
+
+def format_event(message):
+    """
+    Return the event in the server-sent events wire format.
+    """
+    data = json.dumps(message["data"], separators=(",", ":"))
+    return f"id: {message['id']}\nevent: {message['event']}\ndata: {data}\n\n"
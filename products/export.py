@@ -0,0 +1,56 @@
+"""
+Streaming export of the product catalogue as NDJSON or CSV.
+
+Rows are read with `values()` through `QuerySet.iterator()` and converted by the
+ProductRowSerializer, so only one chunk of rows is held in memory whatever the size of
+the export.
+"""
+
+import csv
+import json
+
+CONTENT_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+class Echo:
+    """
+    File-like object returning what is written, for `csv.writer` in a streaming response.
+    """
+
+    def write(self, value):
+        return value
+
+
+def to_csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return value
+
+
+def export_rows(queryset, row_serializer, chunk_size=2000):
+    rows = row_serializer.values(queryset).iterator(chunk_size=chunk_size)
+    for row in rows:
+        yield row_serializer.to_representation(row)
+
+
+def stream_ndjson(queryset, row_serializer, chunk_size=2000):
+    for item in export_rows(queryset, row_serializer, chunk_size):
+        yield json.dumps(item, ensure_ascii=False) + "\n"
+
+
+def stream_csv(queryset, row_serializer, chunk_size=2000):
+    writer = csv.writer(Echo())
+    yield writer.writerow(row_serializer.fields)
+    for item in export_rows(queryset, row_serializer, chunk_size):
+        yield writer.writerow([to_csv_value(value) for value in item.values()])
+
+
+STREAMS = {
+    "ndjson": stream_ndjson,
+    "csv": stream_csv,
+}
@@ -0,0 +1,71 @@
+"""
+Filter panel facets of the product list.
+
+The per-category statistics of the filtered products are computed with one query grouped
+on the category id (joined to its name);
+the overall totals and price range are derived from the grouped rows. The averages are
+computed from the exact decimal price sums, not from the float averages of the database.
+"""
+
+from decimal import Decimal
+
+from django.db.models import Count, Max, Min, Q, Sum
+
+CENT = Decimal("0.01")
+
+
+def round_price(value):
+    return value.quantize(CENT) if value is not None else None
+
+
+def product_facets(queryset):
+    """
+    Return the product count, sold count and price statistics of the queryset, in total
+    and per category.
+
+    - queryset: the (filtered) Product queryset.
+    """
+    rows = (
+        queryset.order_by()
+        .values("category_id", "category__name")
+        .annotate(
+            count=Count("id"),
+            sold=Count("id", filter=Q(sold=True)),
+            min_price=Min("price"),
+            max_price=Max("price"),
+            total_price=Sum("price"),
+        )
+        .order_by("category__name")
+    )
+
+    categories = []
+    count = sold = 0
+    total_price = Decimal("0")
+    min_price = max_price = None
+    for row in rows:
+        categories.append(
+            {
+                "category": row["category__name"],
+                "count": row["count"],
+                "sold": row["sold"],
+                "min_price": row["min_price"],
+                "max_price": row["max_price"],
+                "avg_price": round_price(row["total_price"] / row["count"]),
+            }
+        )
+        count += row["count"]
+        sold += row["sold"]
+        total_price += row["total_price"]
+        if min_price is None or row["min_price"] < min_price:
+            min_price = row["min_price"]
+        if max_price is None or row["max_price"] > max_price:
+            max_price = row["max_price"]
+
+    return {
+        "count": count,
+        "sold": sold,
+        "min_price": min_price,
+        "max_price": max_price,
+        "avg_price": round_price(total_price / count) if count else None,
+        "categories": categories,
+    }
@@ -0,0 +1,251 @@
+"""
+Bulk product import pipeline.
+
+Rows are streamed from JSON (array), JSONL or CSV input, validated in chunks with the
+ProductSerializer and upserted by title: the titles of a chunk are resolved to existing ids
+with one query, then a single `bulk_create(update_conflicts=True)` inserts the new products
+and updates the existing ones. Each chunk runs in its own transaction and invalidates the
+cached catalogue responses once committed, so they never lag behind the imported products
+for longer than a chunk. Invalid rows, including JSON lines that cannot be parsed, are
+collected instead of aborting the import.
+"""
+
+import csv
+import itertools
+import json
+import time
+
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from products import rollup
+from products.cache import bump_catalogue_version
+from products.models import Product
+from products.serializers import ProductSerializer, resolve_categories
+
+# fields written when an existing product is upserted
+UPDATE_FIELDS = [
+    field.name for field in Product._meta.concrete_fields if not field.primary_key
+]
+
+FORMATS = {
+    ".json": "json",
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+    ".csv": "csv",
+}
+
+
+class InvalidRow:
+    """
+    Row yielded by a reader in place of an input row that could not be parsed.
+
+    The importer records its errors like the validation errors of the other rows.
+    """
+
+    def __init__(self, message):
+        self.errors = {"non_field_errors": [message]}
+
+
+def read_json(file, block_size=64 * 1024):
+    """
+    Yield the items of a JSON array without loading the whole document.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    started = False
+    eof = False
+
+    while True:
+        buffer = buffer.lstrip()
+        if started and buffer.startswith(","):
+            buffer = buffer[1:].lstrip()
+        if started and buffer.startswith("]"):
+            return
+
+        if buffer and not started:
+            if not buffer.startswith("["):
+                raise ValueError("The JSON input must be an array of products")
+            buffer = buffer[1:]
+            started = True
+            continue
+
+        try:
+            if not buffer:
+                raise json.JSONDecodeError("Need more data", buffer, 0)
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            if eof:
+                raise ValueError("Unexpected end of the JSON input")
+            block = file.read(block_size)
+            eof = not block
+            buffer += block
+            continue
+
+        yield item
+        buffer = buffer[end:]
+
+
+def read_jsonl(file):
+    """
+    Yield one product per non-empty line of a JSON lines file.
+
+    A line which is not valid JSON yields an InvalidRow, so the following lines are still
+    imported.
+    """
+    for line in file:
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as error:
+            row = InvalidRow(f"Invalid JSON: {error.msg} (column {error.colno})")
+        yield row
+
+
+def read_csv(file):
+    """
+    Yield one product per CSV row, empty cells are treated as missing values.
+    """
+    for row in csv.DictReader(file):
+        yield {key: value for key, value in row.items() if value not in ("", None)}
+
+
+READERS = {
+    "json": read_json,
+    "jsonl": read_jsonl,
+    "csv": read_csv,
+}
+
+
+def detect_format(path):
+    for extension, name in FORMATS.items():
+        if str(path).lower().endswith(extension):
+            return name
+    raise ValueError(f"Unknown input format for {path}, use one of {set(READERS)}")
+
+
+class ImportReport:
+    """
+    Summary of an import run.
+
+    Attributes:
+        rows: int: number of processed rows
+        created: int: number of created products
+        updated: int: number of updated products
+        errors: list: (row number, errors) of the rows that could not be imported
+        elapsed: float: duration of the import in seconds
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.errors = []
+        self.elapsed = 0.0
+
+    @property
+    def rate(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return (
+            f"{self.rows} rows: {self.created} created, {self.updated} updated, "
+            f"{len(self.errors)} failed in {self.elapsed:.2f}s ({self.rate:.0f} rows/sec)"
+        )
+
+
+class ProductImporter:
+    """
+    Upsert products keyed on their title.
+
+    - chunk_size: number of rows validated and written per transaction.
+    """
+
+    def __init__(self, chunk_size=1000):
+        self.chunk_size = chunk_size
+        # one serializer validates all the rows, so its fields are only built once
+        self.validator = ProductSerializer()
+
+    def run(self, rows, report=None):
+        """
+        Import an iterable of product dicts and return the ImportReport.
+        """
+        report = report or ImportReport()
+        started = time.perf_counter()
+
+        numbered = enumerate(rows, start=1)
+        while chunk := list(itertools.islice(numbered, self.chunk_size)):
+            self.import_chunk(chunk, report)
+            report.rows += len(chunk)
+
+        report.elapsed = time.perf_counter() - started
+        return report
+
+    def validate_chunk(self, chunk, report):
+        """
+        Return the validated data of the chunk by title (the last row of a title wins).
+        """
+        valid = {}
+        for number, row in chunk:
+            if isinstance(row, InvalidRow):
+                report.errors.append((number, row.errors))
+                continue
+            if not isinstance(row, dict):
+                errors = {"non_field_errors": ["Expected an object"]}
+                report.errors.append((number, errors))
+                continue
+
+            try:
+                data = self.validator.run_validation(row)
+            except ValidationError as error:
+                report.errors.append((number, error.detail))
+            else:
+                valid[data["title"]] = data
+        return valid
+
+    def import_chunk(self, chunk, report):
+        valid = self.validate_chunk(chunk, report)
+        if not valid:
+            return
+
+        with transaction.atomic():
+            resolve_categories(valid.values())
+
+            # keep the first product of a title, like the previous filter().first() lookup
+            existing = {}
+            products = Product.objects.filter(title__in=list(valid)).order_by("-id")
+            for product in products:
+                existing[product.title] = product
+
+            old_rows = []
+            created = []
+            updated = []
+            for title, data in valid.items():
+                product = existing.get(title)
+                if product is None:
+                    created.append(Product(**data))
+                    continue
+
+                old_rows.append(rollup.product_row(product))
+                for field, value in data.items():
+                    setattr(product, field, value)
+                updated.append(product)
+
+            # a single INSERT ... ON CONFLICT (id) DO UPDATE writes both lists
+            Product.objects.bulk_create(
+                created + updated,
+                update_conflicts=True,
+                unique_fields=["id"],
+                update_fields=UPDATE_FIELDS,
+            )
+
+            # bulk operations do not send the model signals
+            rollup.record_changes(
+                old_rows, [rollup.product_row(product) for product in created + updated]
+            )
+
+        # the products of the chunk are visible now, the cached responses are stale
+        bump_catalogue_version()
+        report.created += len(created)
+        report.updated += len(updated)
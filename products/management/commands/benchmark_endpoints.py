@@ -0,0 +1,205 @@
+import datetime
+import json
+import platform
+import statistics
+import subprocess
+import time
+from contextlib import ExitStack
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client, override_settings
+from django.test.utils import setup_databases, teardown_databases
+from rest_framework_simplejwt.tokens import AccessToken
+
+from products.cache import bump_catalogue_version
+from products.models import Product
+
+ENDPOINTS = {
+    "list": "/api/products/list",
+    "list_filtered": "/api/products/list?category=electronics&min_price=50"
+    "&max_price=500&ordering=-price",
+    "list_search": "/api/products/list?search=premium&ordering=title",
+    "list_deep_offset": "/api/products/list?offset=10000&ordering=price",
+    "list_cursor": "/api/products/list?pagination=cursor&ordering=-price",
+    "categories": "/api/products/categories",
+    "price_range": "/api/products/price_range",
+    "sales_chart": "/api/products/sales_chart",
+    "items_chart": "/api/products/items_chart",
+    "dashboard_chart": "/api/products/dashboard_chart",
+    "analytics": "/api/products/analytics?granularity=week",
+}
+
+BENCHMARK_USERNAME = "benchmark"
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    index = round(percent / 100 * (len(ordered) - 1))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    """
+    Drive the product endpoints through the Django test client and report their latency.
+
+    The benchmark runs on throwaway test databases (like the test runner's), seeded with
+    `--rows` synthetic products and destroyed at the end, so the configured database is
+    never written. Every endpoint is requested `--requests` times after a few warmup
+    requests, with a JWT of a dedicated benchmark user. The report gives the p50/p95
+    latency, the queries per request on all the databases and the throughput of each
+    endpoint, and can be written as JSON to compare runs across commits.
+    """
+
+    help = "Benchmark the latency, queries and throughput of the product endpoints."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows", type=int, default=100_000, help="Number of products to seed."
+        )
+        parser.add_argument(
+            "--seed", type=int, default=0, help="Seed of the synthetic products."
+        )
+        parser.add_argument(
+            "--requests", type=int, default=50, help="Measured requests per endpoint."
+        )
+        parser.add_argument(
+            "--warmup", type=int, default=3, help="Unmeasured requests per endpoint."
+        )
+        parser.add_argument(
+            "--endpoints",
+            nargs="*",
+            choices=sorted(ENDPOINTS),
+            default=list(ENDPOINTS),
+            help="Endpoints to benchmark (all by default).",
+        )
+        parser.add_argument(
+            "--cold",
+            action="store_true",
+            help="Invalidate the catalogue cache before every request.",
+        )
+        parser.add_argument("--output", help="Write the report as JSON to this file.")
+
+    def handle(self, *args, **options):
+        if options["requests"] < 1:
+            raise CommandError("--requests must be at least 1.")
+
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            # the cached responses of the configured database do not match the test data
+            bump_catalogue_version()
+            call_command(
+                "generate_products",
+                options["rows"],
+                seed=options["seed"],
+                stdout=self.stdout,
+            )
+            report = self.run(options)
+        finally:
+            bump_catalogue_version()
+            teardown_databases(old_config, verbosity=0)
+
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as file:
+                json.dump(report, file, indent=2)
+            self.stdout.write(
+                self.style.SUCCESS(f"Report written to {options['output']}")
+            )
+
+    def run(self, options):
+        user = User.objects.create(username=BENCHMARK_USERNAME)
+        client = Client(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+
+        results = {}
+        allowed_hosts = [*settings.ALLOWED_HOSTS, "testserver"]
+        with override_settings(ALLOWED_HOSTS=allowed_hosts):
+            for name in options["endpoints"]:
+                results[name] = self.measure(client, ENDPOINTS[name], options)
+                self.report(name, results[name])
+
+        return {"environment": self.environment(options), "endpoints": results}
+
+    def measure(self, client, path, options):
+        for _ in range(options["warmup"]):
+            client.get(path)
+
+        timings = []
+        queries = []
+        statuses = {}
+        counter = QueryCounter()
+        with ExitStack() as stack:
+            # the reads may run on the replica
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(counter))
+            started = time.perf_counter()
+            for _ in range(options["requests"]):
+                if options["cold"]:
+                    bump_catalogue_version()
+                counter.count = 0
+                request_started = time.perf_counter()
+                response = client.get(path)
+                timings.append(time.perf_counter() - request_started)
+                queries.append(counter.count)
+                status = str(response.status_code)
+                statuses[status] = statuses.get(status, 0) + 1
+            elapsed = time.perf_counter() - started
+
+        return {
+            "path": path,
+            "requests": options["requests"],
+            "statuses": statuses,
+            "p50_ms": round(percentile(timings, 50) * 1000, 3),
+            "p95_ms": round(percentile(timings, 95) * 1000, 3),
+            "mean_ms": round(statistics.mean(timings) * 1000, 3),
+            "max_ms": round(max(timings) * 1000, 3),
+            "queries_per_request": round(statistics.mean(queries), 2),
+            "throughput_rps": round(options["requests"] / elapsed, 1),
+        }
+
+    def report(self, name, result):
+        ok = set(result["statuses"]) == {"200"}
+        style = self.style.SUCCESS if ok else self.style.WARNING
+        self.stdout.write(
+            style(
+                f"{name}: p50 {result['p50_ms']:.2f} ms, p95 {result['p95_ms']:.2f} ms, "
+                f"{result['queries_per_request']:g} queries/request, "
+                f"{result['throughput_rps']:.1f} req/s {result['statuses']}"
+            )
+        )
+
+    def environment(self, options):
+        try:
+            commit = subprocess.run(
+                ["git", "rev-parse", "HEAD"],
+                cwd=settings.BASE_DIR,
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+
+        return {
+            "commit": commit,
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "products": Product.objects.count(),
+            "database": connection.vendor,
+            "cache": settings.CACHES[settings.PRODUCTS_CACHE_ALIAS]["BACKEND"],
+            "cold": options["cold"],
+            "warmup": options["warmup"],
+            "python": platform.python_version(),
+            "django": django.get_version(),
+        }
@@ -0,0 +1,110 @@
+import itertools
+import time
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from products import rollup
+from products.models import Product
+from products.synthetic import generate_products
+from products.views import ProductFilter
+
+BENCHMARK_ALIAS = "benchmark"
+
+
+class Command(BaseCommand):
+    """
+    Show the query plans and timings of the product list and chart queries with and without
+    the Product indexes.
+
+    The benchmark runs on a separate SQLite database file which is migrated and seeded with
+    synthetic products on the first run and reused afterwards.
+    """
+
+    help = (
+        "Compare query plans of the product queries before/after the Product indexes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows", type=int, default=1_000_000, help="Number of products to seed."
+        )
+        parser.add_argument(
+            "--path",
+            default=str(settings.BASE_DIR / "benchmark.sqlite3"),
+            help="SQLite database file used for the benchmark.",
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=5, help="Runs per query (best is reported)."
+        )
+
+    def handle(self, *args, **options):
+        databases = dict(connections.settings)
+        databases[BENCHMARK_ALIAS] = {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": options["path"],
+        }
+        connections.settings = connections.configure_settings(databases)
+
+        call_command("migrate", "products", database=BENCHMARK_ALIAS, verbosity=0)
+        self.seed(options["rows"])
+
+        products = Product.objects.using(BENCHMARK_ALIAS)
+        queries = {
+            "category filter": ProductFilter(
+                {"category": "electronics"}, queryset=products
+            ).qs[:10],
+            "price range ordered by price": ProductFilter(
+                {"min_price": 100, "max_price": 120},
+                queryset=products.order_by("price"),
+            ).qs[:10],
+            "sold ordered by title": ProductFilter(
+                {"sold": "false"}, queryset=products.order_by("title")
+            ).qs[:10],
+            "chart aggregation": rollup.aggregate_sales().using(BENCHMARK_ALIAS),
+        }
+
+        indexes = Product._meta.indexes
+        connection = connections[BENCHMARK_ALIAS]
+        try:
+            with connection.schema_editor() as editor:
+                for index in indexes:
+                    editor.remove_index(Product, index)
+            self.report("without indexes", queries, options["repeat"])
+        finally:
+            with connection.schema_editor() as editor:
+                for index in indexes:
+                    editor.add_index(Product, index)
+            connection.cursor().execute("ANALYZE")
+
+        self.report("with indexes", queries, options["repeat"])
+
+    def seed(self, rows):
+        products = Product.objects.using(BENCHMARK_ALIAS)
+        existing = products.count()
+        missing = rows - existing
+        if missing <= 0:
+            return
+
+        self.stdout.write(f"Seeding {missing} products...")
+        generator = generate_products(
+            missing, seed=existing, start=existing, using=BENCHMARK_ALIAS
+        )
+        while batch := list(itertools.islice(generator, 10_000)):
+            products.bulk_create(batch)
+
+    def report(self, label, queries, repeat):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n== {label} =="))
+        for name, queryset in queries.items():
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                list(queryset.all())
+                timings.append(time.perf_counter() - started)
+
+            self.stdout.write(
+                self.style.SUCCESS(f"{name}: {min(timings) * 1000:.2f} ms")
+            )
+            self.stdout.write(queryset.explain())
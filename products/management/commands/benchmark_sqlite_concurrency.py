@@ -0,0 +1,185 @@
+import itertools
+import random
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+
+from products.models import Product
+from products.synthetic import generate_products
+from products.views import ProductFilter
+
+PROFILES = {
+    "default": {},
+    "tuned": settings.SQLITE_TUNED_OPTIONS,
+}
+
+
+class Command(BaseCommand):
+    """
+    Compare the throughput of concurrent product reads and writes on SQLite with the default
+    connection settings and with the tuned profile (`DJANGO_DB_SQLITE_TUNING`).
+
+    Each profile gets a fresh SQLite file seeded with synthetic products. Worker threads,
+    each with its own connection, then run a mix of product list reads and of the writes of
+    the CRUD views (read a product and update it in a transaction, or create one) for a
+    fixed duration. "database is locked" errors are counted as failed operations.
+    """
+
+    help = (
+        "Benchmark concurrent product reads/writes on SQLite with and without tuning."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows", type=int, default=50_000, help="Number of products to seed."
+        )
+        parser.add_argument(
+            "--threads", type=int, default=8, help="Number of concurrent workers."
+        )
+        parser.add_argument(
+            "--duration", type=float, default=10, help="Seconds to run each profile."
+        )
+        parser.add_argument(
+            "--write-ratio",
+            type=float,
+            default=0.2,
+            help="Share of the operations that are writes.",
+        )
+
+    def handle(self, *args, **options):
+        results = {}
+        with tempfile.TemporaryDirectory() as directory:
+            for name, profile in PROFILES.items():
+                alias = f"benchmark_{name}"
+                self.configure(alias, Path(directory) / f"{name}.sqlite3", profile)
+                try:
+                    self.seed(alias, options["rows"])
+                    results[name] = self.run(alias, options)
+                finally:
+                    connections[alias].close()
+
+        self.report(results)
+
+    def configure(self, alias, path, profile):
+        databases = dict(connections.settings)
+        databases[alias] = {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": str(path),
+            "OPTIONS": dict(profile),
+        }
+        connections.settings = connections.configure_settings(databases)
+
+    def seed(self, alias, rows):
+        call_command("migrate", "products", database=alias, verbosity=0)
+        self.stdout.write(f"Seeding {rows} products in {alias}...")
+        generator = generate_products(rows, using=alias)
+        while batch := list(itertools.islice(generator, 10_000)):
+            Product.objects.using(alias).bulk_create(batch)
+
+    def run(self, alias, options):
+        last_id = (
+            Product.objects.using(alias).order_by("-id").values_list("id", flat=True)[0]
+        )
+        template = Product.objects.using(alias).first()
+        counters = {"reads": 0, "writes": 0, "errors": 0}
+        latencies = []
+        lock = threading.Lock()
+        deadline = time.perf_counter() + options["duration"]
+
+        def worker(seed):
+            rng = random.Random(seed)
+            local = {"reads": 0, "writes": 0, "errors": 0}
+            timings = []
+            try:
+                while time.perf_counter() < deadline:
+                    started = time.perf_counter()
+                    try:
+                        if rng.random() < options["write_ratio"]:
+                            self.write(alias, rng, last_id, template)
+                            local["writes"] += 1
+                        else:
+                            self.read(alias, rng)
+                            local["reads"] += 1
+                    except OperationalError:
+                        local["errors"] += 1
+                    timings.append(time.perf_counter() - started)
+            finally:
+                connections[alias].close()
+            with lock:
+                for key, value in local.items():
+                    counters[key] += value
+                latencies.extend(timings)
+
+        threads = [
+            threading.Thread(target=worker, args=(seed,))
+            for seed in range(options["threads"])
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        return {
+            **counters,
+            "ops_per_second": (counters["reads"] + counters["writes"]) / elapsed,
+            "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0,
+        }
+
+    def read(self, alias, rng):
+        # first page of a filtered product list, as served by the list endpoint
+        low = rng.randint(1, 500)
+        queryset = ProductFilter(
+            {"min_price": low, "max_price": low + 50},
+            queryset=Product.objects.using(alias).order_by("-id"),
+        ).qs
+        queryset.count()
+        list(queryset[:20])
+
+    def write(self, alias, rng, last_id, template):
+        with transaction.atomic(using=alias):
+            if rng.random() < 0.5:
+                # read then update, like the update view
+                product = Product.objects.using(alias).get(pk=rng.randint(1, last_id))
+                Product.objects.using(alias).filter(pk=product.pk).update(
+                    price=product.price + Decimal("0.01")
+                )
+            else:
+                Product.objects.using(alias).bulk_create(
+                    [
+                        Product(
+                            title=template.title,
+                            price=template.price,
+                            description=template.description,
+                            category_id=template.category_id,
+                            image=template.image,
+                        )
+                    ]
+                )
+
+    def report(self, results):
+        self.stdout.write(
+            self.style.MIGRATE_HEADING(
+                "\nprofile  ops/s  reads  writes  errors  p95 ms"
+            )
+        )
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<8} {result['ops_per_second']:>5.0f} {result['reads']:>6} "
+                f"{result['writes']:>7} {result['errors']:>7} {result['p95_ms']:>7.1f}"
+            )
+        if results["default"]["ops_per_second"]:
+            gain = (
+                results["tuned"]["ops_per_second"]
+                / results["default"]["ops_per_second"]
+            )
+            self.stdout.write(self.style.SUCCESS(f"Tuned throughput: {gain:.2f}x"))
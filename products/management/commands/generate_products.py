@@ -0,0 +1,74 @@
+import datetime
+import itertools
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from products import rollup, signals
+from products.models import Product
+from products.synthetic import generate_products
+
+
+class Command(BaseCommand):
+    """
+    Insert synthetic products with realistic category, price and sale date distributions.
+
+    The products are bulk inserted with the model signals muted and the sales rollup is
+    rebuilt once at the end. The same arguments always produce the same catalogue.
+    """
+
+    help = "Generate N synthetic products for benchmarks."
+
+    def add_arguments(self, parser):
+        parser.add_argument("count", type=int, help="Number of products to generate.")
+        parser.add_argument(
+            "--seed", type=int, default=0, help="Seed of the random generator."
+        )
+        parser.add_argument(
+            "--end-date",
+            type=datetime.date.fromisoformat,
+            default=None,
+            help="Last possible sale date (YYYY-MM-DD), today by default.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Number of products inserted per query.",
+        )
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Delete all the existing products first.",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        with signals.muted():
+            if options["clear"]:
+                Product.objects.all().delete()
+
+            existing = Product.objects.count()
+            generator = generate_products(
+                options["count"],
+                seed=options["seed"],
+                start=existing,
+                today=options["end_date"],
+            )
+            inserted = 0
+            while batch := list(itertools.islice(generator, options["batch_size"])):
+                with transaction.atomic():
+                    Product.objects.bulk_create(batch)
+                inserted += len(batch)
+                if options["verbosity"] > 1:
+                    self.stdout.write(f"{inserted}/{options['count']}")
+
+        rows = rollup.rebuild()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Generated {inserted} products in {elapsed:.1f}s "
+                f"({inserted / elapsed:.0f} rows/s), {rows} rollup rows"
+            )
+        )
@@ -0,0 +1,62 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products.importer import READERS, ProductImporter, detect_format
+
+
+class Command(BaseCommand):
+    """
+    Import products from a JSON, JSONL or CSV file.
+
+    Products are upserted by title in chunks; invalid rows are reported at the end instead
+    of stopping the import.
+    """
+
+    help = "Bulk import products from a JSON, JSONL or CSV file ('-' for stdin)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Input file, or '-' to read from stdin.")
+        parser.add_argument(
+            "--format",
+            choices=sorted(READERS),
+            help="Input format (detected from the file extension by default).",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Number of rows validated and written per transaction.",
+        )
+        parser.add_argument(
+            "--show-errors",
+            type=int,
+            default=20,
+            help="Maximum number of row errors to print.",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        try:
+            input_format = options["format"] or detect_format(path)
+        except ValueError as error:
+            raise CommandError(error)
+
+        importer = ProductImporter(chunk_size=options["chunk_size"])
+        file = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")
+        try:
+            report = importer.run(READERS[input_format](file))
+        except ValueError as error:
+            raise CommandError(f"Could not read {path}: {error}")
+        finally:
+            if file is not sys.stdin:
+                file.close()
+
+        for number, errors in report.errors[: options["show_errors"]]:
+            self.stderr.write(f"Row {number}: {json.dumps(errors)}")
+        if len(report.errors) > options["show_errors"]:
+            self.stderr.write(f"... {len(report.errors) - options['show_errors']} more")
+
+        style = self.style.WARNING if report.errors else self.style.SUCCESS
+        self.stdout.write(style(str(report)))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from products import rollup
+
+
+class Command(BaseCommand):
+    """
+    Rebuild the MonthlyCategorySales rollup table from the Product table.
+
+    Use it after loading data with operations that bypass the model signals
+    (e.g. `QuerySet.update()` or `bulk_create()`).
+    """
+
+    help = "Rebuild the monthly sales rollup used by the chart endpoints."
+
+    def handle(self, *args, **options):
+        rows = rollup.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt sales rollup: {rows} rows"))
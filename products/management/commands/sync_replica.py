@@ -0,0 +1,41 @@
+import sqlite3
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from products.cache import bump_catalogue_version
+from sales_monitor_api.db import REPLICA_ALIAS, replica_configured
+
+
+class Command(BaseCommand):
+    """
+    Copy the primary SQLite database to the replica SQLite database.
+
+    Two SQLite files stand in for a PostgreSQL primary and its streaming replica during
+    local testing: run it after migrating or loading data, and again to "replicate" the
+    writes made since.
+    """
+
+    help = "Copy the primary SQLite database to the local read replica file."
+
+    def handle(self, *args, **options):
+        if not replica_configured():
+            raise CommandError("No replica database is configured.")
+
+        primary = connections[DEFAULT_DB_ALIAS]
+        replica = connections[REPLICA_ALIAS]
+        if primary.vendor != "sqlite" or replica.vendor != "sqlite":
+            raise CommandError("Only SQLite replicas can be synchronised locally.")
+
+        # the replica connection must not hold the file open while it is replaced
+        replica.close()
+        primary.ensure_connection()
+        with sqlite3.connect(replica.settings_dict["NAME"]) as target:
+            primary.connection.backup(target)
+        target.close()
+        # responses cached from the stale replica are outdated now
+        bump_catalogue_version()
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Copied {primary.settings_dict['NAME']} to the replica")
+        )
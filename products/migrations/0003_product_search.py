@@ -0,0 +1,88 @@
+from django.db import migrations
+
+# The statements are kept here rather than imported from the app, so the migration does not
+# change when the search code does.
+SQLITE_SETUP = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_product_fts USING fts5(
+        title, description,
+        content='products_product', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_product_fts_insert
+    AFTER INSERT ON products_product
+    BEGIN
+        INSERT INTO products_product_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_product_fts_delete
+    AFTER DELETE ON products_product
+    BEGIN
+        INSERT INTO products_product_fts(products_product_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_product_fts_update
+    AFTER UPDATE OF title, description ON products_product
+    BEGIN
+        INSERT INTO products_product_fts(products_product_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO products_product_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    "INSERT INTO products_product_fts(products_product_fts) VALUES ('rebuild')",
+]
+
+SQLITE_TEARDOWN = [
+    "DROP TRIGGER IF EXISTS products_product_fts_insert",
+    "DROP TRIGGER IF EXISTS products_product_fts_delete",
+    "DROP TRIGGER IF EXISTS products_product_fts_update",
+    "DROP TABLE IF EXISTS products_product_fts",
+]
+
+
+def search_index():
+    from django.contrib.postgres.indexes import GinIndex
+    from django.contrib.postgres.search import SearchVector
+
+    return GinIndex(
+        SearchVector("title", "description", config="english"),
+        name="product_search_vector_idx",
+    )
+
+
+def create_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        for statement in SQLITE_SETUP:
+            schema_editor.execute(statement)
+    elif vendor == "postgresql":
+        schema_editor.add_index(apps.get_model("products", "Product"), search_index())
+
+
+def drop_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        for statement in SQLITE_TEARDOWN:
+            schema_editor.execute(statement)
+    elif vendor == "postgresql":
+        schema_editor.remove_index(
+            apps.get_model("products", "Product"), search_index()
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0002_product_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
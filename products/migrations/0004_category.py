@@ -0,0 +1,242 @@
+import django.db.models.deletion
+import django.db.models.functions.text
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+from django.db.models.functions import TruncMonth
+
+# the full-text triggers of 0003_product_search, which SQLite drops with the product table
+SQLITE_SEARCH_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS products_product_fts_insert
+    AFTER INSERT ON products_product
+    BEGIN
+        INSERT INTO products_product_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_product_fts_delete
+    AFTER DELETE ON products_product
+    BEGIN
+        INSERT INTO products_product_fts(products_product_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_product_fts_update
+    AFTER UPDATE OF title, description ON products_product
+    BEGIN
+        INSERT INTO products_product_fts(products_product_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO products_product_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    "INSERT INTO products_product_fts(products_product_fts) VALUES ('rebuild')",
+]
+
+
+def create_categories(apps, schema_editor):
+    """
+    Create one category per case-insensitive distinct name and link the products to it.
+
+    The most common spelling of a name becomes the category name, the spelling of the
+    oldest product breaks ties.
+    """
+    Category = apps.get_model("products", "Category")
+    Product = apps.get_model("products", "Product")
+    db = schema_editor.connection.alias
+
+    spellings = {}
+    rows = (
+        Product.objects.using(db)
+        .values("category")
+        .annotate(count=Count("id"), first=Min("id"))
+        .order_by()
+    )
+    for row in rows:
+        spellings.setdefault(row["category"].strip().lower(), []).append(
+            (-row["count"], row["first"], row["category"])
+        )
+
+    for variants in spellings.values():
+        variants.sort()
+        category = Category.objects.using(db).create(name=variants[0][2].strip())
+        Product.objects.using(db).filter(
+            category__in=[name for _, _, name in variants]
+        ).update(category_ref=category)
+
+
+def restore_category_names(apps, schema_editor):
+    Category = apps.get_model("products", "Category")
+    Product = apps.get_model("products", "Product")
+    db = schema_editor.connection.alias
+
+    for category in Category.objects.using(db):
+        Product.objects.using(db).filter(category_ref=category).update(
+            category=category.name
+        )
+
+
+def clear_rollup(apps, schema_editor):
+    MonthlyCategorySales = apps.get_model("products", "MonthlyCategorySales")
+    MonthlyCategorySales.objects.using(schema_editor.connection.alias).delete()
+
+
+def rebuild_rollup(apps, schema_editor):
+    """
+    Rebuild the sales rollup from the products, for either definition of the category.
+    """
+    MonthlyCategorySales = apps.get_model("products", "MonthlyCategorySales")
+    Product = apps.get_model("products", "Product")
+    db = schema_editor.connection.alias
+    target = MonthlyCategorySales._meta.get_field("category")
+    if target.is_relation:
+        source = "category_id"
+    elif Product._meta.get_field("category").is_relation:
+        source = "category__name"
+    else:
+        source = "category"
+
+    rows = (
+        Product.objects.using(db)
+        .filter(sold=True)
+        .annotate(month=TruncMonth("date_of_sale"))
+        .values("month", source)
+        .annotate(total_sales=Sum("price"), total_items=Count("id"))
+        .order_by()
+    )
+    MonthlyCategorySales.objects.using(db).bulk_create(
+        MonthlyCategorySales(**{target.attname: row.pop(source)}, **row) for row in rows
+    )
+
+
+def restore_search_triggers(apps, schema_editor):
+    # SQLite rebuilds the altered product table, which drops the full-text triggers
+    if schema_editor.connection.vendor == "sqlite":
+        for statement in SQLITE_SEARCH_TRIGGERS:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0003_product_search"),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, restore_search_triggers),
+        migrations.CreateModel(
+            name="Category",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=255)),
+            ],
+            options={
+                "verbose_name_plural": "categories",
+                "constraints": [
+                    models.UniqueConstraint(
+                        django.db.models.functions.text.Lower("name"),
+                        name="unique_category_name",
+                    )
+                ],
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name="product",
+            name="product_sold_date_cat_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="product",
+            name="product_sales_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="product",
+            name="product_category_lower_idx",
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="category_ref",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="products.category",
+            ),
+        ),
+        # nullable so the migration can be reversed with existing products
+        migrations.AlterField(
+            model_name="product",
+            name="category",
+            field=models.CharField(max_length=255, null=True),
+        ),
+        migrations.RunPython(create_categories, restore_category_names),
+        migrations.RemoveField(
+            model_name="product",
+            name="category",
+        ),
+        migrations.RenameField(
+            model_name="product",
+            old_name="category_ref",
+            new_name="category",
+        ),
+        migrations.AlterField(
+            model_name="product",
+            name="category",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="products",
+                to="products.category",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["sold", "date_of_sale", "category"],
+                name="product_sold_date_cat_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                condition=models.Q(("sold", True)),
+                fields=["date_of_sale", "category", "price"],
+                name="product_sales_idx",
+            ),
+        ),
+        # the rollup is keyed on the category id: empty it, change the key and refill it
+        migrations.RunPython(clear_rollup, rebuild_rollup),
+        migrations.RemoveConstraint(
+            model_name="monthlycategorysales",
+            name="unique_monthly_category_sales",
+        ),
+        migrations.RemoveField(
+            model_name="monthlycategorysales",
+            name="category",
+        ),
+        migrations.AddField(
+            model_name="monthlycategorysales",
+            name="category",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="monthly_sales",
+                to="products.category",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="monthlycategorysales",
+            constraint=models.UniqueConstraint(
+                fields=("month", "category"), name="unique_monthly_category_sales"
+            ),
+        ),
+        migrations.RunPython(rebuild_rollup, clear_rollup),
+        migrations.RunPython(restore_search_triggers, migrations.RunPython.noop),
+    ]
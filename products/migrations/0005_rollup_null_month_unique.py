@@ -0,0 +1,51 @@
+import datetime
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def merge_null_month_rows(apps, schema_editor):
+    """
+    Merge the duplicate rollup rows without a month, which the old constraint allowed.
+    """
+    MonthlyCategorySales = apps.get_model("products", "MonthlyCategorySales")
+    rollup = MonthlyCategorySales.objects.using(schema_editor.connection.alias)
+
+    duplicates = (
+        rollup.filter(month__isnull=True)
+        .values("category_id")
+        .annotate(rows=Count("id"), sales=Sum("total_sales"), items=Sum("total_items"))
+        .filter(rows__gt=1)
+        .order_by()
+    )
+    for row in duplicates:
+        rows = rollup.filter(month__isnull=True, category_id=row["category_id"])
+        kept = rows.order_by("id").values_list("id", flat=True)[0]
+        rows.exclude(id=kept).delete()
+        rows.filter(id=kept).update(total_sales=row["sales"], total_items=row["items"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0004_category"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_null_month_rows, migrations.RunPython.noop),
+        migrations.RemoveConstraint(
+            model_name="monthlycategorysales",
+            name="unique_monthly_category_sales",
+        ),
+        migrations.AddConstraint(
+            model_name="monthlycategorysales",
+            constraint=models.UniqueConstraint(
+                django.db.models.functions.comparison.Coalesce(
+                    "month", models.Value(datetime.date(1, 1, 1))
+                ),
+                models.F("category"),
+                name="unique_monthly_category_sales",
+            ),
+        ),
+    ]
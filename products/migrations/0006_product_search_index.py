@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0005_rollup_null_month_unique"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductSearchIndex",
+            fields=[
+                (
+                    "product",
+                    models.OneToOneField(
+                        db_column="rowid",
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        primary_key=True,
+                        related_name="search_index",
+                        serialize=False,
+                        to="products.product",
+                    ),
+                ),
+                ("document", models.TextField(db_column="products_product_fts")),
+                ("rank", models.FloatField()),
+            ],
+            options={
+                "db_table": "products_product_fts",
+                "managed": False,
+            },
+        ),
+    ]
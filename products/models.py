@@ -1,4 +1,87 @@
+import datetime
+
 from django.db import models
+from django.db.models import Exists, OuterRef
+from django.db.models.functions import Coalesce, Lower
+from django.db.models.lookups import Exact
+
+
+class CategoryQuerySet(models.QuerySet):
+    def named(self, name):
+        """
+        Filter the categories matching the name case-insensitively.
+        """
+        # compare lower-cased values so the unique lower(name) index can be used
+        return self.filter(Exact(Lower("name"), name.lower()))
+
+    def in_use(self):
+        """
+        Filter the categories that have at least one product.
+        """
+        return self.filter(Exists(Product.objects.filter(category=OuterRef("pk"))))
+
+    def ids_for(self, names):
+        """
+        Return a dict mapping the lower-cased names to their category ids.
+
+        The missing categories are created, so a whole batch of products resolves its
+        categories with a couple of queries.
+
+        - names: iterable of category names, the first spelling of a new name is kept.
+        """
+        wanted = {}
+        for name in names:
+            wanted.setdefault(name.lower(), name)
+        if not wanted:
+            return {}
+
+        ids = self.lookup_ids(wanted)
+        missing = [
+            self.model(name=name) for key, name in wanted.items() if key not in ids
+        ]
+        if missing:
+            # the categories created concurrently by another writer are left as they are
+            self.bulk_create(missing, ignore_conflicts=True)
+            ids = self.lookup_ids(wanted)
+            for key, name in wanted.items():
+                if key not in ids:
+                    # lower() of the database differs from Python for some characters
+                    ids[key] = self.filter(
+                        Exact(Lower("name"), Lower(models.Value(name)))
+                    ).values_list("id", flat=True)[0]
+        return ids
+
+    def lookup_ids(self, wanted):
+        return dict(
+            self.annotate(key=Lower("name"))
+            .filter(key__in=list(wanted))
+            .values_list("key", "id")
+        )
+
+
+class Category(models.Model):
+    """
+    Category model to store the product categories
+
+    Category names are unique case-insensitively, the API reads and writes products with
+    the category name.
+
+    Attributes:
+        name: str: Name of the category
+    """
+
+    name = models.CharField(max_length=255)
+
+    objects = CategoryQuerySet.as_manager()
+
+    class Meta:
+        verbose_name_plural = "categories"
+        constraints = [
+            models.UniqueConstraint(Lower("name"), name="unique_category_name"),
+        ]
+
+    def __str__(self):
+        return self.name
 
 
 class Product(models.Model):
@@ -9,7 +92,7 @@ class Product(models.Model):
         title: str: Name of the product
         price: float: Cost of the product
         description: str:  A brief description of the product
-        category: str: category of the product
+        category: Category: category of the product
         image: str: URL for the product image
         sold: bool:  Boolean indicating whether the product is sold
         is_sale: bool: : Boolean indicating whether the product is on sale
@@ -20,11 +103,95 @@ class Product(models.Model):
     title = models.CharField(max_length=255)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     description = models.TextField()
-    category = models.CharField(max_length=255)
+    category = models.ForeignKey(
+        Category, on_delete=models.PROTECT, related_name="products"
+    )
     image = models.URLField()
     sold = models.BooleanField(auto_created=True, default=False)
     is_sale = models.BooleanField(auto_created=True, default=False)
     date_of_sale = models.DateField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # ProductFilter: sold, optionally combined with the chart columns
+            models.Index(
+                fields=["sold", "date_of_sale", "category"],
+                name="product_sold_date_cat_idx",
+            ),
+            # chart aggregation over sold products (covers the price sum)
+            models.Index(
+                fields=["date_of_sale", "category", "price"],
+                name="product_sales_idx",
+                condition=models.Q(sold=True),
+            ),
+            # ProductFilter price range and ordering by price
+            models.Index(fields=["price"], name="product_price_idx"),
+            # ordering by title
+            models.Index(fields=["title"], name="product_title_idx"),
+        ]
+
     def __str__(self):
         return f"{self.id} - {self.title}"
+
+
+class ProductSearchIndex(models.Model):
+    """
+    Row of the SQLite full-text index of the products, see `products.search`.
+
+    The FTS5 virtual table is created by the `0003_product_search` migration and is not
+    managed by Django; the model only lets product queries join it.
+
+    Attributes:
+        product: Product: indexed product (the rowid of the index)
+        document: str: hidden column of the table, the left side of a MATCH
+        rank: float: bm25 relevance of the row for the matched query, lower is better
+    """
+
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column="rowid",
+        related_name="search_index",
+    )
+    document = models.TextField(db_column="products_product_fts")
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = "products_product_fts"
+
+
+class MonthlyCategorySales(models.Model):
+    """
+    Rollup model storing the pre-aggregated sales of sold products per month and category.
+
+    The table is kept current by the Product signals in `products.signals` and can be rebuilt
+    from scratch with `python manage.py rebuild_sales_rollup`.
+
+    Attributes:
+        month: date: First day of the month of sale (null for sold products without a date)
+        category: Category: category of the products
+        total_sales: decimal: Sum of the prices of the sold products
+        total_items: int: Number of sold products
+    """
+
+    month = models.DateField(null=True, blank=True)
+    category = models.ForeignKey(
+        Category, on_delete=models.PROTECT, related_name="monthly_sales"
+    )
+    total_sales = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_items = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # coalesced so the rows without a month are unique per category as well
+            models.UniqueConstraint(
+                Coalesce("month", models.Value(datetime.date.min)),
+                "category",
+                name="unique_monthly_category_sales",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.month} - {self.category}"
@@ -0,0 +1,306 @@
+import base64
+import hashlib
+import json
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import BasePagination, LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from products.cache import catalogue_version, get_cache, replica_may_lag
+
+
+def positive_int(value, cutoff=None):
+    """
+    Parse a strictly positive integer query parameter, capped at the cutoff.
+    """
+    value = int(value)
+    if value <= 0:
+        raise ValueError(value)
+    return min(value, cutoff) if cutoff else value
+
+
+def count_signature(queryset):
+    """
+    Return a key identifying the rows matched by the queryset.
+
+    The key is built from the SQL of the filtered primary keys, so query parameters that do
+    not change the filter (ordering, fields, limit, offset) or spell it differently (e.g.
+    the case of a category) share the same key.
+    """
+    sql, params = queryset.order_by().values("pk").query.sql_with_params()
+    return hashlib.md5(f"{queryset.db}:{sql}:{params!r}".encode()).hexdigest()
+
+
+def estimate_count(queryset, lower_bound):
+    """
+    Return an estimate of the number of rows matched by the queryset.
+
+    PostgreSQL returns the row estimate of the query planner. Other databases count the
+    matches among the first `lower_bound` products and extrapolate to the whole table.
+    """
+    queryset = queryset.order_by()
+    connection = connections[queryset.db]
+    if connection.vendor == "postgresql":
+        sql, params = queryset.values("pk").query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        estimate = plan[0]["Plan"]["Plan Rows"]
+    else:
+        model = queryset.model._base_manager.using(queryset.db)
+        sample_end = (
+            model.order_by("pk").values_list("pk", flat=True)[lower_bound - 1 :].first()
+        )
+        sample_count = queryset.filter(pk__lte=sample_end).count()
+        estimate = round(sample_count / lower_bound * total_count(model))
+
+    # the capped count already proved there are more rows than the threshold
+    return max(estimate, lower_bound + 1)
+
+
+def total_count(queryset):
+    return cached_value(f"total:{count_signature(queryset)}", queryset.count)
+
+
+def cached_value(name, compute):
+    cache = get_cache()
+    key = f"products:count:{catalogue_version()}:{name}"
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        if not replica_may_lag():
+            cache.set(key, value, timeout=settings.PRODUCTS_CACHE_TIMEOUT)
+    return value
+
+
+def product_count(queryset):
+    """
+    Return the number of rows matched by the queryset and whether it is approximate.
+
+    Counts are cached per catalogue version and filter signature, so they are computed once
+    until the catalogue changes. When `PRODUCTS_COUNT_ESTIMATE_THRESHOLD` is set, at most
+    that many rows are counted and larger results are estimated.
+    """
+    threshold = settings.PRODUCTS_COUNT_ESTIMATE_THRESHOLD
+
+    def compute():
+        if not threshold:
+            return queryset.count(), False
+
+        capped = queryset.order_by().values("pk")[: threshold + 1].count()
+        if capped <= threshold:
+            return capped, False
+        return estimate_count(queryset, threshold), True
+
+    return cached_value(f"{threshold}:{count_signature(queryset)}", compute)
+
+
+class ProductCountPagination(LimitOffsetPagination):
+    """
+    Limit/offset pagination with cached, and optionally approximate, total counts.
+
+    The response has a `count_approximate` flag next to the `count`. When the count is
+    approximate the page is fetched with one extra row to find out whether a next page
+    exists, instead of comparing the offset with the count.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+
+        self.offset = self.get_offset(request)
+        self.count, self.count_approximate = product_count(queryset)
+        if self.count > self.limit and self.template is not None:
+            self.display_page_controls = True
+
+        if not self.count_approximate:
+            self.has_next = self.offset + self.limit < self.count
+            if self.count == 0 or self.offset > self.count:
+                return []
+            return list(queryset[self.offset : self.offset + self.limit])
+
+        page = list(queryset[self.offset : self.offset + self.limit + 1])
+        self.has_next = len(page) > self.limit
+        return page[: self.limit]
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "count": self.count,
+                "count_approximate": self.count_approximate,
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema["properties"]["count_approximate"] = {
+            "type": "boolean",
+            "example": False,
+        }
+        return response_schema
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        return replace_query_param(
+            url, self.offset_query_param, self.offset + self.limit
+        )
+
+
+class ProductKeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination for the product list.
+
+    Pages are fetched with `WHERE (field, id) > (last value, last id)` instead of an OFFSET,
+    so every page costs the same whatever its depth. The page follows the `ordering` of the
+    OrderingFilter (price or title) with the product id as tie-breaker, or the id alone.
+
+    - cursor: opaque position returned in the `next` and `previous` links.
+    - limit: number of products per page.
+    - with_count: set to true to include the total `count` (see `product_count()`).
+    """
+
+    cursor_query_param = "cursor"
+    limit_query_param = "limit"
+    count_query_param = "with_count"
+    default_limit = api_settings.PAGE_SIZE
+    max_limit = 100
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.field, self.descending = self.get_ordering(request, queryset, view)
+        cursor = self.decode_cursor(request)
+        reverse = bool(cursor and cursor["reverse"])
+
+        self.count = None
+        if request.query_params.get(self.count_query_param, "").lower() == "true":
+            self.count, self.count_approximate = product_count(queryset)
+
+        queryset = queryset.order_by(*self.get_order_by(reverse))
+        if cursor:
+            queryset = queryset.filter(self.get_keyset_filter(cursor, reverse))
+
+        page = list(queryset[: self.limit + 1])
+        has_more = len(page) > self.limit
+        page = page[: self.limit]
+        if reverse:
+            page.reverse()
+
+        # moving backwards means a next page exists, moving forwards means a previous one
+        self.has_next = True if reverse else has_more
+        self.has_previous = has_more if reverse else cursor is not None
+        self.page = page
+        return page
+
+    def get_paginated_response(self, data):
+        response = {
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        }
+        if self.count is not None:
+            response = {
+                "count": self.count,
+                "count_approximate": self.count_approximate,
+                **response,
+            }
+        return Response(response)
+
+    def get_limit(self, request):
+        try:
+            return positive_int(
+                request.query_params[self.limit_query_param], cutoff=self.max_limit
+            )
+        except (KeyError, ValueError):
+            return self.default_limit
+
+    def get_ordering(self, request, queryset, view):
+        """
+        Return the ordering field and direction from the `ordering` query parameter.
+        """
+        ordering = OrderingFilter().get_ordering(request, queryset, view) or []
+        allowed = getattr(view, "ordering_fields", None) or []
+        for term in ordering:
+            field = term.lstrip("-")
+            if field in allowed and field != "id":
+                return field, term.startswith("-")
+        return "id", bool(ordering and ordering[0] == "-id")
+
+    def get_order_by(self, reverse):
+        descending = self.descending != reverse
+        prefix = "-" if descending else ""
+        if self.field == "id":
+            return [f"{prefix}id"]
+        return [f"{prefix}{self.field}", f"{prefix}id"]
+
+    def get_keyset_filter(self, cursor, reverse):
+        lookup = "lt" if self.descending != reverse else "gt"
+        if self.field == "id":
+            return Q(**{f"id__{lookup}": cursor["id"]})
+
+        value = cursor["value"]
+        if self.field == "price":
+            value = Decimal(value)
+        return Q(**{f"{self.field}__{lookup}": value}) | Q(
+            **{self.field: value, f"id__{lookup}": cursor["id"]}
+        )
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            if cursor["field"] != self.field:
+                raise ValueError("The cursor belongs to another ordering")
+            cursor["id"] = int(cursor["id"])
+            cursor["reverse"] = bool(cursor.get("reverse"))
+            if self.field == "price":
+                Decimal(cursor["value"])
+        except (TypeError, ValueError, KeyError, ArithmeticError):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def encode_cursor(self, product, reverse):
+        # pages are lists of products or of values() dicts
+        if isinstance(product, dict):
+            values = product
+        else:
+            values = {"id": product.id, self.field: getattr(product, self.field)}
+
+        cursor = {"field": self.field, "id": values["id"], "reverse": reverse}
+        if self.field != "id":
+            cursor["value"] = str(values[self.field])
+        encoded = base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+
+        url = remove_query_param(self.request.build_absolute_uri(), "offset")
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
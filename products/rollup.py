@@ -0,0 +1,186 @@
+"""
+Helpers to maintain the MonthlyCategorySales rollup table.
+
+Every change to a Product is described by its old and new values of the fields that
+contribute to the rollup. The difference is turned into per (month, category id) deltas
+which are applied with `F()` expressions, so the cost of a write does not depend on
+the size of the catalogue.
+"""
+
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+
+from products import columnar, events
+from products.cache import bump_catalogue_version
+from products.models import MonthlyCategorySales, Product
+
+# fields of Product in the rows of the change feed, the rollup uses the last four
+ROLLUP_FIELDS = ("id", "is_sale", "sold", "price", "category_id", "date_of_sale")
+
+
+def month_of(date):
+    """
+    Return the first day of the month of the given date (None for no date).
+    """
+    return date.replace(day=1) if date else None
+
+
+def product_row(product):
+    """
+    Return the rollup relevant values of a Product instance as a dict.
+    """
+    return {field: getattr(product, field) for field in ROLLUP_FIELDS}
+
+
+def collect_deltas(old_rows, new_rows):
+    """
+    Compute the rollup deltas between two lists of product rows.
+
+    - old_rows: rows before the change (deleted or previous state of updated products).
+    - new_rows: rows after the change (created or new state of updated products).
+
+    Returns a dict mapping (month, category id) to a [sales, items] delta.
+    """
+    deltas = {}
+
+    for rows, sign in ((old_rows, -1), (new_rows, 1)):
+        for row in rows:
+            if not row or not row["sold"]:
+                continue
+
+            key = (month_of(row["date_of_sale"]), row["category_id"])
+            delta = deltas.setdefault(key, [Decimal("0"), 0])
+            delta[0] += sign * Decimal(str(row["price"]))
+            delta[1] += sign
+
+    # drop the keys where the change cancelled out (e.g. title only updates)
+    return {key: delta for key, delta in deltas.items() if delta[0] or delta[1]}
+
+
+def apply_deltas(deltas):
+    """
+    Apply the given deltas to the rollup table.
+
+    Existing (month, category) rows are updated in place, missing rows are created with one
+    bulk insert and rows left without any sold item are removed.
+    """
+    with transaction.atomic():
+        existing = set(
+            MonthlyCategorySales.objects.filter(
+                month__in=[month for month, _ in deltas if month],
+                category_id__in={category for _, category in deltas},
+            ).values_list("month", "category_id")
+        )
+        existing.update(
+            MonthlyCategorySales.objects.filter(
+                month__isnull=True,
+                category_id__in={category for month, category in deltas if not month},
+            ).values_list("month", "category_id")
+        )
+
+        missing = [
+            MonthlyCategorySales(
+                month=month, category_id=category, total_sales=sales, total_items=items
+            )
+            for (month, category), (sales, items) in deltas.items()
+            if (month, category) not in existing and items > 0
+        ]
+        if missing:
+            try:
+                with transaction.atomic():
+                    MonthlyCategorySales.objects.bulk_create(missing)
+            except IntegrityError:
+                # some rows were created concurrently by another writer
+                for row in missing:
+                    update_row(
+                        row.month, row.category_id, row.total_sales, row.total_items
+                    )
+
+        for (month, category), (sales, items) in deltas.items():
+            if (month, category) in existing:
+                update_row(month, category, sales, items)
+
+
+def update_row(month, category, sales, items):
+    """
+    Add a delta to an existing rollup row, or create it when it does not exist.
+    """
+    rollup = MonthlyCategorySales.objects.filter(month=month, category_id=category)
+    try:
+        with transaction.atomic():
+            updated = rollup.update(
+                total_sales=F("total_sales") + sales,
+                total_items=F("total_items") + items,
+            )
+    except IntegrityError:
+        # the row fell behind the products (e.g. rebuilt concurrently) and would go
+        # below zero items: count it again
+        recount_row(month, category)
+        return
+    if not updated and items > 0:
+        MonthlyCategorySales.objects.create(
+            month=month, category_id=category, total_sales=sales, total_items=items
+        )
+    if items < 0:
+        rollup.filter(total_items__lte=0).delete()
+
+
+def recount_row(month, category):
+    """
+    Recompute one rollup row from the Product table.
+    """
+    totals = aggregate_sales().filter(month=month, category_id=category)
+    rollup = MonthlyCategorySales.objects.filter(month=month, category_id=category)
+    totals = next(iter(totals), None)
+    if totals is None:
+        rollup.delete()
+    elif not rollup.update(
+        total_sales=totals["total_sales"], total_items=totals["total_items"]
+    ):
+        MonthlyCategorySales.objects.create(**totals)
+
+
+def record_changes(old_rows, new_rows):
+    """
+    Update the rollup for a change of products and return the applied deltas.
+    """
+    old_rows = list(old_rows)
+    deltas = collect_deltas(old_rows, new_rows)
+    columnar.record_changes(old_rows, new_rows)
+    if deltas:
+        apply_deltas(deltas)
+        events.publish_sales(deltas)
+    return deltas
+
+
+def aggregate_sales():
+    """
+    Aggregate the sales of all sold products per month and category.
+    """
+    return (
+        Product.objects.filter(sold=True)
+        .annotate(month=TruncMonth("date_of_sale"))
+        .values("month", "category_id")
+        .annotate(total_sales=Sum("price"), total_items=Count("id"))
+        .order_by()
+    )
+
+
+def rebuild():
+    """
+    Rebuild the whole rollup table from the Product table and return the number of rows.
+    """
+    with transaction.atomic():
+        MonthlyCategorySales.objects.all().delete()
+        rows = MonthlyCategorySales.objects.bulk_create(
+            MonthlyCategorySales(**item) for item in aggregate_sales()
+        )
+        # the clients of the live events reload the charts
+        events.publish("reset", {})
+    bump_catalogue_version()
+    # the products were changed without going through the change feed
+    columnar.invalidate()
+    return len(rows)
@@ -1,35 +1,16 @@
 import json
-from products.serializers import ProductSerializer
-from products.models import Product
+from products.importer import ProductImporter, read_json
 
 
 def run():
     print("Adding sample data...")
 
-    # read the file .sampleData.json
+    # stream the file .sampleData.json through the bulk import pipeline
     with open("products/scripts/sampleData.json", "r") as file:
-        data = json.load(file)
+        report = ProductImporter().run(read_json(file))
 
-    # loop through the data and create or update a product for each item
-    for product in data:
-        try:
-            print("Processing product: ", product["title"])
-            existing_product = Product.objects.filter(title=product["title"]).first()
-            if existing_product:
-                serializer = ProductSerializer(existing_product, data=product)
-                action = "Updating"
-            else:
-                serializer = ProductSerializer(data=product)
-                action = "Adding"
-
-            if serializer.is_valid():
-                serializer.save()
-                print(f"{action} product: ", product["title"])
-            else:
-                raise Exception("Error validating the product data", serializer.errors)
-        except Exception as e:
-            print(e)
-            print("Error processing sample data on product: ", product["title"])
-            return
+    for number, errors in report.errors:
+        print(f"Error processing sample data on product {number}: ", json.dumps(errors))
 
+    print(report)
     print("Sample data processed successfully!")
@@ -0,0 +1,105 @@
+"""
+Full-text search over the product title and description.
+
+- SQLite: an external content FTS5 table (`products_product_fts`) kept in sync with the
+  Product table by triggers created in the `0003_product_search` migration, ranked by bm25
+  and joined to the products through the unmanaged `ProductSearchIndex` model.
+- PostgreSQL: a GIN index over the title/description tsvector (`search_vector()`, created
+  by the same migration), ranked by ts_rank.
+- Other backends fall back to a case-insensitive match on the title and description.
+"""
+
+import re
+
+from django.db import connections
+from django.db.models import F, Lookup, Q
+from rest_framework import filters
+
+from products.models import ProductSearchIndex
+
+SEARCH_CONFIG = "english"
+
+
+class Match(Lookup):
+    """
+    Full-text MATCH of an FTS5 table column.
+    """
+
+    lookup_name = "match"
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} MATCH {rhs}", lhs_params + rhs_params
+
+
+ProductSearchIndex._meta.get_field("document").register_lookup(Match)
+
+
+def search_vector():
+    from django.contrib.postgres.search import SearchVector
+
+    return SearchVector("title", "description", config=SEARCH_CONFIG)
+
+
+def search_terms(query):
+    return re.findall(r"\w+", query)
+
+
+def full_text_search(queryset, query):
+    """
+    Filter the product queryset by a full-text query and order it by relevance.
+
+    Every word of the query must match (as a prefix on SQLite). The relevance is available
+    as the `search_rank` annotation, lower is better on SQLite and higher on PostgreSQL.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return queryset
+
+    vendor = connections[queryset.db].vendor
+
+    if vendor == "sqlite":
+        match = " ".join('"%s"*' % term.replace('"', '""') for term in terms)
+        return (
+            queryset.filter(search_index__document__match=match)
+            .annotate(search_rank=F("search_index__rank"))
+            .order_by("search_rank")
+        )
+
+    if vendor == "postgresql":
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+
+        search_query = SearchQuery(
+            " ".join(terms), config=SEARCH_CONFIG, search_type="plain"
+        )
+        return (
+            queryset.annotate(search_rank=SearchRank(search_vector(), search_query))
+            .alias(search_document=search_vector())
+            .filter(search_document=search_query)
+            .order_by("-search_rank")
+        )
+
+    condition = Q()
+    for term in terms:
+        condition &= Q(title__icontains=term) | Q(description__icontains=term)
+    return queryset.filter(condition)
+
+
+class ProductSearchFilter(filters.SearchFilter):
+    """
+    SearchFilter with an optional ranked full-text mode.
+
+    - search: the search terms.
+    - search_mode: set to "fulltext" to search the title and description with the full-text
+      index, ordered by relevance unless an explicit ordering is given.
+    """
+
+    search_mode_param = "search_mode"
+
+    def filter_queryset(self, request, queryset, view):
+        if request.query_params.get(self.search_mode_param) != "fulltext":
+            return super().filter_queryset(request, queryset, view)
+
+        query = request.query_params.get(self.search_param, "")
+        return full_text_search(queryset, query)
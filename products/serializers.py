@@ -1,29 +1,154 @@
 # from rest_framework.validators import UniqueValidator
+import datetime
+
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
 from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+from products.analytics import GRANULARITIES, SPLITS, buckets
+from products.models import Category, Product
+
 
-from products.models import Product
+def resolve_categories(items):
+    """
+    Replace the category names of validated product data by category ids, in place.
+
+    The names of all the items are resolved together and the missing categories created.
+    """
+    items = [data for data in items if "category" in data]
+    ids = Category.objects.ids_for(data["category"] for data in items)
+    for data in items:
+        data["category_id"] = ids[data.pop("category").lower()]
 
 
 class ProductSerializer(serializers.ModelSerializer):
     """
     Serializer for Product model
+
+    The category is read and written by name, an unknown name creates the category.
     """
 
+    category = serializers.CharField(max_length=255)
+
     class Meta:
         model = Product
-        fields = "__all__"
+        # the order of the model fields before the category became a relation
+        fields = [
+            "id",
+            "is_sale",
+            "sold",
+            "title",
+            "price",
+            "description",
+            "category",
+            "image",
+            "date_of_sale",
+        ]
         read_only_fields = ["id"]
         extra_kwargs = {
             "title": {"required": True},
             "price": {"required": True},
             "description": {"required": True},
-            "category": {"required": True},
             "image": {"required": True},
             "sold": {"required": False},
             "is_sale": {"required": False},
             "date_of_sale": {"required": False},
         }
 
+    def create(self, validated_data):
+        resolve_categories([validated_data])
+        return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        resolve_categories([validated_data])
+        return super().update(instance, validated_data)
+
+
+def compile_converter(field):
+    """
+    Return a function converting a database value like `field.to_representation()` does,
+    or None when the value can be used as is.
+    """
+    if isinstance(field, serializers.DecimalField):
+        places = field.decimal_places
+        return lambda value: None if value is None else f"{value:.{places}f}"
+    if isinstance(field, serializers.DateField):
+        return lambda value: None if value is None else value.isoformat()
+    return None
+
+
+class ProductRowSerializer:
+    """
+    Lightweight read-only serializer for Product rows.
+
+    Rows are fetched with `values()` and converted with converters compiled once from the
+    ProductSerializer fields, which avoids the per field overhead of DRF serialization while
+    producing the same output. The category name is read with a subquery on the category.
+
+    - fields: optional subset of the product fields to return (sparse fieldset).
+    """
+
+    field_converters = {
+        name: compile_converter(field)
+        for name, field in ProductSerializer().fields.items()
+    }
+    # annotations of the fields that are not product columns, a correlated subquery keeps
+    # the row query free of joins so that counting it does not pay for them
+    field_sources = {"category": "category_name"}
+    source_annotations = {
+        "category_name": Subquery(
+            Category.objects.filter(pk=OuterRef("category_id")).values("name")
+        ),
+    }
+
+    def __init__(self, fields=None):
+        if fields:
+            unknown = [name for name in fields if name not in self.field_converters]
+            if unknown:
+                raise ValidationError(
+                    {"fields": [f"Unknown product fields: {', '.join(unknown)}."]}
+                )
+        # keep the order of ProductSerializer for identical output
+        self.fields = [
+            name for name in self.field_converters if not fields or name in fields
+        ]
+        self.converters = [
+            (name, self.field_sources.get(name, name), self.field_converters[name])
+            for name in self.fields
+        ]
+
+    @classmethod
+    def from_query_param(cls, value):
+        """
+        Build the serializer from a comma separated `fields` query parameter.
+        """
+        fields = [name.strip() for name in (value or "").split(",") if name.strip()]
+        return cls(fields)
+
+    def values(self, queryset, *extra_fields):
+        """
+        Return the queryset of rows to serialize, with the extra fields needed for paging.
+        """
+        sources = [source for _, source, _ in self.converters]
+        annotations = {
+            source: self.source_annotations[source]
+            for source in sources
+            if source in self.source_annotations
+        }
+        return queryset.annotate(**annotations).values(
+            *dict.fromkeys([*sources, *extra_fields])
+        )
+
+    def to_representation(self, row):
+        return {
+            name: converter(row[source]) if converter else row[source]
+            for name, source, converter in self.converters
+        }
+
+    def serialize(self, rows):
+        return [self.to_representation(row) for row in rows]
+
 
 class SalesChartSerializer(serializers.Serializer):
     """
@@ -32,7 +157,7 @@ class SalesChartSerializer(serializers.Serializer):
 
     month = serializers.CharField()
     sales = serializers.DictField(
-        child=serializers.DecimalField(max_digits=10, decimal_places=2)
+        child=serializers.DecimalField(max_digits=14, decimal_places=2)
     )
 
 
@@ -43,3 +168,49 @@ class ItemsChartSerializer(serializers.Serializer):
 
     month = serializers.CharField()
     items = serializers.DictField(child=serializers.IntegerField())
+
+
+class DashboardChartSerializer(serializers.Serializer):
+    """
+    Serializer for the combined sales and items chart data
+    """
+
+    month = serializers.CharField()
+    sales = serializers.DictField(
+        child=serializers.DecimalField(max_digits=14, decimal_places=2)
+    )
+    items = serializers.DictField(child=serializers.IntegerField())
+
+
+class AnalyticsQuerySerializer(serializers.Serializer):
+    """
+    Serializer for the query parameters of the analytics endpoint
+    """
+
+    max_buckets = 1000
+
+    # "from" is a keyword, so the fields are declared in __init__
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["from"] = serializers.DateField(required=False)
+        self.fields["to"] = serializers.DateField(required=False)
+
+    granularity = serializers.ChoiceField(choices=GRANULARITIES, default="day")
+    category = serializers.CharField(required=False)
+    split = serializers.ChoiceField(choices=list(SPLITS), required=False)
+
+    def validate(self, attrs):
+        date_to = attrs.get("to") or timezone.localdate()
+        # 30 days by default, or fewer when they would start before date.min
+        days = min(29, (date_to - datetime.date.min).days)
+        date_from = attrs.get("from") or date_to - datetime.timedelta(days=days)
+        if date_from > date_to:
+            raise ValidationError({"from": ["Must be on or before the 'to' date."]})
+        if len(buckets(date_from, date_to, attrs["granularity"])) > self.max_buckets:
+            raise ValidationError(
+                {"granularity": [f"The range exceeds {self.max_buckets} buckets."]}
+            )
+
+        attrs["from"] = date_from
+        attrs["to"] = date_to
+        return attrs
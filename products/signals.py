@@ -0,0 +1,62 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from products import rollup
+from products.cache import bump_catalogue_version
+from products.models import Product
+
+_muted = ContextVar("products_signals_muted", default=False)
+
+
+@contextmanager
+def muted():
+    """
+    Skip the Product signal handlers, for bulk writes that update the rollup themselves.
+    """
+    token = _muted.set(True)
+    try:
+        yield
+    finally:
+        _muted.reset(token)
+
+
+@receiver(pre_save, sender=Product)
+def remember_rollup_state(sender, instance, raw=False, **kwargs):
+    """
+    Store the current database values of an updated product before it is saved.
+    """
+    instance._rollup_old_row = None
+    if raw or _muted.get() or instance._state.adding or instance.pk is None:
+        return
+
+    instance._rollup_old_row = (
+        Product.objects.filter(pk=instance.pk).values(*rollup.ROLLUP_FIELDS).first()
+    )
+
+
+@receiver(post_save, sender=Product)
+def update_rollup_on_save(sender, instance, raw=False, **kwargs):
+    """
+    Move the contribution of a saved product to its new (month, category) in the rollup.
+    """
+    if raw or _muted.get():
+        return
+
+    old_row = getattr(instance, "_rollup_old_row", None)
+    rollup.record_changes([old_row], [rollup.product_row(instance)])
+    bump_catalogue_version()
+
+
+@receiver(post_delete, sender=Product)
+def update_rollup_on_delete(sender, instance, **kwargs):
+    """
+    Remove the contribution of a deleted product from the rollup.
+    """
+    if _muted.get():
+        return
+
+    rollup.record_changes([rollup.product_row(instance)], [])
+    bump_catalogue_version()
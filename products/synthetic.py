@@ -0,0 +1,101 @@
+"""
+Synthetic product generator used to seed large catalogues for benchmarks.
+
+The values follow distributions close to a real catalogue: a few categories hold most of
+the products, prices are log-normal around a per-category median, sales are spread over
+the last three years with an end-of-year peak, and sale items are cheaper. The output only
+depends on the seed, so two runs with the same arguments produce the same catalogue.
+"""
+
+import datetime
+import math
+import random
+from decimal import Decimal
+
+from products.models import Category, Product
+
+# category: (relative share of the catalogue, median price)
+CATEGORY_PROFILES = {
+    "Electronics": (18, 250),
+    "Clothing": (16, 35),
+    "Home": (14, 60),
+    "Books": (12, 15),
+    "Beauty": (10, 25),
+    "Toys": (8, 30),
+    "Fitness": (7, 45),
+    "Grocery": (6, 8),
+    "Garden": (5, 40),
+    "Automotive": (4, 120),
+}
+CATEGORIES = list(CATEGORY_PROFILES)
+
+ADJECTIVES = [
+    "Classic",
+    "Compact",
+    "Deluxe",
+    "Eco",
+    "Essential",
+    "Portable",
+    "Premium",
+    "Smart",
+    "Ultra",
+    "Vintage",
+]
+
+# relative number of sales per month, January to December
+MONTH_WEIGHTS = [7, 6, 7, 7, 8, 8, 8, 8, 8, 9, 12, 14]
+
+SOLD_RATE = 0.6
+SALE_RATE = 0.3
+SALE_DISCOUNT = 0.75
+PRICE_SIGMA = 0.6
+SALES_YEARS = 3
+
+
+def generate_products(count, seed=0, start=0, today=None, using="default"):
+    """
+    Yield `count` unsaved Product instances with reproducible random values.
+
+    The categories are created when the first product is generated.
+
+    - count: number of products to generate.
+    - seed: seed of the random generator.
+    - start: number of the first product, used in its title and image URL.
+    - today: last possible sale date, defaults to the current date.
+    - using: alias of the database the categories are created in.
+    """
+    rng = random.Random(seed)
+    today = today or datetime.date.today()
+    weights = [share for share, _ in CATEGORY_PROFILES.values()]
+    first_year = today.year - SALES_YEARS + 1
+    category_ids = Category.objects.using(using).ids_for(CATEGORIES)
+
+    for index in range(start, start + count):
+        category = rng.choices(CATEGORIES, weights)[0]
+        median_price = CATEGORY_PROFILES[category][1]
+        is_sale = rng.random() < SALE_RATE
+        price = rng.lognormvariate(math.log(median_price), PRICE_SIGMA)
+        if is_sale:
+            price *= SALE_DISCOUNT
+        price = max(Decimal("0.99"), Decimal(f"{price:.2f}"))
+
+        sold = rng.random() < SOLD_RATE
+        date_of_sale = None
+        if sold:
+            month = rng.choices(range(1, 13), MONTH_WEIGHTS)[0]
+            date_of_sale = datetime.date(
+                rng.randint(first_year, today.year), month, rng.randint(1, 28)
+            )
+            if date_of_sale > today:
+                date_of_sale = date_of_sale.replace(year=date_of_sale.year - 1)
+
+        yield Product(
+            title=f"{rng.choice(ADJECTIVES)} {category} Item {index}",
+            price=price,
+            description=f"Synthetic {category.lower()} product number {index}.",
+            category_id=category_ids[category.lower()],
+            image=f"https://example.com/images/product-{index}.jpg",
+            sold=sold,
+            is_sale=is_sale,
+            date_of_sale=date_of_sale,
+        )
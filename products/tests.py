@@ -1,3 +1,884 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import io
+import json
+import tempfile
+import unittest
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import Count, QuerySet
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from products import columnar, events, rollup
+from products.analytics import GRANULARITIES, grouped_sales
+from products.cache import catalogue_version, get_cache
+from products.charts import ChartMatrix
+from products.importer import ProductImporter
+from products.models import Category, MonthlyCategorySales, Product
+from products.serializers import ProductRowSerializer, ProductSerializer
+from products.views import ProductExportView
+
+
+def create_product(category, **fields):
+    fields.setdefault("title", "Product")
+    fields.setdefault("description", "A product")
+    fields.setdefault("price", Decimal("10.00"))
+    fields.setdefault("sold", True)
+    fields.setdefault("date_of_sale", datetime.date(2024, 11, 5))
+    return Product.objects.create(
+        category=category, image="https://example.com/product.jpg", **fields
+    )
+
+
+class RollupSignalTests(TestCase):
+    """
+    MonthlyCategorySales maintained by the Product signals.
+    """
+
+    def setUp(self):
+        self.books = Category.objects.create(name="Books")
+        self.games = Category.objects.create(name="Games")
+
+    def snapshot(self):
+        return sorted(
+            MonthlyCategorySales.objects.values_list(
+                "month", "category_id", "total_sales", "total_items"
+            ),
+            key=str,
+        )
+
+    def test_changes_match_rebuild(self):
+        first = create_product(self.books)
+        second = create_product(self.games, price=Decimal("5.50"))
+        unsold = create_product(self.games, sold=False, date_of_sale=None)
+        undated = create_product(self.books, date_of_sale=None)
+
+        first.price = Decimal("12.00")
+        first.save()
+        second.category = self.books
+        second.date_of_sale = datetime.date(2024, 12, 1)
+        second.save()
+        unsold.sold = True
+        unsold.date_of_sale = datetime.date(2024, 12, 3)
+        unsold.save()
+        undated.delete()
+
+        maintained = self.snapshot()
+        rollup.rebuild()
+        self.assertEqual(maintained, self.snapshot())
+        self.assertEqual(
+            maintained,
+            sorted(
+                [
+                    (datetime.date(2024, 11, 1), self.books.id, Decimal("12.00"), 1),
+                    (datetime.date(2024, 12, 1), self.books.id, Decimal("5.50"), 1),
+                    (datetime.date(2024, 12, 1), self.games.id, Decimal("10.00"), 1),
+                ],
+                key=str,
+            ),
+        )
+
+    def test_products_without_date_share_a_row(self):
+        create_product(self.books, date_of_sale=None)
+        create_product(self.books, date_of_sale=None, price=Decimal("2.00"))
+
+        row = MonthlyCategorySales.objects.get(month=None, category=self.books)
+        self.assertEqual(row.total_items, 2)
+        self.assertEqual(row.total_sales, Decimal("12.00"))
+
+    def test_rows_without_month_are_unique(self):
+        create_product(self.books, date_of_sale=None)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            MonthlyCategorySales.objects.create(
+                month=None, category=self.books, total_items=1
+            )
+
+    def test_delete_with_stale_rollup(self):
+        kept = create_product(self.books)
+        deleted = create_product(self.books)
+        # the rollup is behind the products, e.g. after a concurrent rebuild
+        MonthlyCategorySales.objects.update(total_items=0, total_sales=0)
+
+        deleted.delete()
+
+        row = MonthlyCategorySales.objects.get()
+        self.assertEqual(row.total_items, 1)
+        self.assertEqual(row.total_sales, kept.price)
+
+
+class ChartEndpointTests(APITestCase):
+    """
+    Sales, items and dashboard charts built from the rollup.
+    """
+
+    def setUp(self):
+        get_cache().clear()
+        self.client.force_authenticate(User.objects.create_user(username="alice"))
+        books = Category.objects.create(name="Books")
+        games = Category.objects.create(name="Games")
+        create_product(books, price=Decimal("12.50"))
+        create_product(books, price=Decimal("7.50"))
+        create_product(games, date_of_sale=datetime.date(2024, 12, 3))
+        create_product(games, sold=False, date_of_sale=None)
+
+    def chart(self, name):
+        response = self.client.get(f"/api/products/{name}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def test_sales_chart(self):
+        self.assertEqual(
+            self.chart("sales_chart"),
+            [
+                {"month": "Nov 2024", "sales": {"Books": "20.00", "Games": "0.00"}},
+                {"month": "Dec 2024", "sales": {"Books": "0.00", "Games": "10.00"}},
+            ],
+        )
+
+    def test_items_chart(self):
+        self.assertEqual(
+            self.chart("items_chart"),
+            [
+                {"month": "Nov 2024", "items": {"Books": 2, "Games": 0}},
+                {"month": "Dec 2024", "items": {"Books": 0, "Games": 1}},
+            ],
+        )
+
+    def test_dashboard_chart_combines_both(self):
+        sales = self.chart("sales_chart")
+        items = self.chart("items_chart")
+
+        with self.assertNumQueries(1):
+            dashboard = self.chart("dashboard_chart")
+
+        self.assertEqual(
+            dashboard,
+            [
+                {**sales_month, **items_month}
+                for sales_month, items_month in zip(sales, items)
+            ],
+        )
+
+
+class CatalogueCacheTests(APITestCase):
+    """
+    Versioned cache of the catalogue read endpoints.
+    """
+
+    def setUp(self):
+        get_cache().clear()
+        self.user = User.objects.create_user(username="alice", password="secret")
+        self.client.force_authenticate(self.user)
+        create_product(Category.objects.create(name="Books"))
+
+    def test_not_modified(self):
+        response = self.client.get("/api/products/categories")
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(
+                "/api/products/categories", HTTP_IF_NONE_MATCH=response["ETag"]
+            )
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_write_invalidates(self):
+        response = self.client.get("/api/products/categories")
+        version = catalogue_version()
+
+        self.client.post(
+            "/api/products/add",
+            {
+                "title": "Chess",
+                "price": "30.00",
+                "description": "A board game",
+                "category": "Games",
+                "image": "https://example.com/chess.jpg",
+            },
+        )
+
+        self.assertEqual(catalogue_version(), version + 1)
+        changed = self.client.get(
+            "/api/products/categories", HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        self.assertEqual(changed.status_code, status.HTTP_200_OK)
+        self.assertIn("Games", str(changed.data))
+
+    def test_stats_are_staff_only(self):
+        response = self.client.get("/api/products/cache_stats")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get("/api/products/cache_stats")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("hits", response.data)
+
+
+class KeysetPaginationTests(APITestCase):
+    """
+    Cursor pagination of the product list.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="alice")
+        self.client.force_authenticate(self.user)
+        books = Category.objects.create(name="Books")
+        for index in range(9):
+            create_product(books, price=Decimal(index % 4))
+
+    def walk(self, query):
+        url = f"/api/products/list?pagination=cursor&{query}"
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids += [product["id"] for product in response.data["results"]]
+            url = response.data["next"]
+        return ids
+
+    def test_pages_follow_the_ordering(self):
+        expected = list(
+            Product.objects.order_by("price", "id").values_list("id", flat=True)
+        )
+        self.assertEqual(self.walk("limit=4&ordering=price"), expected)
+
+    def test_async_list_follows_the_ordering(self):
+        response = self.client.get(
+            "/api/products/async/list?pagination=cursor&limit=4&ordering=price",
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        expected = Product.objects.order_by("price", "id").values_list("id", flat=True)
+        self.assertEqual(
+            [product["id"] for product in response.json()["results"]],
+            list(expected[:4]),
+        )
+
+    def test_limit(self):
+        for limit, size in (("2", 2), ("0", 9), ("-1", 9), ("many", 9)):
+            response = self.client.get(
+                f"/api/products/list?pagination=cursor&limit={limit}"
+            )
+            self.assertEqual(len(response.data["results"]), size, limit)
+
+
+class FullTextSearchTests(APITestCase):
+    """
+    Ranked full-text search of the product list.
+    """
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user(username="alice"))
+        books = Category.objects.create(name="Books")
+        self.headphones = create_product(
+            books,
+            title="Wireless Headphones",
+            description="Noise cancelling headphones, the best headphones",
+        )
+        self.speaker = create_product(
+            books, title="Speaker", description="Pairs with headphones"
+        )
+        self.mat = create_product(books, title="Yoga Mat", description="Non-slip")
+
+    def search(self, query):
+        response = self.client.get(
+            f"/api/products/list?search_mode=fulltext&search={query}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [product["id"] for product in response.data["results"]]
+
+    def test_ranked_prefix_match(self):
+        self.assertEqual(
+            self.search("headphone"), [self.headphones.id, self.speaker.id]
+        )
+
+    def test_index_follows_writes(self):
+        self.mat.title = "Headphone stand"
+        self.mat.save()
+        self.headphones.delete()
+
+        self.assertCountEqual(self.search("headphone"), [self.speaker.id, self.mat.id])
+        self.assertEqual(self.search("wireless"), [])
+
+
+class ImportCommandTests(TestCase):
+    """
+    Bulk import of products from a file.
+    """
+
+    def import_lines(self, lines):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "products.jsonl"
+            path.write_text("\n".join(lines), encoding="utf-8")
+            stdout, stderr = io.StringIO(), io.StringIO()
+            call_command("import_products", str(path), stdout=stdout, stderr=stderr)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def product(self, title):
+        return json.dumps(
+            {
+                "title": title,
+                "price": "9.99",
+                "description": "A product",
+                "category": "Books",
+                "image": "https://example.com/product.jpg",
+            }
+        )
+
+    def test_malformed_line_is_a_row_error(self):
+        stdout, stderr = self.import_lines(
+            [self.product("First"), '{"title": "broken",', "", self.product("Last")]
+        )
+
+        self.assertCountEqual(
+            Product.objects.values_list("title", flat=True), ["First", "Last"]
+        )
+        self.assertIn("Row 2:", stderr)
+        self.assertIn("Invalid JSON", stderr)
+        self.assertIn("3 rows: 2 created, 0 updated, 1 failed", stdout)
+
+    def test_every_chunk_invalidates_the_cache(self):
+        rows = [json.loads(self.product(title)) for title in ("A", "B", "C")]
+        version = catalogue_version()
+
+        report = ProductImporter(chunk_size=2).run(rows)
+
+        self.assertEqual(report.created, 3)
+        self.assertEqual(catalogue_version(), version + 2)
+
+
+class BulkUpdateTests(APITestCase):
+    """
+    Batch update of products.
+    """
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user(username="alice"))
+        self.books = Category.objects.create(name="Books")
+        self.product = create_product(self.books)
+
+    def update(self, items):
+        response = self.client.patch("/api/products/bulk/update", items, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data["results"]
+
+    def test_update_writes_in_place(self):
+        with CaptureQueriesContext(connection) as context:
+            results = self.update(
+                [{"id": self.product.id, "price": "15.00", "category": "Games"}]
+            )
+
+        self.assertEqual(results[0]["status"], "updated")
+        statements = [query["sql"] for query in context.captured_queries]
+        self.assertFalse(
+            [
+                sql
+                for sql in statements
+                if sql.startswith('INSERT INTO "products_product"')
+            ]
+        )
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.price, Decimal("15.00"))
+        self.assertEqual(self.product.category.name, "Games")
+        row = MonthlyCategorySales.objects.get()
+        self.assertEqual((row.category.name, row.total_sales), ("Games", Decimal("15")))
+
+    def test_deleted_product_is_not_written_again(self):
+        product_id = self.product.id
+        self.product.delete()
+
+        results = self.update([{"id": product_id, "title": "Back"}])
+
+        self.assertEqual(results[0]["errors"], {"id": ["Product not found."]})
+        self.assertFalse(Product.objects.exists())
+
+    def test_boolean_ids_are_rejected(self):
+        results = self.update([{"id": True, "title": "Renamed"}])
+        self.assertEqual(results[0]["errors"], {"id": ["A product id is required."]})
+
+        response = self.client.post("/api/products/bulk/delete", [True], format="json")
+        self.assertEqual(response.data["results"][0]["status"], "error")
+        self.assertTrue(Product.objects.exists())
+
+
+class SalesAnalyticsTests(APITestCase):
+    """
+    Date range sales analytics.
+    """
+
+    def setUp(self):
+        get_cache().clear()
+        self.client.force_authenticate(User.objects.create_user(username="alice"))
+
+    # a zone where the local date differs from the UTC date most of the day
+    @override_settings(TIME_ZONE="Pacific/Kiritimati")
+    def test_default_range_ends_today_in_the_current_time_zone(self):
+        today = timezone.localdate()
+        create_product(Category.objects.create(name="Books"), date_of_sale=today)
+
+        response = self.client.get("/api/products/analytics")
+
+        self.assertEqual(response.data["to"], today.isoformat())
+        self.assertEqual(len(response.data["series"]), 30)
+        self.assertEqual(response.data["series"][-1]["items"], {"Books": 1})
+
+    def test_ranges_at_the_ends_of_the_calendar(self):
+        for query, size in (
+            ("from=9999-10-01&to=9999-12-31&granularity=quarter", 1),
+            ("from=9999-11-01&to=9999-12-31&granularity=month", 2),
+            ("from=9999-12-20&to=9999-12-31&granularity=week", 2),
+            ("from=9999-12-30&to=9999-12-31", 2),
+            ("to=0001-01-05", 5),
+        ):
+            response = self.client.get(f"/api/products/analytics?{query}")
+            self.assertEqual(response.status_code, status.HTTP_200_OK, query)
+            self.assertEqual(len(response.data["series"]), size, query)
+
+
+class ProductFacetsTests(APITestCase):
+    """
+    Filter panel facets of the product list.
+    """
+
+    def setUp(self):
+        get_cache().clear()
+        self.client.force_authenticate(User.objects.create_user(username="alice"))
+
+    def test_average_price_is_exact(self):
+        books = Category.objects.create(name="Books")
+        games = Category.objects.create(name="Games")
+        for price in ("0.35", "1.46", "1.96"):
+            create_product(books, price=Decimal(price))
+        create_product(games, price=Decimal("0.17"))
+
+        response = self.client.get("/api/products/facets")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # 3.94 / 4 = 0.985 exactly, rebuilt from the float average it rounds to 0.99
+        self.assertEqual(Decimal(response.data["avg_price"]), Decimal("0.98"))
+        averages = {
+            row["category"]: Decimal(row["avg_price"])
+            for row in response.data["categories"]
+        }
+        self.assertEqual(averages, {"Books": Decimal("1.26"), "Games": Decimal("0.17")})
+
+
+class EventBrokerTests(TestCase):
+    """
+    Replay of the live events to reconnecting clients.
+    """
+
+    def receive(self, broker, last_event_id):
+        async def first_events():
+            subscription = broker.subscribe(asyncio.get_running_loop(), last_event_id)
+            try:
+                received = [await subscription.get(1)]
+                broker.publish("catalogue", {"version": 2})
+                received.append(await subscription.get(1))
+                return received
+            finally:
+                subscription.close()
+
+        return asyncio.run(first_events())
+
+    def test_unknown_id_gets_a_reset(self):
+        broker = events.InProcessBroker()
+        broker.publish("catalogue", {"version": 1})
+        # the id of another process, or of this one before a restart
+        stale_id = broker.last_id() + 1000
+
+        reset, live = self.receive(broker, stale_id)
+
+        self.assertEqual(reset["event"], "reset")
+        self.assertEqual(live["data"], {"version": 2})
+
+    def test_sales_are_kept_without_subscribers(self):
+        broker = events.InProcessBroker()
+        broker.publish("catalogue", {"version": 1})
+        last_id = broker.last_id()
+
+        events._broker = broker
+        try:
+            with self.captureOnCommitCallbacks(execute=True):
+                create_product(Category.objects.create(name="Books"))
+        finally:
+            events._broker = None
+
+        missed = {event["event"]: event for event in broker.missed(last_id)}
+        self.assertEqual(missed["sales"]["data"]["deltas"][0]["items"], 1)
+
+
+@unittest.skipUnless(columnar.np, "the columnar engine needs NumPy")
+@override_settings(PRODUCTS_ANALYTICS_ENGINE="columnar")
+class ColumnarEngineTests(TestCase):
+    """
+    Charts and analytics rows of the columnar engine against the database queries.
+    """
+
+    date_from = datetime.date(2024, 10, 1)
+    date_to = datetime.date(2025, 3, 31)
+
+    def setUp(self):
+        get_cache().clear()
+        columnar._engine = None
+        self.addCleanup(setattr, columnar, "_engine", None)
+        books = Category.objects.create(name="Books")
+        games = Category.objects.create(name="Games")
+        # sales every 11 days, from before the range to after it
+        first_sale = datetime.date(2024, 9, 20)
+        for index in range(20):
+            create_product(
+                (books, games)[index % 2],
+                price=Decimal("1.05") * (index + 1),
+                is_sale=index % 3 == 0,
+                date_of_sale=first_sale + datetime.timedelta(days=index * 11),
+            )
+        create_product(books, date_of_sale=None)
+        create_product(games, sold=False, date_of_sale=None)
+
+    def assertMatchesDatabase(self):
+        engine = columnar.get_engine()
+        self.assertEqual(
+            sorted(engine.month_rows(), key=str),
+            sorted(ChartMatrix.rollup_rows(), key=str),
+        )
+        for granularity in GRANULARITIES:
+            for category in (None, "books"):
+                for split in (None, "is_sale"):
+                    args = (self.date_from, self.date_to, granularity, category, split)
+                    expected = [
+                        {
+                            key: value
+                            for key, value in row.items()
+                            if key != "category_id"
+                        }
+                        for row in grouped_sales(*args)
+                    ]
+                    self.assertCountEqual(engine.bucket_rows(*args), expected, args)
+
+    def test_rows_match_the_database(self):
+        self.assertMatchesDatabase()
+
+    def test_rows_follow_the_changes(self):
+        columnar.get_engine().month_rows()
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.order_by("id").first()
+            product.price = Decimal("99.99")
+            product.date_of_sale = datetime.date(2025, 1, 15)
+            product.save()
+            Product.objects.order_by("id").last().delete()
+            create_product(Category.objects.get(name="Games"), is_sale=True)
+
+        self.assertMatchesDatabase()
+
+    def test_facts_expire(self):
+        engine = columnar.get_engine()
+        engine.month_rows()
+        # a change of another process, which does not reach the feed of this process
+        Product.objects.filter(sold=True).update(price=Decimal("2.00"))
+
+        def repriced(rows):
+            return all(sales == 2 * items for _, _, sales, items in rows)
+
+        self.assertFalse(repriced(engine.month_rows()))
+        with override_settings(PRODUCTS_ANALYTICS_MAX_AGE=0):
+            self.assertTrue(repriced(engine.month_rows()))
+
+
+class ProductExportTests(APITestCase):
+    """
+    Streaming export of the filtered catalogue.
+    """
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user(username="alice"))
+        books = Category.objects.create(name="Books")
+        games = Category.objects.create(name="Games")
+        self.book = create_product(books, title="Dune", price=Decimal("9.50"))
+        self.game = create_product(games, title="Chess", sold=False, date_of_sale=None)
+
+    def export(self, query):
+        response = self.client.get(f"/api/products/export?{query}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, b"".join(response.streaming_content).decode()
+
+    def test_ndjson(self):
+        response, content = self.export("ordering=id")
+
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertEqual(
+            response["Content-Disposition"], 'attachment; filename="products.ndjson"'
+        )
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([row["id"] for row in rows], [self.book.id, self.game.id])
+        self.assertEqual(
+            rows[0],
+            {
+                "id": self.book.id,
+                "is_sale": False,
+                "sold": True,
+                "title": "Dune",
+                "price": "9.50",
+                "description": "A product",
+                "category": "Books",
+                "image": "https://example.com/product.jpg",
+                "date_of_sale": "2024-11-05",
+            },
+        )
+        self.assertIsNone(rows[1]["date_of_sale"])
+
+    def test_csv(self):
+        response, content = self.export(
+            "ordering=id&export_format=csv&fields=id,title,sold,date_of_sale"
+        )
+
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertEqual(
+            content.splitlines(),
+            [
+                "id,sold,title,date_of_sale",
+                f"{self.book.id},true,Dune,2024-11-05",
+                f"{self.game.id},false,Chess,",
+            ],
+        )
+
+    def test_filters_are_applied(self):
+        _, content = self.export("category=games")
+        self.assertEqual(
+            [json.loads(line)["title"] for line in content.splitlines()], ["Chess"]
+        )
+
+    def test_unknown_format(self):
+        response = self.client.get("/api/products/export?export_format=xml")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_rows_are_read_in_chunks(self):
+        iterator = QuerySet.iterator
+        with mock.patch.object(
+            QuerySet, "iterator", autospec=True, side_effect=iterator
+        ) as patched:
+            _, content = self.export("")
+
+        self.assertEqual(len(content.splitlines()), 2)
+        patched.assert_called_once_with(
+            mock.ANY, chunk_size=ProductExportView.chunk_size
+        )
+
+
+class ProductRowSerializerTests(APITestCase):
+    """
+    Product rows serialized from values() like the ProductSerializer does.
+    """
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user(username="alice"))
+        books = Category.objects.create(name="Livres d'été")
+        create_product(books, title="Zürich", price=Decimal("1234.5"), is_sale=True)
+        create_product(books, price=Decimal("0.1"), sold=False, date_of_sale=None)
+        create_product(
+            Category.objects.create(name="Games"),
+            date_of_sale=datetime.date(2000, 1, 2),
+        )
+
+    def test_same_output_as_the_model_serializer(self):
+        products = Product.objects.order_by("id")
+        row_serializer = ProductRowSerializer()
+
+        self.assertEqual(
+            JSONRenderer().render(
+                row_serializer.serialize(row_serializer.values(products))
+            ),
+            JSONRenderer().render(ProductSerializer(products, many=True).data),
+        )
+
+    def test_fields_narrow_the_rows(self):
+        row_serializer = ProductRowSerializer(["price", "id", "category"])
+        rows = row_serializer.values(Product.objects.order_by("id"))
+
+        self.assertEqual(set(rows[0]), {"id", "price", "category_name"})
+        self.assertEqual(
+            row_serializer.serialize(rows)[0],
+            {"id": rows[0]["id"], "price": "1234.50", "category": "Livres d'été"},
+        )
+
+    def test_list_fields_parameter(self):
+        response = self.client.get("/api/products/list?fields=title,id")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(response.data["results"][0]), ["id", "title"])
+
+        response = self.client.get("/api/products/list?fields=title,secret")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CategoryTests(APITestCase):
+    """
+    Products read and written with case-insensitive category names.
+    """
+
+    def setUp(self):
+        get_cache().clear()
+        self.client.force_authenticate(User.objects.create_user(username="alice"))
+        self.books = Category.objects.create(name="Books")
+        self.games = Category.objects.create(name="Games")
+        self.book = create_product(self.books, title="Dune")
+        self.game = create_product(self.games, title="Chess")
+
+    def product_data(self, **fields):
+        return {
+            "title": "Product",
+            "price": "10.00",
+            "description": "A product",
+            "image": "https://example.com/product.jpg",
+            **fields,
+        }
+
+    def test_create_reuses_the_category(self):
+        response = self.client.post(
+            "/api/products/add", self.product_data(category="BOOKS"), format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["category"], "Books")
+        product = Product.objects.get(pk=response.data["id"])
+        self.assertEqual(product.category_id, self.books.id)
+        self.assertEqual(Category.objects.count(), 2)
+
+    def test_create_with_a_new_category(self):
+        response = self.client.post(
+            "/api/products/add", self.product_data(category="Toys"), format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Category.objects.named("toys").get().name, "Toys")
+
+    def test_update_reuses_the_category(self):
+        response = self.client.patch(
+            f"/api/products/{self.book.id}", {"category": "games"}, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["category"], "Games")
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.category_id, self.games.id)
+        self.assertEqual(Category.objects.count(), 2)
+
+    def test_bulk_create_resolves_the_spellings_together(self):
+        response = self.client.post(
+            "/api/products/bulk/add",
+            [self.product_data(category=name) for name in ("Toys", "TOYS", "books")],
+            format="json",
+        )
+
+        self.assertEqual(response.data["succeeded"], 3)
+        self.assertEqual(
+            sorted(Category.objects.values_list("name", flat=True)),
+            ["Books", "Games", "Toys"],
+        )
+
+    def test_category_filter(self):
+        for value in ("Books", "books", "BOOKS"):
+            response = self.client.get(f"/api/products/list?category={value}")
+            self.assertEqual(
+                [product["id"] for product in response.data["results"]],
+                [self.book.id],
+                value,
+            )
+
+        response = self.client.get("/api/products/list?category=Toys")
+        self.assertEqual(response.data["results"], [])
+
+    def test_search_within_a_category(self):
+        create_product(self.games, title="Dune board game")
+
+        response = self.client.get("/api/products/list?search=dune&category=books")
+
+        self.assertEqual(
+            [product["id"] for product in response.data["results"]], [self.book.id]
+        )
+        self.assertEqual(response.data["results"][0]["category"], "Books")
+
+    def test_categories_list(self):
+        # a category without products is not listed
+        Category.objects.create(name="Toys")
+
+        response = self.client.get("/api/products/categories")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, ["Books", "Games"])
+
+
+class CategoryMigrationTests(TransactionTestCase):
+    """
+    Migration of the product category names to the category table.
+    """
+
+    migrate_from = [("products", "0003_product_search")]
+    migrate_to = [("products", "0004_category")]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def setUp(self):
+        self.addCleanup(
+            self.migrate,
+            MigrationExecutor(connection).loader.graph.leaf_nodes("products"),
+        )
+        apps = self.migrate(self.migrate_from)
+        OldProduct = apps.get_model("products", "Product")
+        for category in ("books", "Books", "Books", " BOOKS ", "Games"):
+            OldProduct.objects.create(
+                title="Product",
+                price=Decimal("10.00"),
+                description="A product",
+                category=category,
+                image="https://example.com/product.jpg",
+                sold=True,
+                date_of_sale=datetime.date(2024, 11, 5),
+            )
+
+    def test_forward_and_backward(self):
+        apps = self.migrate(self.migrate_to)
+
+        NewCategory = apps.get_model("products", "Category")
+        NewProduct = apps.get_model("products", "Product")
+        self.assertEqual(
+            sorted(NewCategory.objects.values_list("name", flat=True)),
+            ["Books", "Games"],
+        )
+        self.assertEqual(
+            dict(
+                NewProduct.objects.values_list("category__name")
+                .annotate(count=Count("id"))
+                .order_by()
+            ),
+            {"Books": 4, "Games": 1},
+        )
+        NewRollup = apps.get_model("products", "MonthlyCategorySales")
+        self.assertEqual(
+            dict(NewRollup.objects.values_list("category__name", "total_items")),
+            {"Books": 4, "Games": 1},
+        )
+
+        apps = self.migrate(self.migrate_from)
+
+        OldProduct = apps.get_model("products", "Product")
+        self.assertEqual(
+            sorted(OldProduct.objects.values_list("category", flat=True)),
+            ["Books", "Books", "Books", "Books", "Games"],
+        )
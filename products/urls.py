@@ -1,11 +1,29 @@
 from django.urls import path
 
+from products.async_views import (
+    AsyncProductListView,
+    AsyncCategoriesListView,
+    AsyncPriceRangeView,
+    AsyncSalesChartView,
+    AsyncItemsChartView,
+    AsyncDashboardChartView,
+    AsyncDashboardView,
+    AsyncSalesEventsView,
+)
 from products.views import (
     ProductListView,
+    ProductExportView,
     CategoriesListView,
     PriceRangeView,
+    ProductFacetsView,
     SalesChartView,
     ItemsChartView,
+    DashboardChartView,
+    CacheStatsView,
+    SalesAnalyticsView,
+    ProductBulkCreateView,
+    ProductBulkUpdateView,
+    ProductBulkDeleteView,
     ProductCreateView,
     ProductUpdateView,
     ProductDeleteView,
@@ -13,11 +31,36 @@ from products.views import (
 
 urlpatterns = [
     path("list", ProductListView.as_view(), name="product-list"),
+    path("export", ProductExportView.as_view(), name="product-export"),
     path("add", ProductCreateView.as_view(), name="product-add"),
     path("<int:pk>", ProductUpdateView.as_view(), name="product-update"),
     path("<int:pk>/delete", ProductDeleteView.as_view(), name="product-delete"),
+    path("bulk/add", ProductBulkCreateView.as_view(), name="product-bulk-add"),
+    path("bulk/update", ProductBulkUpdateView.as_view(), name="product-bulk-update"),
+    path("bulk/delete", ProductBulkDeleteView.as_view(), name="product-bulk-delete"),
+    path("facets", ProductFacetsView.as_view(), name="product-facets"),
     path("price_range", PriceRangeView.as_view(), name="price-range"),
     path("categories", CategoriesListView.as_view(), name="categories-list"),
     path("sales_chart", SalesChartView.as_view(), name="sales-chart"),
     path("items_chart", ItemsChartView.as_view(), name="items-chart"),
+    path("dashboard_chart", DashboardChartView.as_view(), name="dashboard-chart"),
+    path("analytics", SalesAnalyticsView.as_view(), name="sales-analytics"),
+    path("cache_stats", CacheStatsView.as_view(), name="cache-stats"),
+    # async variants for ASGI deployments
+    path("async/list", AsyncProductListView.as_view(), name="async-product-list"),
+    path(
+        "async/categories",
+        AsyncCategoriesListView.as_view(),
+        name="async-categories-list",
+    ),
+    path("async/price_range", AsyncPriceRangeView.as_view(), name="async-price-range"),
+    path("async/sales_chart", AsyncSalesChartView.as_view(), name="async-sales-chart"),
+    path("async/items_chart", AsyncItemsChartView.as_view(), name="async-items-chart"),
+    path(
+        "async/dashboard_chart",
+        AsyncDashboardChartView.as_view(),
+        name="async-dashboard-chart",
+    ),
+    path("async/dashboard", AsyncDashboardView.as_view(), name="async-dashboard"),
+    path("events", AsyncSalesEventsView.as_view(), name="sales-events"),
 ]
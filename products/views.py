@@ -1,20 +1,43 @@
 import django_filters.rest_framework as django_filters
-from django.db.models import Count, Max, Min, Sum
-from django.db.models.functions import TruncMonth
+from django.conf import settings
+from django.http import HttpRequest, QueryDict, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.http import urlencode
+from django.db.models import Max, Min
 
 # import django_filters
 from django_filters import FilterSet
 from rest_framework import filters, generics, mixins
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import JSONParser
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from products.models import Product
+from products.analytics import sales_series
+from products.bulk import (
+    bulk_create_products,
+    bulk_delete_products,
+    bulk_update_products,
+)
+from products.cache import CatalogueCacheMixin, cache_stats
+from products.charts import ChartMatrix
+from products.export import CONTENT_TYPES, STREAMS
+from products.facets import product_facets
+from products.models import Category, Product
+from products.pagination import ProductCountPagination, ProductKeysetPagination
+from products.parsers import NDJSONParser
+from products.search import ProductSearchFilter
 from products.serializers import (
+    AnalyticsQuerySerializer,
+    DashboardChartSerializer,
     ItemsChartSerializer,
+    ProductRowSerializer,
     ProductSerializer,
     SalesChartSerializer,
 )
+from sales_monitor_api.db import PrimaryPinMixin, ReplicaReadMixin
 
 
 class ProductFilter(FilterSet):
@@ -30,7 +53,7 @@ class ProductFilter(FilterSet):
 
     min_price = django_filters.NumberFilter(field_name="price", lookup_expr="gte")
     max_price = django_filters.NumberFilter(field_name="price", lookup_expr="lte")
-    category = django_filters.CharFilter(field_name="category", lookup_expr="iexact")
+    category = django_filters.CharFilter(method="filter_category")
 
     class Meta:
         model = Product
@@ -38,21 +61,30 @@ class ProductFilter(FilterSet):
             "sold": ["exact"],
         }
 
+    def filter_category(self, queryset, name, value):
+        # the name is matched on the small category table, products on the category id
+        return queryset.filter(category__in=Category.objects.named(value))
+
 
-class ProductListView(generics.ListAPIView):
+class ProductListView(ReplicaReadMixin, generics.ListAPIView):
     """
     Product List View for listing and creating products.
 
     The view is inherited from ListCreateAPIView. The view is used to list all products and create a new product.
+
+    - pagination: set to "cursor" to use keyset pagination instead of limit/offset.
+    - search_mode: set to "fulltext" for a ranked full-text search on title and description.
+    - fields: comma separated list of the fields to return, e.g. id,title,price.
     """
 
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = ProductCountPagination
 
     # filters
     filter_backends = [
-        filters.SearchFilter,
+        ProductSearchFilter,
         filters.OrderingFilter,
         django_filters.DjangoFilterBackend,
     ]
@@ -65,8 +97,101 @@ class ProductListView(generics.ListAPIView):
     # ordering fields
     ordering_fields = ["price", "title"]
 
+    # pagination=cursor switches to keyset pagination
+    pagination_query_param = "pagination"
+
+    # sparse fieldset, e.g. fields=id,title,price
+    fields_query_param = "fields"
+
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator"):
+            mode = self.request.query_params.get(self.pagination_query_param)
+            if mode == "cursor":
+                self._paginator = ProductKeysetPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def get_row_serializer(self):
+        return ProductRowSerializer.from_query_param(
+            self.request.query_params.get(self.fields_query_param)
+        )
+
+    def list(self, request, *args, **kwargs):
+        # rows are read with values() and serialized by the lightweight row serializer
+        row_serializer = self.get_row_serializer()
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = row_serializer.values(queryset, "id", "price", "title")
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(row_serializer.serialize(page))
+        return Response(row_serializer.serialize(rows))
+
+
+class ProductExportView(ProductListView):
+    """
+    Product Export View for downloading the whole (filtered) catalogue.
+
+    The view accepts the same filter, search and ordering parameters as the product list
+    and streams every matching product without pagination.
+
+    - export_format: "ndjson" (default) or "csv".
+    - fields: comma separated list of the fields to export.
+    """
+
+    export_format_param = "export_format"
+    chunk_size = 2000
+
+    def get_export(self):
+        """
+        Return the export format and the stream of the exported rows.
+        """
+        export_format = self.request.query_params.get(
+            self.export_format_param, "ndjson"
+        )
+        if export_format not in STREAMS:
+            raise ValidationError(
+                {self.export_format_param: [f"Choose one of {', '.join(STREAMS)}."]}
+            )
+
+        queryset = self.filter_queryset(self.get_queryset())
+        # the rows are read after the view returns: bind the database chosen for the view
+        queryset = queryset.using(queryset.db)
+        return export_format, STREAMS[export_format](
+            queryset, self.get_row_serializer(), chunk_size=self.chunk_size
+        )
 
-class ProductCreateView(generics.CreateAPIView):
+    def get(self, request, *args, **kwargs):
+        export_format, stream = self.get_export()
+        response = StreamingHttpResponse(
+            stream, content_type=CONTENT_TYPES[export_format]
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="products.{export_format}"'
+        )
+        return response
+
+    @classmethod
+    def write_export(cls, params, file):
+        """
+        Write the export of the given query parameters to a text file, outside of a
+        request (e.g. in a background job), and return the export format.
+        """
+        http_request = HttpRequest()
+        http_request.method = "GET"
+        http_request.GET = QueryDict(urlencode(params))
+        view = cls(format_kwarg=None, args=(), kwargs={})
+        view.request = Request(http_request)
+
+        export_format, stream = view.get_export()
+        for chunk in stream:
+            file.write(chunk)
+        return export_format
+
+
+class ProductCreateView(PrimaryPinMixin, generics.CreateAPIView):
     """
     Product Create View for creating products.
 
@@ -78,7 +203,7 @@ class ProductCreateView(generics.CreateAPIView):
     permission_classes = [IsAuthenticated]
 
 
-class ProductUpdateView(generics.UpdateAPIView):
+class ProductUpdateView(PrimaryPinMixin, generics.UpdateAPIView):
     """
     Product Update View for updating products.
 
@@ -90,7 +215,7 @@ class ProductUpdateView(generics.UpdateAPIView):
     permission_classes = [IsAuthenticated]
 
 
-class ProductDeleteView(generics.DestroyAPIView):
+class ProductDeleteView(PrimaryPinMixin, generics.DestroyAPIView):
     """
     Product Delete View for deleting products.
 
@@ -102,21 +227,37 @@ class ProductDeleteView(generics.DestroyAPIView):
     permission_classes = [IsAuthenticated]
 
 
-class CategoriesListView(generics.ListAPIView):
+class CategoriesListView(CatalogueCacheMixin, generics.ListAPIView):
     """
     Categories List View for listing all categories.
 
     The view is inherited from ListAPIView. The view is used to list all categories.
+    The names are read from the category table, an index lookup per category checks that
+    it has products.
     """
 
     permission_classes = [IsAuthenticated]
 
-    def get(self, request, *args, **kwargs):
-        categories = Product.objects.values_list("category", flat=True).distinct()
-        return Response(categories)
+    def get_data(self, request):
+        categories = Category.objects.in_use().order_by("id")
+        return list(categories.values_list("name", flat=True))
 
 
-class PriceRangeView(APIView):
+class ProductFacetsView(CatalogueCacheMixin, ProductListView):
+    """
+    Product Facets View for the filter panel of the product list.
+
+    The view accepts the same filter and search parameters as the product list and returns,
+    in one grouped query, the product count, sold count and min/max/avg price of the
+    matching products in total and per category.
+    """
+
+    def get_data(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        return product_facets(queryset)
+
+
+class PriceRangeView(CatalogueCacheMixin, APIView):
     """
     Price Range View for getting the price range of products.
 
@@ -125,97 +266,179 @@ class PriceRangeView(APIView):
 
     permission_classes = [IsAuthenticated]
 
-    def get(self, request, *args, **kwargs):
-        min_price = Product.objects.aggregate(min_price=Min("price"))["min_price"]
-        max_price = Product.objects.aggregate(max_price=Max("price"))["max_price"]
-        return Response({"min_price": min_price, "max_price": max_price})
+    def get_data(self, request):
+        return Product.objects.aggregate(min_price=Min("price"), max_price=Max("price"))
 
 
-class SalesChartView(APIView):
+class SalesChartView(ReplicaReadMixin, CatalogueCacheMixin, APIView):
     """
     Sales Chart View
 
     This view generates and returns data for a chart showing the total sales in each category,
     grouped by month.
 
+    The data is read from the MonthlyCategorySales rollup table, so the cost of the request
+    depends on the number of months and categories rather than the number of products.
     """
 
     permission_classes = [IsAuthenticated]
 
-    def get(self, request, *args, **kwargs):
-        data = (
-            Product.objects.filter(sold=True)
-            .annotate(month=TruncMonth("date_of_sale"))
-            .values("month", "category")
-            .annotate(total_sales=Sum("price"))
-            .order_by("month")
-        )
+    def get_data(self, request):
+        result = ChartMatrix.from_rollup().series("sales")
 
-        # Create a dictionary to group by month
-        grouped_data = {}
-        for item in data:
-            month = item["month"].strftime("%b %Y") if item["month"] else None
-            category = item["category"]
-            total_sales = item["total_sales"]
+        serializer = SalesChartSerializer(result, many=True)
+        return serializer.data
 
-            if month not in grouped_data:
-                grouped_data[month] = {"month": month, "sales": {}}
 
-            grouped_data[month]["sales"][category] = total_sales
+class ItemsChartView(ReplicaReadMixin, CatalogueCacheMixin, APIView):
+    """
+    Items Chart View
 
-        # Ensure all categories are present even if zero sales
-        all_categories = Product.objects.values_list("category", flat=True).distinct()
-        for month in grouped_data:
-            for category in all_categories:
-                if category not in grouped_data[month]["sales"]:
-                    grouped_data[month]["sales"][category] = 0
+    This view generates and returns data for a chart showing the total number of items sold
+    in each category, grouped by month.
 
-        # Convert to list
-        result = list(grouped_data.values())
+    The data is read from the MonthlyCategorySales rollup table.
+    """
 
-        serializer = SalesChartSerializer(result, many=True)
-        return Response(serializer.data)
+    def get_data(self, request):
+        result = ChartMatrix.from_rollup().series("items")
+
+        serializer = ItemsChartSerializer(result, many=True)
+        return serializer.data
 
 
-class ItemsChartView(APIView):
+class DashboardChartView(ReplicaReadMixin, CatalogueCacheMixin, APIView):
     """
-    Items Chart View
+    Dashboard Chart View
 
-    This view generates and returns data for a chart showing the total number of items sold
-    in each category, grouped by month.
+    This view returns the data of the sales and items charts in one response: the total sales
+    and the total number of items sold in each category, grouped by month.
+
+    Both series come from the same rollup query, so a dashboard render costs a single scan.
     """
 
+    permission_classes = [IsAuthenticated]
+
+    def get_data(self, request):
+        result = ChartMatrix.from_rollup().series("sales", "items")
+
+        serializer = DashboardChartSerializer(result, many=True)
+        return serializer.data
+
+
+class SalesAnalyticsView(ReplicaReadMixin, CatalogueCacheMixin, APIView):
+    """
+    Sales Analytics View
+
+    This view returns the total sales and the number of items sold in each category for a
+    date range, grouped in day, week, month or quarter buckets. Only the requested range is
+    scanned and every bucket of the range is present, zero-filled.
+
+    - from, to: inclusive date range (defaults to the last 30 days).
+    - granularity: day (default), week, month or quarter.
+    - category: restrict to one category (case-insensitive).
+    - split: set to is_sale to also return the series split by sale/regular products.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get_cache_key(self, request, version):
+        # the default range moves with the current date
+        key = super().get_cache_key(request, version)
+        return f"{key}:{timezone.localdate().isoformat()}"
+
+    def get_data(self, request):
+        serializer = AnalyticsQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+
+        return sales_series(
+            params["from"],
+            params["to"],
+            granularity=params["granularity"],
+            category=params.get("category"),
+            split=params.get("split"),
+        )
+
+
+class CacheStatsView(APIView):
+    """
+    Cache Stats View
+
+    This view returns the hit/miss counters of the catalogue response cache of the current
+    process, so they can be scraped by the monitoring. Only staff users can read them.
+    """
+
+    permission_classes = [IsAdminUser]
+
     def get(self, request, *args, **kwargs):
-        data = (
-            Product.objects.filter(sold=True)
-            .annotate(month=TruncMonth("date_of_sale"))
-            .values("month", "category")
-            .annotate(total_items=Count("id"))
-            .order_by("month")
+        return Response(cache_stats())
+
+
+class ProductBulkView(PrimaryPinMixin, APIView):
+    """
+    Base view for the batch product endpoints.
+
+    The request body is a JSON array or NDJSON (`Content-Type: application/x-ndjson`) with at
+    most `PRODUCTS_BULK_MAX_ITEMS` items. The response lists one result per item, in order.
+    """
+
+    permission_classes = [IsAuthenticated]
+    parser_classes = [JSONParser, NDJSONParser]
+    bulk_operation = None
+
+    def get_items(self, request):
+        items = request.data
+        if not isinstance(items, list):
+            raise ValidationError({"non_field_errors": ["Expected a list of items."]})
+        max_items = settings.PRODUCTS_BULK_MAX_ITEMS
+        if len(items) > max_items:
+            message = f"Ensure this list has at most {max_items} items."
+            raise ValidationError({"non_field_errors": [message]})
+        return items
+
+    def bulk_response(self, request):
+        results = self.bulk_operation(self.get_items(request))
+        failed = sum(1 for result in results if result["status"] == "error")
+        return Response(
+            {"succeeded": len(results) - failed, "failed": failed, "results": results}
         )
 
-        # Group the data by month and category
-        grouped_data = {}
-        for item in data:
-            month = item["month"].strftime("%b %Y") if item["month"] else None
-            category = item["category"]
-            total_items = item["total_items"]
 
-            if month not in grouped_data:
-                grouped_data[month] = {"month": month, "items": {}}
+class ProductBulkCreateView(ProductBulkView):
+    """
+    Product Bulk Create View for creating many products in one request.
 
-            grouped_data[month]["items"][category] = total_items
+    - use method POST with a list of products.
+    """
 
-        # Ensure all categories are present even if no items were sold
-        all_categories = Product.objects.values_list("category", flat=True).distinct()
-        for month in grouped_data:
-            for category in all_categories:
-                if category not in grouped_data[month]["items"]:
-                    grouped_data[month]["items"][category] = 0
+    bulk_operation = staticmethod(bulk_create_products)
 
-        # Convert to list
-        result = list(grouped_data.values())
+    def post(self, request, *args, **kwargs):
+        return self.bulk_response(request)
 
-        # ✅ Use the serializer here:
-        serializer = ItemsChartSerializer(result, many=True)
-        return Response(serializer.data)
+
+class ProductBulkUpdateView(ProductBulkView):
+    """
+    Product Bulk Update View for partially updating many products in one request.
+
+    - use method PATCH with a list of objects holding the product "id" and the fields to update.
+    """
+
+    bulk_operation = staticmethod(bulk_update_products)
+
+    def patch(self, request, *args, **kwargs):
+        return self.bulk_response(request)
+
+
+class ProductBulkDeleteView(ProductBulkView):
+    """
+    Product Bulk Delete View for deleting many products in one request.
+
+    - use method POST with a list of product ids.
+    """
+
+    bulk_operation = staticmethod(bulk_delete_products)
+
+    def post(self, request, *args, **kwargs):
+        return self.bulk_response(request)
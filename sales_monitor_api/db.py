@@ -0,0 +1,131 @@
+"""
+Routing of the read-heavy views to a read replica.
+
+When a `replica` database is configured, the views using `ReplicaReadMixin` (or the async
+views with `replica_reads`) run their queries on it, while every write goes to `default`.
+A user who just wrote is pinned to the primary for `DATABASE_REPLICA_LAG` seconds, so the
+following reads see their own writes even when the replica lags behind. The pins are kept
+in the default cache, which must be shared by the worker processes (see the
+`products.W002` check). Without a replica all queries use `default`.
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+REPLICA_ALIAS = "replica"
+ROUTED_ALIASES = {DEFAULT_DB_ALIAS, REPLICA_ALIAS}
+
+_read_alias = ContextVar("db_read_alias", default=None)
+
+
+def replica_configured():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+def reading_from_replica():
+    return _read_alias.get() == REPLICA_ALIAS
+
+
+@contextmanager
+def replica_reads():
+    """
+    Send the reads of the block to the replica.
+    """
+    token = _read_alias.set(REPLICA_ALIAS)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def pin_key(user):
+    return f"db:pinned:{user.pk}"
+
+
+def pin_to_primary(user):
+    """
+    Read from the primary for the next requests of a user who wrote.
+    """
+    if replica_configured() and user.is_authenticated:
+        cache.set(pin_key(user), time.time(), timeout=settings.DATABASE_REPLICA_LAG)
+
+
+def use_replica(user):
+    """
+    Return whether the reads of a request of the user can go to the replica.
+    """
+    if not replica_configured():
+        return False
+    return not user.is_authenticated or cache.get(pin_key(user)) is None
+
+
+async def ause_replica(user):
+    if not replica_configured():
+        return False
+    return not user.is_authenticated or await cache.aget(pin_key(user)) is None
+
+
+class ReplicaRouter:
+    """
+    Database router sending the reads of `replica_reads()` blocks to the replica.
+    """
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        # objects read from the replica are saved to the primary
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db == REPLICA_ALIAS:
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if {obj1._state.db, obj2._state.db} <= ROUTED_ALIASES:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # the replica receives the schema from the primary
+        return False if db == REPLICA_ALIAS else None
+
+
+class ReplicaReadMixin:
+    """
+    Mixin for read-only APIViews whose queries can run on the read replica.
+
+    The queries run between the authentication and the response; a streamed response must
+    bind its querysets with `.using(queryset.db)` while the view runs.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        token = _read_alias.set(None)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            _read_alias.reset(token)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if use_replica(request.user):
+            _read_alias.set(REPLICA_ALIAS)
+
+
+class PrimaryPinMixin:
+    """
+    Mixin for the write APIViews pinning the user to the primary after a successful write.
+    """
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if (
+            request.method not in ("GET", "HEAD", "OPTIONS")
+            and response.status_code < 400
+        ):
+            pin_to_primary(request.user)
+        return response
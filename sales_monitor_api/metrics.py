@@ -0,0 +1,191 @@
+"""
+Process-local request metrics in the Prometheus text format.
+
+The metrics are recorded by `sales_monitor_api.middleware.MetricsMiddleware` and served at
+`/metrics` to staff users and to scrapers sending the `METRICS_TOKEN` bearer token. Apps
+can add their own values with `register_collector()`. Every process keeps its own
+counters, so with several workers each one must be scraped (or the values summed).
+"""
+
+import bisect
+import hmac
+import threading
+
+from django.conf import settings
+from django.http import HttpResponse
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+
+def format_labels(names, values, extra=""):
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """
+    Monotonic counter with labels.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            yield f"{self.name}{format_labels(self.labelnames, labels)}", value
+
+
+class Histogram:
+    """
+    Histogram with cumulative buckets, a sum and a count per label set.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames, buckets):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def observe(self, labels, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(labels, (None, 0))
+            if counts is None:
+                counts = [0] * (len(self.buckets) + 1)
+            counts[index] += 1
+            self._values[labels] = (counts, total + value)
+
+    def samples(self):
+        with self._lock:
+            values = {labels: (list(c), s) for labels, (c, s) in self._values.items()}
+        for labels, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                le = format_labels(self.labelnames, labels, f'le="{bound}"')
+                yield f"{self.name}_bucket{le}", cumulative
+            label_text = format_labels(self.labelnames, labels)
+            yield f"{self.name}_sum{label_text}", total
+            yield f"{self.name}_count{label_text}", cumulative
+
+
+REQUEST_LABELS = ("method", "route")
+
+requests_total = Counter(
+    "http_requests_total", "Requests by route and status.", REQUEST_LABELS + ("status",)
+)
+request_duration = Histogram(
+    "http_request_duration_seconds",
+    "Request latency in seconds.",
+    REQUEST_LABELS,
+    LATENCY_BUCKETS,
+)
+response_size = Histogram(
+    "http_response_size_bytes",
+    "Response body size in bytes (non-streaming responses).",
+    REQUEST_LABELS,
+    SIZE_BUCKETS,
+)
+db_queries = Histogram(
+    "db_queries_per_request",
+    "Database queries executed per request.",
+    REQUEST_LABELS,
+    QUERY_COUNT_BUCKETS,
+)
+db_duration = Histogram(
+    "db_query_duration_seconds_per_request",
+    "Time spent in database queries per request, in seconds.",
+    REQUEST_LABELS,
+    LATENCY_BUCKETS,
+)
+
+METRICS = (requests_total, request_duration, response_size, db_queries, db_duration)
+
+_collectors = []
+
+
+def register_collector(collector):
+    """
+    Add a callable returning extra `(name, kind, help, value)` samples to `/metrics`.
+    """
+    _collectors.append(collector)
+
+
+def render():
+    """
+    Return all the metrics in the Prometheus text exposition format.
+    """
+    lines = []
+    for metric in METRICS:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(
+            f"{name} {format_value(value)}" for name, value in metric.samples()
+        )
+
+    for collector in _collectors:
+        for name, kind, help, value in collector():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {format_value(value)}")
+
+    return "\n".join(lines) + "\n"
+
+
+def is_authorized(request):
+    """
+    Return whether the request may read the metrics.
+
+    Staff users logged in to the admin are allowed, and so are requests with an
+    `Authorization: Bearer <METRICS_TOKEN>` header when a token is configured.
+    """
+    user = getattr(request, "user", None)
+    if user is not None and user.is_active and user.is_staff:
+        return True
+
+    token = settings.METRICS_TOKEN
+    scheme, _, credentials = request.headers.get("Authorization", "").partition(" ")
+    return (
+        bool(token)
+        and scheme.lower() == "bearer"
+        and hmac.compare_digest(credentials.strip().encode(), token.encode())
+    )
+
+
+def metrics_view(request):
+    """
+    Serve the metrics of this process to Prometheus.
+    """
+    if not is_authorized(request):
+        response = HttpResponse("Authentication required.\n", status=401)
+        response["WWW-Authenticate"] = 'Bearer realm="metrics"'
+        return response
+    return HttpResponse(render(), content_type="text/plain; version=0.0.4")
@@ -0,0 +1,116 @@
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from sales_monitor_api import metrics
+
+_query_stats = ContextVar("metrics_query_stats", default=None)
+
+
+class QueryStats:
+    """
+    Number and duration of the database queries of a request.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Database execute wrapper adding the query to the stats of the current request.
+
+    The stats are found through a context variable, which the async ORM carries over to
+    the thread running the query.
+    """
+    stats = _query_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.count += 1
+        stats.duration += time.perf_counter() - started
+
+
+def install_wrapper(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class MetricsMiddleware:
+    """
+    Record the latency, database queries and response size of every request.
+
+    The metrics are labelled with the method and the URL pattern of the view, and served at
+    `/metrics`. With `METRICS_SERVER_TIMING` enabled the response also carries a
+    `Server-Timing` header with the total and database time of the request.
+
+    Queries run while a streaming response is consumed happen after the middleware returns
+    and are not counted.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed()
+
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+        # connections are per thread: wrap the ones the async ORM opens in its threads
+        connection_created.connect(install_wrapper)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        for alias in connections:
+            install_wrapper(connections[alias])
+        stats = QueryStats()
+        token = _query_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _query_stats.reset(token)
+        return self.record(request, response, stats, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        stats = QueryStats()
+        token = _query_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _query_stats.reset(token)
+        return self.record(request, response, stats, time.perf_counter() - started)
+
+    def record(self, request, response, stats, duration):
+        match = request.resolver_match
+        labels = (request.method, match.route if match else "<unmatched>")
+
+        metrics.requests_total.inc(labels + (str(response.status_code),))
+        metrics.request_duration.observe(labels, duration)
+        metrics.db_queries.observe(labels, stats.count)
+        metrics.db_duration.observe(labels, stats.duration)
+        if not response.streaming:
+            metrics.response_size.observe(labels, len(response.content))
+
+        if settings.METRICS_SERVER_TIMING:
+            response["Server-Timing"] = (
+                f'db;dur={stats.duration * 1000:.1f};desc="{stats.count} queries", '
+                f"total;dur={duration * 1000:.1f}"
+            )
+        return response
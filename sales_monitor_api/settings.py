@@ -54,6 +54,7 @@ EXTERNAL_APPS = [
     "rest_framework_simplejwt",
     "users",
     "products",
+    "jobs",
     "django_extensions",
     "django_filters",
 ]
@@ -62,7 +63,7 @@ INSTALLED_APPS += EXTERNAL_APPS
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "users.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_RENDERER_CLASSES": (
         ("rest_framework.renderers.JSONRenderer",)
@@ -84,7 +85,18 @@ SIMPLE_JWT = {
     "UPDATE_LAST_LOGIN": True,
 }
 
+# Process-local cache of the users resolved from JWT access tokens. Entries expire after
+# the TTL (at most the access token lifetime) and are dropped in every process when the
+# user is saved, through a per-user version kept in the USERS_AUTH_CACHE_ALIAS cache (this
+# needs a cache shared by the processes, the TTL bounds the staleness otherwise).
+USERS_AUTH_CACHE_SIZE = int(os.getenv("USERS_AUTH_CACHE_SIZE", "10000"))
+USERS_AUTH_CACHE_TTL = int(os.getenv("USERS_AUTH_CACHE_TTL", "5"))
+USERS_AUTH_CACHE_ALIAS = os.getenv("USERS_AUTH_CACHE_ALIAS", "default")
+# Seconds a ticket of POST /api/users/stream_ticket opens the live events stream
+USERS_STREAM_TICKET_LIFETIME = int(os.getenv("USERS_STREAM_TICKET_LIFETIME", "60"))
+
 MIDDLEWARE = [
+    "sales_monitor_api.middleware.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -94,6 +106,13 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# Per-route latency, query and response size metrics, served at /metrics
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True").lower() == "true"
+# Add a Server-Timing header with the total and database time to every response
+METRICS_SERVER_TIMING = os.getenv("METRICS_SERVER_TIMING", "False").lower() == "true"
+# Bearer token of the Prometheus scrapers; /metrics is otherwise only served to staff
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
 ROOT_URLCONF = "sales_monitor_api.urls"
 
 TEMPLATES = [
@@ -118,13 +137,162 @@ WSGI_APPLICATION = "sales_monitor_api.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# DJANGO_DB_ENGINE selects sqlite (default) or postgresql. Connections are closed after each
+# request by default; under WSGI set DJANGO_DB_CONN_MAX_AGE to keep them open for that many
+# seconds (checked before reuse). Under ASGI every request runs in a new thread, so
+# persistent connections would pile up: with DJANGO_DB_POOL=True PostgreSQL connections
+# come from a psycopg pool instead (needs psycopg[pool]).
+
+DATABASE_ENGINES = {
+    "sqlite": "django.db.backends.sqlite3",
+    "postgresql": "django.db.backends.postgresql",
+}
+DATABASE_ENGINE = os.getenv("DJANGO_DB_ENGINE", "sqlite")
+DATABASE_POOL = os.getenv("DJANGO_DB_POOL", "False").lower() == "true"
+
+# SQLite profile for concurrent reads and writes (DJANGO_DB_SQLITE_TUNING=True). Every new
+# connection switches to the WAL journal, so readers no longer block on the writer, with
+# NORMAL syncing (durable at WAL checkpoints), memory-mapped reads and a 64 MiB page cache.
+# Transactions start with BEGIN IMMEDIATE: a writer waits up to DJANGO_DB_SQLITE_TIMEOUT
+# seconds for the write lock instead of failing with "database is locked" when a read
+# transaction is upgraded to a write.
+SQLITE_TUNING = os.getenv("DJANGO_DB_SQLITE_TUNING", "False").lower() == "true"
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": int(os.getenv("DJANGO_DB_SQLITE_MMAP_SIZE", 256 * 1024 * 1024)),
+    "cache_size": -int(os.getenv("DJANGO_DB_SQLITE_CACHE_KIB", 64 * 1024)),
+    "temp_store": "MEMORY",
+}
+SQLITE_TUNED_OPTIONS = {
+    "init_command": ";".join(
+        f"PRAGMA {name}={value}" for name, value in SQLITE_PRAGMAS.items()
+    ),
+    "transaction_mode": "IMMEDIATE",
+    "timeout": float(os.getenv("DJANGO_DB_SQLITE_TIMEOUT", 20)),
+}
+
+
+def _database(name, host):
+    database = {
+        "ENGINE": DATABASE_ENGINES[DATABASE_ENGINE],
+        "NAME": name,
+        "CONN_MAX_AGE": int(os.getenv("DJANGO_DB_CONN_MAX_AGE", 0)),
+        "CONN_HEALTH_CHECKS": os.getenv("DJANGO_DB_CONN_HEALTH_CHECKS", "True").lower()
+        == "true",
+    }
+    if DATABASE_ENGINE == "sqlite" and SQLITE_TUNING:
+        database["OPTIONS"] = dict(SQLITE_TUNED_OPTIONS)
+    if DATABASE_ENGINE == "postgresql":
+        database.update(
+            {
+                "USER": os.getenv("DJANGO_DB_USER", ""),
+                "PASSWORD": os.getenv("DJANGO_DB_PASSWORD", ""),
+                "HOST": host,
+                "PORT": os.getenv("DJANGO_DB_PORT", ""),
+            }
+        )
+        if DATABASE_POOL:
+            # pooled connections are returned to the pool, not kept by the thread
+            database["CONN_MAX_AGE"] = 0
+            database["OPTIONS"] = {
+                "pool": {
+                    "min_size": int(os.getenv("DJANGO_DB_POOL_MIN_SIZE", 2)),
+                    "max_size": int(os.getenv("DJANGO_DB_POOL_MAX_SIZE", 10)),
+                    "timeout": float(os.getenv("DJANGO_DB_POOL_TIMEOUT", 10)),
+                }
+            }
+    return database
+
+
 DATABASES = {
+    "default": _database(
+        os.getenv(
+            "DJANGO_DB_NAME",
+            BASE_DIR / "db.sqlite3" if DATABASE_ENGINE == "sqlite" else "sales_monitor",
+        ),
+        os.getenv("DJANGO_DB_HOST", ""),
+    )
+}
+
+# Read replica used by the list, export, facet and chart endpoints: a PostgreSQL standby
+# (DJANGO_DB_REPLICA_HOST, same database name by default) or, for local testing, a second
+# SQLite file (DJANGO_DB_REPLICA_NAME, refreshed with `manage.py sync_replica`).
+DATABASE_REPLICA_NAME = os.getenv("DJANGO_DB_REPLICA_NAME")
+DATABASE_REPLICA_HOST = os.getenv("DJANGO_DB_REPLICA_HOST")
+if DATABASE_REPLICA_NAME or DATABASE_REPLICA_HOST:
+    DATABASES["replica"] = _database(
+        DATABASE_REPLICA_NAME or DATABASES["default"]["NAME"],
+        DATABASE_REPLICA_HOST or DATABASES["default"].get("HOST", ""),
+    )
+    DATABASES["replica"]["TEST"] = {"MIRROR": "default"}
+
+DATABASE_ROUTERS = ["sales_monitor_api.db.ReplicaRouter"]
+
+# Seconds a user reads from the primary after a write, longer than the replication lag
+DATABASE_REPLICA_LAG = int(os.getenv("DJANGO_DB_REPLICA_LAG", 5))
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+# The catalogue versions, read replica pins and live events are kept in this cache. The local
+# memory default is private to each process and only suits a single process: set a shared
+# backend (e.g. django.core.cache.backends.db.DatabaseCache after `createcachetable`, or
+# django.core.cache.backends.redis.RedisCache) when running several workers.
+CACHES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+        "BACKEND": os.getenv(
+            "DJANGO_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("DJANGO_CACHE_LOCATION", "sales-monitor"),
     }
 }
 
+# Cache alias and timeout (seconds) of the catalogue read endpoints
+PRODUCTS_CACHE_ALIAS = os.getenv("PRODUCTS_CACHE_ALIAS", "default")
+PRODUCTS_CACHE_TIMEOUT = int(os.getenv("PRODUCTS_CACHE_TIMEOUT", 60 * 60))
+
+# Product list counts above this number of rows are estimated (0 to always count exactly)
+PRODUCTS_COUNT_ESTIMATE_THRESHOLD = int(
+    os.getenv("PRODUCTS_COUNT_ESTIMATE_THRESHOLD", 0)
+)
+
+# Engine computing the charts and sales analytics: "database" queries the rollup and the
+# products, "columnar" keeps the sold products in NumPy arrays in every process (needs numpy)
+PRODUCTS_ANALYTICS_ENGINE = os.getenv("PRODUCTS_ANALYTICS_ENGINE", "database")
+# Seconds after which the columnar engine reloads its facts, which bounds how long the
+# writes of the other processes are missed when the catalogue cache is process-local
+PRODUCTS_ANALYTICS_MAX_AGE = int(os.getenv("PRODUCTS_ANALYTICS_MAX_AGE", 60))
+
+# Run the independent queries of the async dashboard in separate threads and connections
+ASYNC_PARALLEL_QUERIES = os.getenv("ASYNC_PARALLEL_QUERIES", "False").lower() == "true"
+
+# Maximum number of items accepted by the batch product endpoints
+PRODUCTS_BULK_MAX_ITEMS = int(os.getenv("PRODUCTS_BULK_MAX_ITEMS", 1000))
+
+# Live sales events (server-sent events): broker, replay history, client queue size and
+# heartbeat/poll intervals in seconds. Use products.events.CacheBroker with a shared cache
+# backend to fan the events out across several workers.
+PRODUCTS_EVENTS_BACKEND = os.getenv(
+    "PRODUCTS_EVENTS_BACKEND", "products.events.InProcessBroker"
+)
+PRODUCTS_EVENTS_HISTORY = int(os.getenv("PRODUCTS_EVENTS_HISTORY", 1000))
+PRODUCTS_EVENTS_QUEUE_SIZE = int(os.getenv("PRODUCTS_EVENTS_QUEUE_SIZE", 1000))
+PRODUCTS_EVENTS_HEARTBEAT = float(os.getenv("PRODUCTS_EVENTS_HEARTBEAT", 15))
+PRODUCTS_EVENTS_POLL_INTERVAL = float(os.getenv("PRODUCTS_EVENTS_POLL_INTERVAL", 1))
+
+
+# Background jobs: seconds between two polls of the queue by an idle worker, seconds after
+# which a running job is failed as lost, number of row errors kept in an import result,
+# directory of the files written by the jobs (e.g. exports) and directory of the files
+# uploaded with them (e.g. imports)
+JOBS_POLL_INTERVAL = float(os.getenv("JOBS_POLL_INTERVAL", 1))
+JOBS_TIMEOUT = int(os.getenv("JOBS_TIMEOUT", 6 * 60 * 60))
+JOBS_MAX_REPORTED_ERRORS = int(os.getenv("JOBS_MAX_REPORTED_ERRORS", 100))
+JOBS_RESULTS_DIR = Path(os.getenv("JOBS_RESULTS_DIR", BASE_DIR / "job_results"))
+JOBS_UPLOADS_DIR = Path(os.getenv("JOBS_UPLOADS_DIR", BASE_DIR / "job_uploads"))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -145,6 +313,40 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing
+# PASSWORD_HASHER selects the algorithm of new hashes (pbkdf2, scrypt or argon2, the latter
+# needs the argon2-cffi package); hashes of the other algorithms are still verified and
+# upgraded on login. The cost parameters default to Django's values when unset.
+
+PASSWORD_HASHER = os.getenv("PASSWORD_HASHER", "pbkdf2")
+
+PASSWORD_HASHER_CLASSES = {
+    "pbkdf2": "users.hashers.PBKDF2PasswordHasher",
+    "scrypt": "users.hashers.ScryptPasswordHasher",
+    "argon2": "users.hashers.Argon2PasswordHasher",
+}
+
+PASSWORD_HASHERS = [PASSWORD_HASHER_CLASSES[PASSWORD_HASHER]] + [
+    path for name, path in PASSWORD_HASHER_CLASSES.items() if name != PASSWORD_HASHER
+]
+
+
+def _optional_int(name):
+    value = os.getenv(name)
+    return int(value) if value else None
+
+
+PASSWORD_HASHING = {
+    "pbkdf2_iterations": _optional_int("PASSWORD_PBKDF2_ITERATIONS"),
+    "scrypt_work_factor": _optional_int("PASSWORD_SCRYPT_WORK_FACTOR"),
+    "argon2_time_cost": _optional_int("PASSWORD_ARGON2_TIME_COST"),
+    "argon2_memory_cost": _optional_int("PASSWORD_ARGON2_MEMORY_COST"),
+    "argon2_parallelism": _optional_int("PASSWORD_ARGON2_PARALLELISM"),
+}
+
+# Size of the thread pool used by the async login/register views to hash passwords
+PASSWORD_HASHING_WORKERS = int(os.getenv("PASSWORD_HASHING_WORKERS", os.cpu_count()))
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
 
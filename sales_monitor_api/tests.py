@@ -0,0 +1,336 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework.views import APIView
+from rest_framework_simplejwt.tokens import AccessToken
+
+from products.models import Product
+from sales_monitor_api import db, metrics
+
+
+def sample(name, method, route, **labels):
+    """
+    Return the current value of a request metric sample, 0 when it was never recorded.
+    """
+    names = metrics.REQUEST_LABELS + tuple(labels)
+    key = name + metrics.format_labels(names, (method, route, *labels.values()))
+    values = dict(item for metric in metrics.METRICS for item in metric.samples())
+    return values.get(key, 0)
+
+
+class MetricsMiddlewareTests(TestCase):
+    """
+    Per-route request metrics.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create(username="alice")
+        self.client.defaults["HTTP_AUTHORIZATION"] = (
+            f"Bearer {AccessToken.for_user(self.user)}"
+        )
+
+    def test_request_is_recorded_for_its_route(self):
+        route = "api/products/<int:pk>"
+        before = sample("http_requests_total", "PATCH", route, status="404")
+
+        response = self.client.patch("/api/products/999999", {}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        after = sample("http_requests_total", "PATCH", route, status="404")
+        self.assertEqual(after, before + 1)
+
+    def test_queries_and_response_size_are_recorded(self):
+        route = "api/products/price_range"
+        names = [
+            f"{metric.name}_{suffix}"
+            for metric in (
+                metrics.db_queries,
+                metrics.db_duration,
+                metrics.response_size,
+            )
+            for suffix in ("count", "sum")
+        ]
+        before = [sample(name, "GET", route) for name in names]
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get("/api/products/price_range")
+
+        after = dict(zip(names, (sample(name, "GET", route) for name in names)))
+        delta = {name: after[name] - value for name, value in zip(names, before)}
+        queries = len(context.captured_queries)
+        self.assertGreater(queries, 0)
+        self.assertEqual(delta["db_queries_per_request_count"], 1)
+        self.assertEqual(delta["db_queries_per_request_sum"], queries)
+        self.assertEqual(delta["db_query_duration_seconds_per_request_count"], 1)
+        self.assertGreater(delta["db_query_duration_seconds_per_request_sum"], 0)
+        self.assertEqual(delta["http_response_size_bytes_count"], 1)
+        self.assertEqual(delta["http_response_size_bytes_sum"], len(response.content))
+
+    def test_server_timing_is_opt_in(self):
+        response = self.client.get("/api/products/price_range")
+        self.assertNotIn("Server-Timing", response)
+
+        with override_settings(METRICS_SERVER_TIMING=True):
+            response = self.client.get("/api/products/price_range")
+        self.assertRegex(
+            response["Server-Timing"],
+            r'^db;dur=[\d.]+;desc="\d+ queries", total;dur=[\d.]+$',
+        )
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_metrics_can_be_disabled(self):
+        route = "api/products/price_range"
+        before = sample("http_request_duration_seconds_count", "GET", route)
+
+        response = self.client.get("/api/products/price_range")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("Server-Timing", response)
+        after = sample("http_request_duration_seconds_count", "GET", route)
+        self.assertEqual(after, before)
+
+
+class MetricsViewTests(TestCase):
+    """
+    Access to the metrics endpoint.
+    """
+
+    def test_anonymous_request_is_rejected(self):
+        response = self.client.get("/metrics")
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response["WWW-Authenticate"], 'Bearer realm="metrics"')
+        self.assertNotIn(b"http_requests_total", response.content)
+
+    def test_regular_user_is_rejected(self):
+        self.client.force_login(User.objects.create(username="alice"))
+
+        response = self.client.get("/metrics")
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_staff_user(self):
+        self.client.force_login(User.objects.create(username="admin", is_staff=True))
+
+        response = self.client.get("/metrics")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(b"# TYPE http_requests_total counter", response.content)
+
+    @override_settings(METRICS_TOKEN="scrape-secret")
+    def test_bearer_token(self):
+        response = self.client.get(
+            "/metrics", HTTP_AUTHORIZATION="Bearer scrape-secret"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer wrong")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_empty_token_is_not_accepted(self):
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer ")
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class ReadAliasView(db.ReplicaReadMixin, APIView):
+    """
+    Return the database the reads of the request are routed to.
+    """
+
+    permission_classes = []
+
+    def get(self, request):
+        if request.query_params.get("fail"):
+            raise ValueError("failed")
+        return Response({"alias": Product.objects.all().db})
+
+
+class WriteView(db.PrimaryPinMixin, APIView):
+    permission_classes = []
+
+    def post(self, request):
+        return Response(status=status.HTTP_201_CREATED)
+
+
+@mock.patch("sales_monitor_api.db.replica_configured", return_value=True)
+@override_settings(DATABASE_REPLICA_LAG=5)
+class ReplicaRoutingTests(TestCase):
+    """
+    Routing of the reads to the replica and pinning of the writers to the primary.
+
+    The test settings have no replica: the routing is checked on the database aliases the
+    router picks, without running queries.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.factory = APIRequestFactory()
+        self.user = User.objects.create(username="alice")
+
+    def read_alias(self, user, **params):
+        request = self.factory.get("/", params)
+        force_authenticate(request, user)
+        return ReadAliasView.as_view()(request).data["alias"]
+
+    def write(self, user):
+        request = self.factory.post("/")
+        force_authenticate(request, user)
+        return WriteView.as_view()(request)
+
+    def test_reads_go_to_the_replica_in_the_block(self, replica_configured):
+        self.assertEqual(Product.objects.all().db, "default")
+        with db.replica_reads():
+            self.assertEqual(Product.objects.all().db, "replica")
+            self.assertTrue(db.reading_from_replica())
+        self.assertEqual(Product.objects.all().db, "default")
+
+    def test_writes_go_to_the_primary(self, replica_configured):
+        product = Product(pk=1)
+        product._state.db = "replica"
+        router = db.ReplicaRouter()
+
+        with db.replica_reads():
+            self.assertEqual(Product.objects.all().db, "replica")
+            self.assertEqual(router.db_for_write(Product, instance=product), "default")
+            self.assertIsNone(router.db_for_write(Product))
+        self.assertFalse(router.allow_migrate("replica", "products"))
+
+    def test_view_reads_from_the_replica(self, replica_configured):
+        self.assertEqual(self.read_alias(self.user), "replica")
+        self.assertEqual(self.read_alias(AnonymousUser()), "replica")
+
+    def test_writer_is_pinned_to_the_primary(self, replica_configured):
+        self.assertEqual(self.write(self.user).status_code, status.HTTP_201_CREATED)
+
+        self.assertEqual(self.read_alias(self.user), "default")
+        other = User.objects.create(username="bob")
+        self.assertEqual(self.read_alias(other), "replica")
+
+    def test_pin_expires(self, replica_configured):
+        now = time.time()
+        with mock.patch("time.time", return_value=now):
+            self.write(self.user)
+        with mock.patch("time.time", return_value=now + 4):
+            self.assertFalse(db.use_replica(self.user))
+        with mock.patch("time.time", return_value=now + 6):
+            self.assertTrue(db.use_replica(self.user))
+
+    def test_no_replica_configured(self, replica_configured):
+        replica_configured.return_value = False
+
+        self.write(self.user)
+
+        self.assertIsNone(cache.get(db.pin_key(self.user)))
+        self.assertEqual(self.read_alias(self.user), "default")
+
+    def test_alias_does_not_leak_between_requests(self, replica_configured):
+        self.assertEqual(self.read_alias(self.user), "replica")
+        self.assertIsNone(db._read_alias.get())
+        self.assertEqual(Product.objects.all().db, "default")
+
+        with self.assertRaises(ValueError):
+            self.read_alias(self.user, fail="1")
+        self.assertIsNone(db._read_alias.get())
+
+        self.write(self.user)
+        self.assertEqual(self.read_alias(self.user), "default")
+
+    def test_alias_does_not_leak_between_concurrent_requests(self, replica_configured):
+        async def replica_request(entered, done):
+            with db.replica_reads():
+                entered.set()
+                await done.wait()
+                return Product.objects.all().db
+
+        async def primary_request(entered, done):
+            await entered.wait()
+            try:
+                return Product.objects.all().db
+            finally:
+                done.set()
+
+        async def main():
+            entered, done = asyncio.Event(), asyncio.Event()
+            return await asyncio.gather(
+                replica_request(entered, done), primary_request(entered, done)
+            )
+
+        self.assertEqual(asyncio.run(main()), ["replica", "default"])
+
+
+class SQLiteTuningTests(SimpleTestCase):
+    """
+    The SQLite profile of DJANGO_DB_SQLITE_TUNING, checked in a separate process since the
+    databases are configured when the settings are imported.
+    """
+
+    script = (
+        "import json; from django.db import connection; "
+        "cursor = connection.cursor(); "
+        "print(json.dumps({name: cursor.execute(f'PRAGMA {name}').fetchone()[0] "
+        "for name in ('journal_mode', 'synchronous', 'temp_store')} "
+        "| {'transaction_mode': connection.transaction_mode}))"
+    )
+
+    def pragmas(self, **env):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        env = {
+            **{
+                key: value
+                for key, value in os.environ.items()
+                if not key.startswith("DJANGO_DB_")
+            },
+            "DJANGO_DB_ENGINE": "sqlite",
+            "DJANGO_DB_NAME": str(Path(directory.name) / "db.sqlite3"),
+            **env,
+        }
+        manage = str(settings.BASE_DIR / "manage.py")
+        shell = subprocess.run(
+            [sys.executable, manage, "shell", "--no-imports", "-c", self.script],
+            env=env,
+            capture_output=True,
+            text=True,
+            timeout=60,
+        )
+        self.assertEqual(shell.returncode, 0, shell.stderr)
+        return json.loads(shell.stdout)
+
+    def test_tuned_profile(self):
+        self.assertEqual(
+            self.pragmas(DJANGO_DB_SQLITE_TUNING="True"),
+            {
+                "journal_mode": "wal",
+                "synchronous": 1,
+                "temp_store": 2,
+                "transaction_mode": "IMMEDIATE",
+            },
+        )
+
+    def test_defaults(self):
+        self.assertEqual(
+            self.pragmas(),
+            {
+                "journal_mode": "delete",
+                "synchronous": 2,
+                "temp_store": 0,
+                "transaction_mode": None,
+            },
+        )
@@ -18,8 +18,12 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from sales_monitor_api.metrics import metrics_view
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/users/", include("users.urls")),
     path("api/products/", include("products.urls")),
+    path("api/jobs/", include("jobs.urls")),
+    path("metrics", metrics_view, name="metrics"),
 ]
@@ -0,0 +1,138 @@
+"""
+Async variants of the login and register endpoints.
+
+Password hashing and verification run in the bounded hashing thread pool (see
+`users.hashers`), so under ASGI a burst of logins keeps the event loop free and uses at most
+`PASSWORD_HASHING_WORKERS` cores for hashing. The responses are the same as the sync views.
+"""
+
+import json
+
+from django.contrib.auth.models import User
+from django.db import IntegrityError
+from django.http import JsonResponse
+from django.utils import timezone
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, serializers, status
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings
+
+from users.hashers import acheck_password, amake_password
+from users.serializers import RegisterSerializer, UserSerializer
+
+
+class LoginSerializer(serializers.Serializer):
+    """
+    Serializer for the login credentials
+    """
+
+    username = serializers.CharField()
+    password = serializers.CharField(style={"input_type": "password"})
+
+
+class AsyncUserView(View):
+    """
+    Base class for the async user views, with the JSON handling of the API.
+    """
+
+    http_method_names = ["post"]
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # token based API, like the DRF views
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    def get_data(self, request):
+        if request.content_type == "application/json":
+            try:
+                return json.loads(request.body or b"{}")
+            except ValueError as e:
+                raise exceptions.ParseError(f"JSON parse error - {e}") from e
+        return request.POST
+
+    def json_response(self, data, status=status.HTTP_200_OK):
+        return JsonResponse(
+            data,
+            status=status,
+            safe=False,
+            encoder=JSONEncoder,
+            json_dumps_params={"ensure_ascii": False, "separators": (",", ":")},
+        )
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            detail = exc.detail
+            data = detail if isinstance(detail, (dict, list)) else {"detail": detail}
+            return self.json_response(data, status=exc.status_code)
+
+
+class AsyncLoginView(AsyncUserView):
+    """
+    Async Login View
+
+    Same credentials and response as the login endpoint. The password is verified in the
+    hashing thread pool and re-hashed there when the hasher configuration changed.
+    """
+
+    async def post(self, request, *args, **kwargs):
+        serializer = LoginSerializer(data=self.get_data(request))
+        serializer.is_valid(raise_exception=True)
+        username = serializer.validated_data["username"]
+        password = serializer.validated_data["password"]
+
+        user = await User.objects.filter(**{User.USERNAME_FIELD: username}).afirst()
+        valid, must_update = await acheck_password(
+            password, user.password if user else None
+        )
+        if not valid or not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                TokenObtainPairSerializer.default_error_messages["no_active_account"],
+                code="no_active_account",
+            )
+
+        update_fields = []
+        if must_update:
+            user.password = await amake_password(password)
+            update_fields.append("password")
+        if api_settings.UPDATE_LAST_LOGIN:
+            user.last_login = timezone.now()
+            update_fields.append("last_login")
+        if update_fields:
+            await user.asave(update_fields=update_fields)
+
+        refresh = TokenObtainPairSerializer.get_token(user)
+        data = {
+            "refresh": str(refresh),
+            "access": str(refresh.access_token),
+            "user": UserSerializer(user).data,
+        }
+        return self.json_response(data)
+
+
+class AsyncRegisterView(AsyncUserView):
+    """
+    Async Register View
+
+    Same fields and response as the register endpoint. The password is hashed in the
+    hashing thread pool.
+    """
+
+    async def post(self, request, *args, **kwargs):
+        serializer = RegisterSerializer(data=self.get_data(request))
+        serializer.is_valid(raise_exception=True)
+
+        user = serializer.build_user(serializer.validated_data)
+        user.password = await amake_password(serializer.validated_data["password"])
+        try:
+            # a single insert is atomic on its own
+            await user.asave()
+        except IntegrityError as e:
+            field = await serializer.aduplicate_field(user)
+            raise serializer.duplicate_error(field) from e
+
+        serializer.instance = user
+        return self.json_response(serializer.data, status=status.HTTP_201_CREATED)
@@ -0,0 +1,256 @@
+"""
+JWT authentication with a process-local cache of the token users.
+
+JWTAuthentication loads the user from the database on every request after verifying the
+token signature. The classes below keep the resolved users in a bounded LRU cache whose
+entries expire after `USERS_AUTH_CACHE_TTL` seconds (never longer than the access token
+lifetime), so frequent polling with the same token skips the user query.
+
+Every entry is stored with the version of its user held in the `USERS_AUTH_CACHE_ALIAS`
+Django cache. Saving or deleting a user (deactivation, password change) changes that
+version, so with a cache shared by the worker processes the entries of all of them are
+invalidated. Writes that bypass the signals, like `QuerySet.update()`, and process-local
+caches are only bounded by the TTL, which is therefore short by default.
+
+Browsers cannot set headers on an EventSource, so the live events stream also accepts a
+short-lived `StreamTicket` in its query string.
+"""
+
+import copy
+import datetime
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import (
+    AuthenticationFailed,
+    InvalidToken,
+    TokenError,
+)
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import Token
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+VERSION_KEY = "users:auth_version:%s"
+
+
+class UserCache:
+    """
+    Thread-safe LRU cache of users by id, with a time to live and a shared version.
+
+    Ids are stored as strings, like the user id claim of the tokens. An entry is only
+    returned while the version of its user is the one read before the user was loaded.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    @property
+    def max_size(self):
+        return settings.USERS_AUTH_CACHE_SIZE
+
+    @property
+    def ttl(self):
+        lifetime = api_settings.ACCESS_TOKEN_LIFETIME.total_seconds()
+        return min(settings.USERS_AUTH_CACHE_TTL, lifetime)
+
+    @property
+    def versions(self):
+        return caches[settings.USERS_AUTH_CACHE_ALIAS]
+
+    def version(self, user_id):
+        """
+        Return the shared version of a user (None until the user is first changed).
+        """
+        return self.versions.get(VERSION_KEY % user_id)
+
+    async def aversion(self, user_id):
+        return await self.versions.aget(VERSION_KEY % user_id)
+
+    def get(self, user_id, version):
+        """
+        Return a copy of the cached user, or None if it is missing, expired or outdated.
+
+        - version: current shared version of the user, see `version()`.
+        """
+        user_id = str(user_id)
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            user, expires, entry_version = entry
+            if expires <= time.monotonic() or entry_version != version:
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+        # requests must not share (and mutate) the same instance
+        return copy.copy(user)
+
+    def set(self, user_id, user, version):
+        """
+        Cache a user loaded after its shared version was read.
+        """
+        user_id = str(user_id)
+        if self.max_size <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            expires = time.monotonic() + self.ttl
+            self._entries[user_id] = (copy.copy(user), expires, version)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        """
+        Drop a user from this process and change its shared version for the others.
+        """
+        user_id = str(user_id)
+        with self._lock:
+            self._entries.pop(user_id, None)
+        # outlives the entries cached with the previous version
+        self.versions.set(VERSION_KEY % user_id, time.time_ns(), timeout=self.ttl + 1)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that resolves the token user through the user cache.
+
+    The token itself is still decoded and verified on every request, and the active user
+    and password change checks run against the cached user.
+    """
+
+    def get_user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(
+                _("Token contained no recognizable user identification")
+            ) from e
+
+    def get_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        version = user_cache.version(user_id)
+        user = user_cache.get(user_id, version)
+        if user is None:
+            user = self.load_user(user_id)
+            user_cache.set(user_id, user, version)
+
+        self.check_user(user, validated_token)
+        return user
+
+    def load_user(self, user_id):
+        try:
+            return self.user_model.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+        except self.user_model.DoesNotExist as e:
+            raise AuthenticationFailed(
+                _("User not found"), code="user_not_found"
+            ) from e
+
+    def check_user(self, user, validated_token):
+        """
+        Apply the active user and password change checks of JWTAuthentication.
+        """
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM
+            ) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+
+class AsyncJWTAuthentication(CachedJWTAuthentication):
+    """
+    JWT authentication usable from async views.
+
+    The token is decoded and verified like JWTAuthentication does (no I/O), and on a cache
+    miss the user is loaded with the async ORM so the request does not block a thread on
+    the database.
+    """
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        """
+        Asynchronously find and return the user of the given validated token.
+        """
+        user_id = self.get_user_id(validated_token)
+        version = await user_cache.aversion(user_id)
+        user = user_cache.get(user_id, version)
+        if user is None:
+            user = await self.aload_user(user_id)
+            user_cache.set(user_id, user, version)
+
+        self.check_user(user, validated_token)
+        return user
+
+    async def aload_user(self, user_id):
+        try:
+            return await self.user_model.objects.aget(
+                **{api_settings.USER_ID_FIELD: user_id}
+            )
+        except self.user_model.DoesNotExist as e:
+            raise AuthenticationFailed(
+                _("User not found"), code="user_not_found"
+            ) from e
+
+
+class StreamTicket(Token):
+    """
+    Short-lived token for the clients that cannot send an Authorization header.
+
+    Its token type differs from the access tokens, so a ticket is only accepted by the
+    views using `AsyncStreamTicketAuthentication`. It expires after
+    `USERS_STREAM_TICKET_LIFETIME` seconds and can be reused until then, e.g. by the
+    automatic reconnections of an EventSource.
+    """
+
+    token_type = "stream_ticket"
+
+    @property
+    def lifetime(self):
+        return datetime.timedelta(seconds=settings.USERS_STREAM_TICKET_LIFETIME)
+
+
+class AsyncStreamTicketAuthentication(AsyncJWTAuthentication):
+    """
+    Async JWT authentication also accepting a `StreamTicket` in the `ticket` query parameter.
+    """
+
+    ticket_query_param = "ticket"
+
+    async def aauthenticate(self, request):
+        raw_ticket = request.GET.get(self.ticket_query_param)
+        if raw_ticket is None:
+            return await super().aauthenticate(request)
+
+        try:
+            ticket = StreamTicket(raw_ticket)
+        except TokenError as e:
+            raise InvalidToken(e.args[0]) from e
+        return await self.aget_user(ticket), ticket
@@ -0,0 +1,132 @@
+"""
+Password hashers with settings-driven cost, and hashing off the event loop.
+
+The hashers keep the algorithm names of Django's hashers, so existing hashes are verified
+by them and re-hashed on login when the configured cost changes. Their cost parameters are
+read from `settings.PASSWORD_HASHING` on every use.
+
+Hashing is CPU bound and the hash functions release the GIL, so the async views run it in a
+bounded thread pool (`PASSWORD_HASHING_WORKERS`) instead of the event loop thread.
+"""
+
+import asyncio
+import base64
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+_executor = None
+
+
+def hashing_cost(name, default):
+    """
+    Return the configured cost parameter, or the default of the Django hasher.
+    """
+    value = settings.PASSWORD_HASHING.get(name)
+    return default if value is None else value
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    @property
+    def iterations(self):
+        return hashing_cost(
+            "pbkdf2_iterations", hashers.PBKDF2PasswordHasher.iterations
+        )
+
+
+def scrypt_maxmem(n, r, p):
+    """
+    Return the memory in bytes OpenSSL needs to compute scrypt with these parameters.
+    """
+    return 128 * r * (n + p + 2)
+
+
+class ScryptPasswordHasher(hashers.ScryptPasswordHasher):
+    @property
+    def work_factor(self):
+        return hashing_cost(
+            "scrypt_work_factor", hashers.ScryptPasswordHasher.work_factor
+        )
+
+    def encode(self, password, salt, n=None, r=None, p=None):
+        # Django passes maxmem=0, which keeps OpenSSL's 32 MiB limit and fails from a work
+        # factor of 2**15. The limit is computed per call: verifying an older hash may use
+        # other parameters than the configured ones, and the hasher is shared by threads.
+        self._check_encode_args(password, salt)
+        n = n or self.work_factor
+        r = r or self.block_size
+        p = p or self.parallelism
+        hash_ = hashlib.scrypt(
+            password.encode(),
+            salt=salt.encode(),
+            n=n,
+            r=r,
+            p=p,
+            maxmem=scrypt_maxmem(n, r, p),
+            dklen=64,
+        )
+        hash_ = base64.b64encode(hash_).decode("ascii").strip()
+        return "%s$%d$%s$%d$%d$%s" % (self.algorithm, n, salt, r, p, hash_)
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    @property
+    def time_cost(self):
+        return hashing_cost("argon2_time_cost", hashers.Argon2PasswordHasher.time_cost)
+
+    @property
+    def memory_cost(self):
+        return hashing_cost(
+            "argon2_memory_cost", hashers.Argon2PasswordHasher.memory_cost
+        )
+
+    @property
+    def parallelism(self):
+        return hashing_cost(
+            "argon2_parallelism", hashers.Argon2PasswordHasher.parallelism
+        )
+
+
+def get_executor():
+    """
+    Return the thread pool used to hash passwords, created on first use.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.PASSWORD_HASHING_WORKERS,
+            thread_name_prefix="password-hashing",
+        )
+    return _executor
+
+
+async def run_hashing(func, *args, **kwargs):
+    """
+    Run a hashing function in the hashing thread pool.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), partial(func, *args, **kwargs))
+
+
+async def acheck_password(password, encoded):
+    """
+    Return whether the password matches the encoded hash, and whether the hash should be
+    upgraded to the preferred hasher and cost.
+    """
+    if encoded is None or not hashers.is_password_usable(encoded):
+        # hash anyway so unknown and unusable users take as long as real ones
+        await run_hashing(hashers.make_password, password)
+        return False, False
+
+    must_update = []
+    valid = await run_hashing(
+        hashers.check_password, password, encoded, setter=must_update.append
+    )
+    return valid, bool(must_update)
+
+
+async def amake_password(password):
+    return await run_hashing(hashers.make_password, password)
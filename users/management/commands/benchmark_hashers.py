@@ -0,0 +1,137 @@
+import importlib
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from django.utils.module_loading import import_string
+
+PASSWORD = "benchmark-password"
+
+
+class Command(BaseCommand):
+    """
+    Measure the password verification throughput of each hasher at several cost settings.
+
+    A login verifies one password, so the verifications per second of a single thread are
+    the logins per second a core can serve; the same verifications are then run in a pool
+    of worker threads (the hash functions release the GIL) to show how they scale.
+    """
+
+    help = (
+        "Report logins/sec per core of the password hashers at several cost settings."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--pbkdf2-iterations",
+            type=int,
+            nargs="*",
+            default=[1_000_000, 600_000, 300_000],
+            help="PBKDF2 iteration counts to measure.",
+        )
+        parser.add_argument(
+            "--scrypt-work-factors",
+            type=int,
+            nargs="*",
+            default=[2**14, 2**15, 2**16],
+            help="scrypt work factors (N) to measure.",
+        )
+        parser.add_argument(
+            "--argon2-time-costs",
+            type=int,
+            nargs="*",
+            default=[2, 3, 4],
+            help="Argon2 time costs to measure (needs argon2-cffi).",
+        )
+        parser.add_argument(
+            "--rounds", type=int, default=10, help="Verifications per measurement."
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=settings.PASSWORD_HASHING_WORKERS,
+            help="Threads of the concurrent measurement.",
+        )
+        parser.add_argument(
+            "--json", action="store_true", help="Print the results as JSON."
+        )
+
+    def handle(self, *args, **options):
+        configurations = (
+            [("pbkdf2", {"pbkdf2_iterations": n}) for n in options["pbkdf2_iterations"]]
+            + [
+                ("scrypt", {"scrypt_work_factor": n})
+                for n in options["scrypt_work_factors"]
+            ]
+            + [
+                ("argon2", {"argon2_time_cost": n})
+                for n in options["argon2_time_costs"]
+            ]
+        )
+
+        results = []
+        unavailable = set()
+        for name, cost in configurations:
+            if name in unavailable:
+                continue
+            result = self.measure(name, cost, options["rounds"], options["workers"])
+            if result is None:
+                unavailable.add(name)
+                self.stderr.write(f"Skipping {name}: its library is not installed.")
+                continue
+            results.append(result)
+            if not options["json"]:
+                self.stdout.write(
+                    f"{name} {self.format_cost(cost)}: "
+                    f"{result['hash_ms']:.1f} ms per hash, "
+                    f"{result['logins_per_second_per_core']:.1f} logins/s per core, "
+                    f"{result['logins_per_second']:.1f} logins/s "
+                    f"with {result['workers']} workers"
+                )
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+
+    def measure(self, name, cost, rounds, workers):
+        hashing = {**settings.PASSWORD_HASHING, **cost}
+        with override_settings(PASSWORD_HASHING=hashing):
+            hasher = import_string(settings.PASSWORD_HASHER_CLASSES[name])()
+            if hasher.library:
+                try:
+                    importlib.import_module(hasher.library)
+                except ImportError:
+                    return None
+
+            started = time.perf_counter()
+            encoded = hasher.encode(PASSWORD, hasher.salt())
+            hash_time = time.perf_counter() - started
+
+            started = time.perf_counter()
+            for _ in range(rounds):
+                hasher.verify(PASSWORD, encoded)
+            single = rounds / (time.perf_counter() - started)
+
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                started = time.perf_counter()
+                verifications = [
+                    executor.submit(hasher.verify, PASSWORD, encoded)
+                    for _ in range(rounds * workers)
+                ]
+                for verification in verifications:
+                    verification.result()
+                concurrent = rounds * workers / (time.perf_counter() - started)
+
+        return {
+            "hasher": name,
+            "cost": cost,
+            "hash_ms": hash_time * 1000,
+            "logins_per_second_per_core": single,
+            "logins_per_second": concurrent,
+            "workers": workers,
+        }
+
+    def format_cost(self, cost):
+        return ", ".join(f"{key}={value}" for key, value in cost.items())
@@ -0,0 +1,49 @@
+from django.db import IntegrityError, migrations
+from django.db.models import Count
+
+INDEX_NAME = "users_auth_user_email_uniq"
+
+
+def check_duplicate_emails(apps, schema_editor):
+    """
+    Abort before creating the index when several users share a non-empty email.
+
+    The duplicates cannot be merged automatically: the accounts have to be fixed by hand
+    (e.g. in the admin) before running the migration again.
+    """
+    User = apps.get_model("auth", "User")
+    duplicates = (
+        User.objects.using(schema_editor.connection.alias)
+        .exclude(email="")
+        .values("email")
+        .annotate(users=Count("id"))
+        .filter(users__gt=1)
+        .order_by("email")
+    )
+    emails = [f"{row['email']} ({row['users']} users)" for row in duplicates]
+    if emails:
+        raise IntegrityError(
+            "Cannot make the user emails unique, these emails are used by several "
+            f"users: {', '.join(emails)}. Change or clear the duplicates and migrate "
+            "again."
+        )
+
+
+class Migration(migrations.Migration):
+    """
+    Enforce unique non-empty emails at the database level, so registration can rely on a
+    single insert instead of checking for duplicates first.
+    """
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_emails, migrations.RunPython.noop),
+        migrations.RunSQL(
+            sql=f"CREATE UNIQUE INDEX {INDEX_NAME} ON auth_user (email) "
+            "WHERE email <> ''",
+            reverse_sql=f"DROP INDEX {INDEX_NAME}",
+        ),
+    ]
@@ -1,6 +1,6 @@
 from rest_framework import serializers
-from rest_framework.validators import UniqueValidator
 from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -31,8 +31,14 @@ class UserSerializer(serializers.ModelSerializer):
 class RegisterSerializer(serializers.ModelSerializer):
     """
     Serializer for User registration
+
+    Username and email uniqueness is enforced by the database (the unique username column
+    and the partial unique index on non-empty emails), so a registration is a single insert
+    and the duplicate field is only looked up after an IntegrityError.
     """
 
+    unique_error = "This field must be unique."
+
     password = serializers.CharField(
         required=True,
         write_only=True,
@@ -40,15 +46,8 @@ class RegisterSerializer(serializers.ModelSerializer):
         min_length=8,
         max_length=64,
     )
-    username = serializers.CharField(
-        required=True, validators=[UniqueValidator(queryset=User.objects.all())]
-    )
-    email = serializers.EmailField(
-        required=False,
-        allow_blank=True,
-        allow_null=True,
-        validators=[UniqueValidator(queryset=User.objects.all())],
-    )
+    username = serializers.CharField(required=True, max_length=150)
+    email = serializers.EmailField(required=False, allow_blank=True, allow_null=True)
     first_name = serializers.CharField(
         required=False, allow_blank=True, allow_null=True
     )
@@ -61,12 +60,45 @@ class RegisterSerializer(serializers.ModelSerializer):
             "password": {"write_only": True},
         }
 
-    def create(self, validated_data):
-        user = User.objects.create_user(
-            username=validated_data["username"],
-            email=validated_data["email"],
-            password=validated_data["password"],
-            first_name=validated_data["first_name"],
-            last_name=validated_data["last_name"],
+    def build_user(self, validated_data):
+        """
+        Return the unsaved user of the validated data, without a password.
+        """
+        return User(
+            username=User.normalize_username(validated_data["username"]),
+            email=User.objects.normalize_email(validated_data.get("email")),
+            first_name=validated_data.get("first_name") or "",
+            last_name=validated_data.get("last_name") or "",
         )
+
+    def duplicate_error(self, field):
+        """
+        Return the validation error of a failed insert of a duplicate user.
+        """
+        return serializers.ValidationError({field: [self.unique_error]})
+
+    def duplicate_field(self, user):
+        """
+        Return the unique field of a user whose insert failed.
+
+        The stored values are looked up, since the message of the IntegrityError differs
+        between the database backends and may quote the other values of the row.
+        """
+        if User.objects.filter(username=user.username).exists():
+            return "username"
+        return "email"
+
+    async def aduplicate_field(self, user):
+        if await User.objects.filter(username=user.username).aexists():
+            return "username"
+        return "email"
+
+    def create(self, validated_data):
+        user = self.build_user(validated_data)
+        user.set_password(validated_data["password"])
+        try:
+            with transaction.atomic():
+                user.save()
+        except IntegrityError as e:
+            raise self.duplicate_error(self.duplicate_field(user)) from e
         return user
@@ -1,3 +1,291 @@
-from django.test import TestCase
+from django.contrib.auth.hashers import check_password, make_password
+from django.contrib.auth.models import User
+from django.db import IntegrityError, connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
 
-# Create your tests here.
+from users.authentication import (
+    VERSION_KEY,
+    CachedJWTAuthentication,
+    StreamTicket,
+    user_cache,
+)
+
+
+class LoginQueryTests(TestCase):
+    """
+    Query budget of the login endpoint.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="alice", email="alice@example.com", password="secret-password"
+        )
+
+    def test_login_queries(self):
+        # user lookup and last login update
+        with self.assertNumQueries(2):
+            response = self.client.post(
+                "/api/users/login",
+                {"username": "alice", "password": "secret-password"},
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("access", response.data)
+        self.assertIn("refresh", response.data)
+        self.assertEqual(response.data["user"]["id"], self.user.id)
+        self.assertEqual(response.data["user"]["email"], "alice@example.com")
+        self.assertIsNotNone(response.data["user"]["last_login"])
+
+    def test_login_wrong_password(self):
+        with self.assertNumQueries(1):
+            response = self.client.post(
+                "/api/users/login", {"username": "alice", "password": "wrong"}
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class RegisterQueryTests(TransactionTestCase):
+    """
+    Query budget and duplicate handling of the registration endpoint.
+
+    The tests run outside of a test transaction so the registration transaction is the
+    outermost one, like in production.
+    """
+
+    def setUp(self):
+        user_cache.clear()
+
+    def register(self, **data):
+        data.setdefault("password", "secret-password")
+        return self.client.post("/api/users/register", data)
+
+    def test_register_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.register(username="bob", email="bob@example.com")
+
+        # a single insert, besides the statements of its transaction
+        statements = [
+            query["sql"]
+            for query in context.captured_queries
+            if query["sql"].split()[0]
+            not in ("BEGIN", "COMMIT", "SAVEPOINT", "RELEASE")
+        ]
+        self.assertEqual(len(statements), 1, statements)
+        self.assertTrue(statements[0].startswith("INSERT"))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["username"], "bob")
+        self.assertTrue(
+            User.objects.get(username="bob").check_password("secret-password")
+        )
+
+    def test_register_without_optional_fields(self):
+        response = self.register(username="carol")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        user = User.objects.get(username="carol")
+        self.assertEqual(user.email, "")
+        self.assertEqual(user.first_name, "")
+
+    def test_duplicate_username(self):
+        self.register(username="dave")
+        response = self.register(username="dave")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("username", response.data)
+        self.assertEqual(User.objects.filter(username="dave").count(), 1)
+
+    def test_duplicate_email(self):
+        self.register(username="erin", email="shared@example.com")
+        response = self.register(username="frank", email="shared@example.com")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("email", response.data)
+        self.assertFalse(User.objects.filter(username="frank").exists())
+
+    def test_duplicate_username_mentioning_email(self):
+        self.register(username="email-admin", email="first@example.com")
+        response = self.register(username="email-admin", email="second@example.com")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(list(response.data), ["username"])
+
+    def test_async_duplicate_email(self):
+        self.register(username="ivan", email="shared@example.com")
+        response = self.client.post(
+            "/api/users/async/register",
+            {
+                "username": "judy",
+                "email": "shared@example.com",
+                "password": "secret-password",
+            },
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("email", response.json())
+
+    def test_blank_emails_are_not_unique(self):
+        self.assertEqual(self.register(username="gina").status_code, 201)
+        self.assertEqual(self.register(username="hank", email="").status_code, 201)
+
+
+class EmailIndexMigrationTests(TransactionTestCase):
+    """
+    Duplicate check of the migration adding the unique email index.
+    """
+
+    migrate_from = [("users", None)]
+    migrate_to = [("users", "0001_user_email_unique")]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+
+    def setUp(self):
+        self.migrate(self.migrate_from)
+        self.addCleanup(self.migrate, self.migrate_to)
+
+    def test_duplicate_emails_abort_the_migration(self):
+        User.objects.create(username="alice", email="shared@example.com")
+        User.objects.create(username="bob", email="shared@example.com")
+        User.objects.create(username="carol", email="carol@example.com")
+
+        with self.assertRaisesMessage(IntegrityError, "shared@example.com (2 users)"):
+            self.migrate(self.migrate_to)
+
+        User.objects.filter(username="bob").update(email="bob@example.com")
+        self.migrate(self.migrate_to)
+        with self.assertRaises(IntegrityError):
+            User.objects.create(username="dave", email="carol@example.com")
+
+    def test_blank_emails_are_not_duplicates(self):
+        User.objects.create(username="erin")
+        User.objects.create(username="frank")
+
+        self.migrate(self.migrate_to)
+
+        self.assertEqual(User.objects.filter(email="").count(), 2)
+
+
+class CachedAuthenticationTests(TestCase):
+    """
+    Invalidation of the users cached by the JWT authentication.
+    """
+
+    def setUp(self):
+        user_cache.clear()
+        user_cache.versions.clear()
+        self.user = User.objects.create_user(username="alice", password="secret")
+        self.token = AccessToken.for_user(self.user)
+        self.authentication = CachedJWTAuthentication()
+        # cache the user
+        self.authentication.get_user(self.token)
+
+    def test_cached_user(self):
+        with self.assertNumQueries(0):
+            user = self.authentication.get_user(self.token)
+        self.assertEqual(user.pk, self.user.pk)
+
+    def test_deactivation(self):
+        self.user.is_active = False
+        self.user.save()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.get_user(self.token)
+
+    def test_deactivation_in_another_process(self):
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        # what the signal of the process saving the user does to the shared cache
+        user_cache.versions.set(VERSION_KEY % self.user.pk, 1)
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.get_user(self.token)
+
+
+class StreamTicketTests(TestCase):
+    """
+    Tickets opening the live events stream without an Authorization header.
+
+    The test client is not an ASGI server: an authenticated request to the stream gets a
+    501, an unauthenticated one a 401.
+    """
+
+    def setUp(self):
+        user_cache.clear()
+        self.user = User.objects.create_user(username="alice", password="secret")
+
+    def ticket(self):
+        response = self.client.post(
+            "/api/users/stream_ticket",
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["expires_in"], 60)
+        return response.data["ticket"]
+
+    def test_ticket_opens_the_stream(self):
+        response = self.client.get(f"/api/products/events?ticket={self.ticket()}")
+
+        self.assertEqual(response.status_code, status.HTTP_501_NOT_IMPLEMENTED)
+
+    def test_ticket_requires_authentication(self):
+        response = self.client.post("/api/users/stream_ticket")
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_stream_requires_credentials(self):
+        response = self.client.get("/api/products/events")
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(USERS_STREAM_TICKET_LIFETIME=-1)
+    def test_expired_ticket(self):
+        ticket = StreamTicket.for_user(self.user)
+
+        response = self.client.get(f"/api/products/events?ticket={ticket}")
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_tokens_are_not_interchangeable(self):
+        access = AccessToken.for_user(self.user)
+        response = self.client.get(f"/api/products/events?ticket={access}")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        response = self.client.get(
+            "/api/products/async/categories",
+            HTTP_AUTHORIZATION=f"Bearer {self.ticket()}",
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_ticket_of_an_inactive_user(self):
+        ticket = self.ticket()
+        self.user.is_active = False
+        self.user.save()
+
+        response = self.client.get(f"/api/products/events?ticket={ticket}")
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class ScryptHasherTests(TestCase):
+    """
+    Configurable cost of the scrypt hasher.
+    """
+
+    @override_settings(
+        PASSWORD_HASHING={"scrypt_work_factor": 2**15},
+        PASSWORD_HASHERS=["users.hashers.ScryptPasswordHasher"],
+    )
+    def test_work_factor_above_the_openssl_default_memory(self):
+        encoded = make_password("secret-password")
+
+        self.assertTrue(encoded.startswith("scrypt$32768$"))
+        self.assertTrue(check_password("secret-password", encoded))
+        self.assertFalse(check_password("wrong-password", encoded))
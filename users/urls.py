@@ -1,5 +1,6 @@
 from django.urls import path
-from users.views import RegisterView, LoginView
+from users.views import RegisterView, LoginView, StreamTicketView
+from users.async_views import AsyncRegisterView, AsyncLoginView
 from rest_framework_simplejwt.views import TokenRefreshView
 
 
@@ -9,4 +10,8 @@ urlpatterns = [
     path(
         "token_refresh/", TokenRefreshView.as_view(), name="token_refresh"
     ),  # Refresh token endpoint
+    path("stream_ticket", StreamTicketView.as_view(), name="stream-ticket"),
+    # async variants for ASGI deployments
+    path("async/register", AsyncRegisterView.as_view(), name="async-register"),
+    path("async/login", AsyncLoginView.as_view(), name="async-login"),
 ]
@@ -1,6 +1,12 @@
+from django.conf import settings
 from django.contrib.auth.models import User
-from rest_framework import generics
+from rest_framework import generics, status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 from rest_framework_simplejwt.views import TokenObtainPairView
+from users.authentication import StreamTicket
 from users.serializers import RegisterSerializer, UserSerializer
 
 
@@ -24,13 +30,43 @@ class LoginView(TokenObtainPairView):
     The view is inherited from TokenObtainPairView. The view is used to obtain a new access and refresh
     token pair by providing a valid username and password.
 
-    The view is extended to return user data in the response.
+    The view is extended to return user data in the response. The user authenticated by the
+    token serializer is reused, so a login costs one user query plus the last login update.
     """
 
-    # return user data in response
     def post(self, request, *args, **kwargs):
-        response = super().post(request, *args, **kwargs)
-        user = User.objects.get(username=request.data["username"])
-        serializer = UserSerializer(user)
-        response.data["user"] = serializer.data
-        return response
+        serializer = self.get_serializer(data=request.data)
+
+        try:
+            serializer.is_valid(raise_exception=True)
+        except TokenError as e:
+            raise InvalidToken(e.args[0]) from e
+
+        # return user data in response
+        data = dict(serializer.validated_data)
+        data["user"] = UserSerializer(serializer.user).data
+        return Response(data, status=status.HTTP_200_OK)
+
+
+class StreamTicketView(APIView):
+    """
+    Stream Ticket View for obtaining a ticket to open the live events stream.
+
+    EventSource cannot send the access token in a header: pass the ticket as the `ticket`
+    query parameter of the stream instead. The ticket expires after
+    `USERS_STREAM_TICKET_LIFETIME` seconds.
+
+    - use method POST with the access token.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        ticket = StreamTicket.for_user(request.user)
+        return Response(
+            {
+                "ticket": str(ticket),
+                "expires_in": settings.USERS_STREAM_TICKET_LIFETIME,
+            },
+            status=status.HTTP_200_OK,
+        )